@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""A client syncing many github orgs under one rate-limit budget
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+import requests
+
+from client import GithubOrgClient
+
+__all__ = [
+    "BatchOrgClient",
+    "RateLimitBudget",
+]
+
+
+class RateLimitBudget:
+    """Requests left in the current rate-limit window, shared by threads.
+    The budget learns the window from the `X-RateLimit-Remaining` and
+    `X-RateLimit-Reset` headers of every response. Until the first
+    response arrives only one request is let through, to find out how
+    much is left. After that, as many requests run at once as the
+    window allows, minus `reserve` kept for other clients of the same
+    token. Once the window is spent, `acquire` waits for its reset.
+    Responses without the headers, such as HTTP cache hits or servers
+    that do not report a limit, allow `default_concurrency` requests at
+    once until a response with them arrives.
+    """
+
+    def __init__(self, reserve: int = 0,
+                 clock: Callable[[], float] = time.time,
+                 default_concurrency: int = 8) -> None:
+        """Init method of RateLimitBudget"""
+        self.reserve = reserve
+        self.default_concurrency = default_concurrency
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._remaining = None
+        self._reset_at = 0.0
+        self._headerless = False
+        self._in_flight = 0
+        self._stats = {"requests": 0, "waits": 0, "wait_seconds": 0.0,
+                       "rate_limited": 0}
+
+    def stats(self) -> Dict:
+        """Request, wait and rate-limited counts, and the known budget"""
+        with self._condition:
+            return dict(self._stats, remaining=self._remaining,
+                        reset_at=self._reset_at, in_flight=self._in_flight)
+
+    def _available(self) -> bool:
+        """Whether another request fits in the window; needs the lock"""
+        if self._remaining is not None and self._clock() >= self._reset_at:
+            self._remaining = None  # the window has reset
+        if self._remaining is None:
+            limit = self.default_concurrency if self._headerless else 1
+            return self._in_flight < limit
+        return self._remaining - self._in_flight > self.reserve
+
+    def _wait_time(self) -> Optional[float]:
+        """How long to wait for room in the window; needs the lock"""
+        if self._remaining is None:
+            return None  # wait for a request in flight to finish
+        return max(self._reset_at - self._clock(), 0.0)
+
+    def acquire(self) -> None:
+        """Block until a request fits in the budget, then claim it"""
+        with self._condition:
+            if not self._available():
+                self._stats["waits"] += 1
+                start_time = time.monotonic()
+                while not self._available():
+                    self._condition.wait(self._wait_time())
+                self._stats["wait_seconds"] += time.monotonic() - start_time
+            self._in_flight += 1
+            self._stats["requests"] += 1
+
+    def release(self, response: Optional[requests.Response] = None) -> bool:
+        """Return a claimed request and learn the budget from `response`.
+        Pass no response when the request failed without one. Returns
+        True if the server rejected the request for exceeding its rate
+        limit and the window resets in the future, so the caller should
+        `acquire` again, which waits for the reset, and retry.
+        """
+        headers = response.headers if response is not None else {}
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_at = headers.get("X-RateLimit-Reset")
+        limited = (response is not None
+                   and response.status_code in (403, 429)
+                   and remaining == "0")
+        retry = (limited and reset_at is not None
+                 and float(reset_at) > self._clock())
+        with self._condition:
+            self._in_flight -= 1
+            if response is not None and (remaining is None or reset_at is None):
+                self._headerless = True
+            elif remaining is not None and reset_at is not None:
+                remaining, reset_at = int(remaining), float(reset_at)
+                if reset_at > self._reset_at or self._remaining is None:
+                    self._remaining, self._reset_at = remaining, reset_at
+                elif reset_at == self._reset_at:
+                    # Responses finish out of order; the lowest count
+                    # seen for a window is the most recent one.
+                    self._remaining = min(self._remaining, remaining)
+            if limited:
+                self._stats["rate_limited"] += 1
+            self._condition.notify_all()
+        return retry
+
+
+class BatchOrgClient:
+    """Fetch many orgs and their repos concurrently
+    Every request goes through one `RateLimitBudget`, so the whole batch
+    stays within the token's rate limit however many orgs it covers.
+    """
+    MAX_WORKERS = 16
+
+    def __init__(self, org_names: Iterable[str], max_workers: int = None,
+                 budget: RateLimitBudget = None, page_workers: int = 1,
+                 client_class: type = GithubOrgClient) -> None:
+        """Init method of BatchOrgClient
+        Orgs are spread over `max_workers` threads; each org fetches its
+        repo pages with `page_workers` threads of its own.
+        """
+        self.org_names = list(org_names)
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.budget = budget if budget is not None else RateLimitBudget()
+        self.page_workers = page_workers
+        self.client_class = client_class
+
+    def _fetch(self, org_name: str,
+               include_repos: bool) -> GithubOrgClient:
+        """Load one org, and its repos, into a new client"""
+        client = self.client_class(org_name, page_workers=self.page_workers,
+                                   limiter=self.budget)
+        client.org
+        if include_repos:
+            client.repos_payload
+        return client
+
+    def iter_fetch(self, include_repos: bool = True
+                   ) -> Iterator[Tuple[str, Optional[GithubOrgClient],
+                                       Optional[Exception]]]:
+        """Yield `(org_name, client, error)` as each org finishes.
+        The client has `org`, and `repos_payload` with `include_repos`,
+        already memoized; `error` is the exception if the org failed.
+        """
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch, name, include_repos): name
+                for name in self.org_names
+            }
+            for future in as_completed(futures):
+                error = future.exception()
+                client = None if error is not None else future.result()
+                yield futures[future], client, error
+
+    def fetch_all(self, include_repos: bool = True
+                  ) -> Tuple[Dict[str, GithubOrgClient], Dict[str, Exception]]:
+        """Fetch every org, returning `(clients, errors)` keyed by org"""
+        clients, errors = {}, {}
+        for name, client, error in self.iter_fetch(include_repos):
+            if error is not None:
+                errors[name] = error
+            else:
+                clients[name] = client
+        return clients, errors
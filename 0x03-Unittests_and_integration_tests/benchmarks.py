@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the github org client utilities.
+Every benchmark runs against a local stand-in HTTP server, so no network
+access is needed.
+Usage
+-----
+    python3 benchmarks.py session
+    python3 benchmarks.py pages
+    python3 benchmarks.py access
+    python3 benchmarks.py memory
+"""
+import argparse
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Mapping, Sequence
+
+import requests
+
+import utils
+from client import GithubOrgClient
+from fixtures import TEST_PAYLOAD
+from replay_server import ReplayServer
+
+
+@contextmanager
+def local_server(routes: Dict, pages: Dict = None,
+                 latency: float = 0.0) -> Iterator[str]:
+    """Run a local JSON server and yield its base URL.
+    `routes` maps paths to single payloads and `pages` maps paths to
+    lists of page payloads. Every response is delayed by `latency`
+    seconds to stand in for a network round-trip.
+    """
+    with ReplayServer({}, latency=latency) as server:
+        for path, payload in routes.items():
+            server.add_route(path, [payload])
+        for path, payloads in (pages or {}).items():
+            server.add_route(path, payloads)
+        yield server.base_url
+
+
+def _rate(label: str, call: Callable[[], object], count: int) -> float:
+    """Time `count` calls and print the per-call cost.
+    """
+    start_time = time.perf_counter()
+    for _ in range(count):
+        call()
+    elapsed = time.perf_counter() - start_time
+    print("{:<28}{:>8.3f} ms/request".format(label, elapsed / count * 1000))
+    return elapsed
+
+
+def bench_session(count: int) -> None:
+    """Compare a fresh connection per request with the shared session.
+    """
+    org_payload, repos_payload = TEST_PAYLOAD[0][0], TEST_PAYLOAD[0][1]
+    with local_server({"/orgs/google": org_payload,
+                       "/orgs/google/repos": repos_payload}) as base_url:
+        url = base_url + "/orgs/google/repos"
+        utils.get_json(url)
+        unpooled = _rate("requests.get (no session)",
+                         lambda: requests.get(url).json(), count)
+        pooled = _rate("get_json (shared session)",
+                       lambda: utils.get_json(url), count)
+    print("speed-up: {:.1f}x".format(unpooled / pooled))
+
+
+def bench_pages(count: int, page_count: int = 100,
+                latency: float = 0.02) -> None:
+    """Fetch a `page_count`-page repos listing sequentially, then
+    concurrently, from a server with `latency` seconds per response.
+    """
+    repos = TEST_PAYLOAD[0][1]
+    pages = [repos] * page_count
+    # Let every worker keep its own connection to the server.
+    utils.configure_session(pool_maxsize=page_count)
+    with local_server({}, {"/orgs/big/repos": pages}, latency) as base_url:
+        url = base_url + "/orgs/big/repos"
+        print("{} pages, {:.0f}ms per response".format(
+            page_count, latency * 1000))
+        for workers in (1, 8, 32, page_count):
+            start_time = time.perf_counter()
+            fetched = sum(1 for _ in utils.get_json_pages(url, workers))
+            elapsed = time.perf_counter() - start_time
+            print("{:>4} worker(s): {:>7.3f}s for {} pages".format(
+                workers, elapsed, fetched))
+
+
+def _loop_access(nested_map: Mapping, path: Sequence) -> Any:
+    """The original access_nested_map, kept as the baseline"""
+    for key in path:
+        if not isinstance(nested_map, Mapping):
+            raise KeyError(key)
+        nested_map = nested_map[key]
+    return nested_map
+
+
+def bench_access(count: int, scale: int = 1000) -> None:
+    """Read `license.key` from every repo of a scaled-up payload with the
+    original loop, `access_nested_map`, a compiled getter and
+    `extract_many`. `count` is the number of passes over the payload.
+    """
+    repos = TEST_PAYLOAD[0][1] * scale
+    path = ("license", "key")
+    getter = utils.compile_path(path, default=None)
+
+    def with_default(access: Callable) -> Callable[[], list]:
+        """Collect keys, mapping a missing path to None"""
+        def run() -> list:
+            keys = []
+            for repo in repos:
+                try:
+                    keys.append(access(repo, path))
+                except KeyError:
+                    keys.append(None)
+            return keys
+        return run
+
+    expected = with_default(_loop_access)()
+    candidates = [
+        ("loop (original)", with_default(_loop_access)),
+        ("access_nested_map", with_default(utils.access_nested_map)),
+        ("compile_path getter", lambda: [getter(repo) for repo in repos]),
+        ("extract_many", lambda: utils.extract_many(repos, path)),
+    ]
+    print("{} repos, {} passes".format(len(repos), count))
+    baseline = None
+    for label, run in candidates:
+        assert run() == expected, label
+        start_time = time.perf_counter()
+        for _ in range(count):
+            run()
+        elapsed = time.perf_counter() - start_time
+        baseline = baseline or elapsed
+        print("{:<22}{:>8.1f} ns/lookup{:>7.1f}x".format(
+            label, elapsed / (count * len(repos)) * 1e9, baseline / elapsed))
+
+
+def bench_memory(count: int) -> None:
+    """Peak Python memory of listing repo names and licenses from one
+    page of `count` copies of the fixture repos, decoded whole with
+    `json()` and then streamed with only the fields public_repos reads.
+    """
+    repos = TEST_PAYLOAD[0][1] * count
+    fields = GithubOrgClient.REPO_FIELDS
+    with local_server({"/orgs/big/repos": repos}) as base_url:
+        url = base_url + "/orgs/big/repos"
+        size = len(utils.get_response(url).content)
+        print("{} repos, {:.1f} MB of JSON".format(len(repos), size / 2 ** 20))
+        for label, options in (("json()", {}), ("streamed", {"fields": fields})):
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            names = [(repo["name"], GithubOrgClient.license_key(repo))
+                     for page in utils.get_json_pages(url, **options)
+                     for repo in page]
+            elapsed = time.perf_counter() - start_time
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("{:<10}{:>8.1f} MB peak{:>8.3f}s  {} repos".format(
+                label, peak / 2 ** 20, elapsed, len(names)))
+
+
+BENCHMARKS = {
+    "access": bench_access,
+    "memory": bench_memory,
+    "pages": bench_pages,
+    "session": bench_session,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client micro-benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("-n", "--count", type=int, default=500)
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args.count)
@@ -2,51 +2,126 @@
 """A github org client
 """
 from typing import (
+    Any,
     List,
     Dict,
+    Iterator,
+    Optional,
+    Sequence,
 )
 
 from utils import (
     get_json,
+    get_json_pages,
     access_nested_map,
+    compile_path,
     memoize,
 )
 
+_license_key = compile_path(("license", "key"), default=None)
+
 
 class GithubOrgClient:
     """A Githib org client
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
+    PAGE_WORKERS = 8
+    PAGE_RETRIES = 2
+    # The only repo fields public_repos reads when streaming.
+    REPO_FIELDS = ("name", "license.key")
 
-    def __init__(self, org_name: str) -> None:
-        """Init method of GithubOrgClient"""
+    def __init__(self, org_name: str, page_workers: int = None,
+                 page_retries: int = None, limiter: Any = None) -> None:
+        """Init method of GithubOrgClient
+        `page_workers` threads fetch the pages of the repos listing
+        concurrently and each page is retried up to `page_retries` times.
+        Every request waits for room in `limiter`, if given, instead of
+        the process-wide rate limiter.
+        """
         self._org_name = org_name
+        self._page_workers = (
+            self.PAGE_WORKERS if page_workers is None else page_workers)
+        self._page_retries = (
+            self.PAGE_RETRIES if page_retries is None else page_retries)
+        self._limiter = limiter
 
     @memoize
     def org(self) -> Dict:
         """Memoize org"""
-        return get_json(self.ORG_URL.format(org=self._org_name))
+        url = self.ORG_URL.format(org=self._org_name)
+        return get_json(url, limiter=self._limiter)
 
     @property
     def _public_repos_url(self) -> str:
         """Public repos URL"""
         return self.org["repos_url"]
 
+    def _repos_pages(self, fields: Sequence[str] = None) -> Iterator[List[Dict]]:
+        """Pages of the repos listing, in order
+        With `fields`, pages are streamed and only those fields are kept.
+        """
+        options = {"max_workers": self._page_workers,
+                   "retries": self._page_retries,
+                   "limiter": self._limiter}
+        if fields is not None:
+            options["fields"] = fields
+        return get_json_pages(self._public_repos_url, **options)
+
     @memoize
-    def repos_payload(self) -> Dict:
-        """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+    def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload, across every page"""
+        return [repo for page in self._repos_pages() for repo in page]
+
+    def iter_repos(self, fields: Sequence[str] = None) -> Iterator[Dict]:
+        """Repos, fetched lazily page by page and never memoized
+        `fields` are dotted paths such as `"license.key"`; when given,
+        each page is parsed as a stream and every other field is dropped.
+        """
+        for page in self._repos_pages(fields):
+            yield from page
+
+    def iter_public_repos(self, license: str = None) -> Iterator[str]:
+        """Public repo names, fetched lazily page by page"""
+        for repo in self.iter_repos(self.REPO_FIELDS):
+            if license is None or self.has_license(repo, license):
+                yield repo["name"]
 
-    def public_repos(self, license: str = None) -> List[str]:
-        """Public repos"""
+    def public_repos(self, license: str = None,
+                     bounded_memory: bool = False) -> List[str]:
+        """Public repos
+        With `bounded_memory`, pages are streamed instead of memoized, so
+        only the current page and the names are ever held in memory.
+        """
+        if bounded_memory:
+            return list(self.iter_public_repos(license))
+        if license is not None:
+            return list(self.license_index.get(license, ()))
         json_payload = self.repos_payload
-        public_repos = [
-            repo["name"] for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+        public_repos = [repo["name"] for repo in json_payload]
 
         return public_repos
 
+    @property
+    def license_index(self) -> Dict[Optional[str], List[str]]:
+        """Repo names by license key, built in one pass over the payload
+        The index is rebuilt only when `repos_payload` is a different
+        object, so any number of license lookups cost one scan.
+        """
+        payload = self.repos_payload
+        cached = getattr(self, "_license_index", None)
+        if cached is None or cached[0] is not payload:
+            index = {}
+            for repo in payload:
+                index.setdefault(self.license_key(repo), []).append(repo["name"])
+            cached = (payload, index)
+            self._license_index = cached
+        return cached[1]
+
+    @staticmethod
+    def license_key(repo: Dict[str, Dict]) -> Optional[str]:
+        """Static: license key of a repo, None if it has no license"""
+        return _license_key(repo)
+
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Persistent, conditional-request HTTP cache for get_json.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import (
+    Dict,
+    Optional,
+)
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+__all__ = [
+    "HTTPCache",
+]
+
+# Response headers kept with a cached body and replayed when it is served.
+_STORED_HEADERS = (
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    "Cache-Control",
+    "Link",
+)
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age=(\d+)")
+
+
+def _freshness(headers: CaseInsensitiveDict) -> Optional[float]:
+    """Return how many seconds a response may be served without
+    revalidation, or None if it must not be stored at all.
+    """
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    return float(match.group(1)) if match else 0.0
+
+
+class HTTPCache:
+    """An on-disk cache of GET responses, keyed by URL.
+    Bodies are stored as files next to a small SQLite index. A response
+    still within its `max-age` is a hit and served without a request.
+    Past that, the stored `ETag`/`Last-Modified` are sent back as
+    `If-None-Match`/`If-Modified-Since`. A `304 Not Modified` reply is a
+    revalidation and the body comes from disk. Anything else is a miss.
+    When the bodies outgrow `max_bytes`, the least recently used entries
+    are evicted.
+    The key is the URL alone: `Vary` is ignored, so do not share one
+    cache directory between different credentials.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 100 * 1024 * 1024) -> None:
+        """Init method of HTTPCache"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"),
+                                   check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, url TEXT, headers TEXT, size INTEGER,"
+            " expires_at REAL, last_access REAL)"
+        )
+        self._db.commit()
+        self._stats = {"hits": 0, "revalidations": 0, "misses": 0,
+                       "evictions": 0}
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, revalidation, miss and eviction counts, plus the bytes
+        currently stored"""
+        with self._lock:
+            stored = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            return dict(self._stats, bytes=stored)
+
+    def _count(self, name: str) -> None:
+        """Increment one of the statistics"""
+        with self._lock:
+            self._stats[name] += 1
+
+    def _body_path(self, key: str) -> str:
+        """Path of the file holding the body of an entry"""
+        return os.path.join(self.directory, key + ".body")
+
+    def _lookup(self, key: str) -> Optional[tuple]:
+        """(headers, expires_at) of an entry whose body is on disk"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT headers, expires_at FROM entries WHERE key = ?",
+                (key,)).fetchone()
+        if row is None or not os.path.exists(self._body_path(key)):
+            return None
+        return CaseInsensitiveDict(json.loads(row[0])), row[1]
+
+    def _cached_response(self, key: str, url: str,
+                         headers: CaseInsensitiveDict,
+                         status: str) -> requests.Response:
+        """Rebuild a response from the stored body and headers"""
+        with open(self._body_path(key), "rb") as body:
+            content = body.read()
+        with self._lock:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?",
+                             (time.time(), key))
+            self._db.commit()
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(headers)
+        response.headers["X-Cache"] = status
+        response.encoding = "utf-8"
+        response._content = content
+        response._content_consumed = True
+        return response
+
+    def _store(self, key: str, url: str, response: requests.Response,
+               max_age: float) -> None:
+        """Write a response body to disk and record it in the index"""
+        headers = {name: response.headers[name]
+                   for name in _STORED_HEADERS if name in response.headers}
+        body = response.content
+        temp_path = self._body_path(key) + ".tmp{}-{}".format(
+            os.getpid(), threading.get_ident())
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(body)
+        os.replace(temp_path, self._body_path(key))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, json.dumps(headers), len(body), now + max_age, now))
+            self._db.commit()
+        self._evict()
+
+    def _refresh(self, key: str, headers: CaseInsensitiveDict,
+                 response: requests.Response) -> CaseInsensitiveDict:
+        """Merge the headers of a 304 into an entry and extend its life"""
+        for name in _STORED_HEADERS:
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        max_age = _freshness(headers) or 0.0
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET headers = ?, expires_at = ? WHERE key = ?",
+                (json.dumps(dict(headers)), time.time() + max_age, key))
+            self._db.commit()
+        return headers
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under the size budget"""
+        with self._lock:
+            total = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._db.execute(
+                    "SELECT key, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE key = ?",
+                                 ((key,) for key in victims))
+            self._db.commit()
+            self._stats["evictions"] += len(victims)
+        for key in victims:
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+
+    def fetch(self, session: requests.Session, url: str,
+              timeout=None) -> requests.Response:
+        """GET `url` through the cache"""
+        key = hashlib.sha256(url.encode()).hexdigest()
+        entry = self._lookup(key)
+        request_headers = {}
+        if entry is not None:
+            headers, expires_at = entry
+            if time.time() < expires_at:
+                try:
+                    response = self._cached_response(key, url, headers, "HIT")
+                except FileNotFoundError:
+                    # Evicted by another thread since the lookup.
+                    return self.fetch(session, url, timeout)
+                self._count("hits")
+                return response
+            if "ETag" in headers:
+                request_headers["If-None-Match"] = headers["ETag"]
+            if "Last-Modified" in headers:
+                request_headers["If-Modified-Since"] = headers["Last-Modified"]
+
+        response = session.get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            headers = self._refresh(key, entry[0], response)
+            try:
+                response = self._cached_response(key, url, headers,
+                                                 "REVALIDATED")
+            except FileNotFoundError:
+                # Evicted by another thread while revalidating, so the
+                # 304 has no body to stand for: fetch it in full.
+                response = session.get(url, timeout=timeout)
+            else:
+                self._count("revalidations")
+                return response
+
+        self._count("misses")
+        max_age = _freshness(response.headers)
+        validated = ("ETag" in response.headers
+                     or "Last-Modified" in response.headers)
+        if response.status_code == 200 and max_age is not None and (
+                validated or max_age > 0):
+            self._store(key, url, response, max_age)
+        return response
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT key FROM entries")]
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+        for key in keys:
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """Close the index"""
+        with self._lock:
+            self._db.close()
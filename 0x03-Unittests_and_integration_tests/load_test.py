@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Load test of GithubOrgClient against the offline replay backend.
+Each operation builds a fresh client for one org and lists its public
+repos, filtered by license every other time. Operations run on a thread
+pool at each concurrency level; the report gives throughput and the
+p50/p95/p99 latency of an operation, plus failed operations.
+Usage
+-----
+    python3 load_test.py --concurrency 1,8,32 --operations 200
+    python3 load_test.py --synthetic 20 --repos 500 --latency 0.02 \\
+        --error-rate 0.01
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+import utils
+from replay_server import ReplayServer, fixture_orgs, synthetic_org
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_level(client_class: type, org_names: List[str], concurrency: int,
+              operations: int, page_workers: int) -> Dict:
+    """Run `operations` operations `concurrency` at a time"""
+    def operation(i: int) -> float:
+        client = client_class(org_names[i % len(org_names)],
+                              page_workers=page_workers)
+        begin = time.perf_counter()
+        client.public_repos("apache-2.0" if i % 2 else None)
+        return time.perf_counter() - begin
+
+    def safe(i: int):
+        try:
+            return operation(i)
+        except Exception:
+            return None
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(safe, range(operations)))
+    wall = time.perf_counter() - start_time
+    latencies = sorted(r for r in results if r is not None)
+    return {
+        "concurrency": concurrency,
+        "operations": operations,
+        "failed": operations - len(latencies),
+        "ops_per_s": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def run(server: ReplayServer, org_names: List[str],
+        levels: Sequence[int], operations: int,
+        page_workers: int) -> List[Dict]:
+    """Run every concurrency level against `server`"""
+    client_class = server.client_class()
+    # Let every thread keep its own connection to the server.
+    utils.configure_session(pool_maxsize=max(levels) * max(page_workers, 1))
+    run_level(client_class, org_names, 1, len(org_names), page_workers)
+    return [run_level(client_class, org_names, level, operations, page_workers)
+            for level in levels]
+
+
+def print_report(results: List[Dict], stats: Dict) -> None:
+    """Print the results as a table"""
+    print("{:>6}{:>8}{:>8}{:>10}{:>10}{:>10}{:>10}".format(
+        "conc", "ops", "failed", "ops/s", "p50 ms", "p95 ms", "p99 ms"))
+    for r in results:
+        print("{concurrency:>6}{operations:>8}{failed:>8}{ops_per_s:>10.1f}"
+              "{p50_ms:>10.2f}{p95_ms:>10.2f}{p99_ms:>10.2f}".format(**r))
+    print("server: {requests} requests, {errors} injected errors".format(
+        **stats))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GithubOrgClient load test")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--operations", type=int, default=200,
+                        help="operations per concurrency level")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="synthetic orgs to add to the recorded ones")
+    parser.add_argument("--repos", type=int, default=300,
+                        help="repos per synthetic org")
+    parser.add_argument("--per-page", type=int, default=30)
+    parser.add_argument("--page-workers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", metavar="PATH",
+                        help="also write the results to a JSON file")
+    args = parser.parse_args()
+
+    orgs = fixture_orgs()
+    for i in range(args.synthetic):
+        name = "synthetic{}".format(i)
+        orgs[name] = synthetic_org(name, args.repos, seed=i)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    with ReplayServer(orgs, args.per_page, args.latency, args.jitter,
+                      args.error_rate) as server:
+        results = run(server, list(orgs), levels, args.operations,
+                      args.page_workers)
+        stats = server.stats()
+    print_report(results, stats)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results,
+                       "server": stats}, f, indent=2)
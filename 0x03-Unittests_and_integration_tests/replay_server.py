@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Offline replay of the GitHub org API, served from recorded payloads.
+The orgs come from `fixtures.TEST_PAYLOAD`, optionally joined by
+synthetic orgs scaled up from it, so the client can be load-tested and
+benchmarked without network access.
+Usage
+-----
+    python3 replay_server.py --synthetic 10 --repos 300 --latency 0.02
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from client import GithubOrgClient
+from fixtures import TEST_PAYLOAD
+
+__all__ = [
+    "ReplayServer",
+    "fixture_orgs",
+    "synthetic_org",
+]
+
+# (org payload, repos payload) of one recorded org.
+OrgRecord = Tuple[Dict, List[Dict]]
+
+
+def fixture_orgs() -> Dict[str, OrgRecord]:
+    """The orgs recorded in `TEST_PAYLOAD`, keyed by name"""
+    return {org["repos_url"].rstrip("/").split("/")[-2]: (org, repos)
+            for org, repos, _, _ in TEST_PAYLOAD}
+
+
+def synthetic_org(name: str, repo_count: int, seed: int = 0) -> OrgRecord:
+    """An org of `repo_count` repos cloned from the recorded ones.
+    Repos get unique names and ids, and licenses are reshuffled with
+    `seed`, so the same arguments always give the same org.
+    """
+    org, repos = deepcopy(TEST_PAYLOAD[0][0]), TEST_PAYLOAD[0][1]
+    licenses = [repo["license"] for repo in repos]
+    rng = random.Random(seed)
+    scaled = []
+    for i in range(repo_count):
+        repo = deepcopy(repos[i % len(repos)])
+        repo.update(id=i + 1, name="{}-repo{}".format(name, i),
+                    full_name="{}/{}-repo{}".format(name, name, i),
+                    license=rng.choice(licenses))
+        scaled.append(repo)
+    return org, scaled
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    """Serve the routes of a `ReplayServer` over keep-alive HTTP/1.1.
+    A route holding several pages is served GitHub style: `?page=N`
+    selects the page and `Link` headers point to the next and last ones.
+    """
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment; otherwise Nagle's algorithm
+    # and delayed ACKs add ~40ms to every request on a reused connection.
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_GET(self) -> None:
+        """Handle GET"""
+        replay = self.server.replay
+        parts = urlsplit(self.path)
+        pages = replay.routes.get(parts.path)
+        page = int(parse_qs(parts.query).get("page", ["1"])[0])
+        delay, fail = replay._next_request()
+        time.sleep(delay)
+        if fail:
+            self._send(500, b'{"message": "Server Error"}', {})
+            return
+        if pages is None or not 1 <= page <= len(pages):
+            self._send(404, b'{"message": "Not Found"}', {})
+            return
+        body, etag = pages[page - 1]
+        headers = {"ETag": etag}
+        if len(pages) > 1:
+            url = "{}{}?page=".format(replay.base_url, parts.path)
+            links = ['<{}{}>; rel="last"'.format(url, len(pages))]
+            if page < len(pages):
+                links.insert(0, '<{}{}>; rel="next"'.format(url, page + 1))
+            headers["Link"] = ", ".join(links)
+        if self.headers.get("If-None-Match") == etag:
+            replay._count("not_modified")
+            self._send(304, b"", headers)
+            return
+        self._send(200, body, headers)
+
+    def _send(self, status: int, body: bytes, headers: Dict) -> None:
+        """Write one response"""
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Keep replay output quiet"""
+
+
+class ReplayServer:
+    """A local HTTP server replaying recorded org payloads.
+    Every response waits `latency` seconds, plus up to `jitter` more,
+    and fails with a 500 with probability `error_rate`. Repos listings
+    are split into pages of `per_page` repos with `Link` headers, and
+    every page has an `ETag` honoured by `If-None-Match`.
+    """
+
+    def __init__(self, orgs: Optional[Dict[str, OrgRecord]] = None,
+                 per_page: int = 30, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 0) -> None:
+        """Init method of ReplayServer
+        `orgs` defaults to `fixture_orgs()`.
+        """
+        self.per_page = per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.routes = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "not_modified": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ReplayHandler)
+        self._server.daemon_threads = True
+        self._server.replay = self
+        self._thread = None
+        self.base_url = "http://127.0.0.1:{}".format(
+            self._server.server_address[1])
+        if orgs is None:
+            orgs = fixture_orgs()
+        for name, (org, repos) in orgs.items():
+            self.add_org(name, org, repos)
+
+    @property
+    def org_url(self) -> str:
+        """`ORG_URL` template pointing at this server"""
+        return self.base_url + "/orgs/{org}"
+
+    def client_class(self) -> type:
+        """A `GithubOrgClient` subclass talking to this server"""
+        return type("ReplayOrgClient", (GithubOrgClient,),
+                    {"ORG_URL": self.org_url})
+
+    def add_route(self, path: str, pages: Sequence) -> None:
+        """Serve the JSON `pages` at `path`, one page per `?page=N`"""
+        encoded = []
+        for page in pages:
+            body = json.dumps(page).encode()
+            encoded.append((body, '"{}"'.format(hashlib.sha1(body).hexdigest())))
+        self.routes[path] = encoded
+
+    def add_org(self, name: str, org: Dict, repos: List[Dict]) -> None:
+        """Serve an org and its repos, paged by `per_page`"""
+        path = "/orgs/{}/repos".format(name)
+        org = dict(org, repos_url=self.base_url + path)
+        self.add_route("/orgs/{}".format(name), [org])
+        pages = [repos[i:i + self.per_page]
+                 for i in range(0, len(repos), self.per_page)]
+        self.add_route(path, pages or [[]])
+
+    def _count(self, name: str) -> None:
+        """Increment one of the statistics"""
+        with self._lock:
+            self._stats[name] += 1
+
+    def _next_request(self) -> Tuple[float, bool]:
+        """Count a request and draw its (delay, fail) from the seed"""
+        with self._lock:
+            self._stats["requests"] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self._stats["errors"] += 1
+        return delay, fail
+
+    def stats(self) -> Dict[str, int]:
+        """Request, injected error and `304 Not Modified` counts"""
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self) -> "ReplayServer":
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "ReplayServer":
+        """Start on entering a `with` block"""
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop on leaving a `with` block"""
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the GitHub org API")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="number of synthetic orgs to add")
+    parser.add_argument("--repos", type=int, default=300,
+                        help="repos per synthetic org")
+    parser.add_argument("--per-page", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    orgs = fixture_orgs()
+    for i in range(args.synthetic):
+        name = "synthetic{}".format(i)
+        orgs[name] = synthetic_org(name, args.repos, seed=i)
+    with ReplayServer(orgs, args.per_page, args.latency, args.jitter,
+                      args.error_rate) as server:
+        for name in orgs:
+            print(server.org_url.format(org=name))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Tests for the `batch_client.py` module, run against a local mock of the
+GitHub API that enforces a rate limit.
+"""
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+import utils
+from batch_client import BatchOrgClient, RateLimitBudget
+from client import GithubOrgClient
+
+
+class _RateLimitedHandler(BaseHTTPRequestHandler):
+    """Serve `/orgs/<org>` and `/orgs/<org>/repos` under a rate limit."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_GET(self) -> None:
+        """Handle GET"""
+        server = self.server
+        with server.lock:
+            now = time.time()
+            if now >= server.reset_at:
+                server.reset_at, server.remaining = now + server.window, server.limit
+            allowed = server.remaining > 0
+            if allowed:
+                server.remaining -= 1
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            else:
+                server.rejected += 1
+            remaining, reset_at = server.remaining, server.reset_at
+        if allowed:
+            time.sleep(0.01)
+            status, payload = self._route()
+            with server.lock:
+                server.in_flight -= 1
+        else:
+            status, payload = 403, {"message": "API rate limit exceeded"}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if server.rate_limit_headers:
+            self.send_header("X-RateLimit-Remaining", str(remaining))
+            self.send_header("X-RateLimit-Reset", repr(reset_at))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> tuple:
+        """(status, payload) for the requested path"""
+        parts = self.path.strip("/").split("/")
+        if len(parts) < 2 or parts[1].startswith("missing"):
+            return 404, {"message": "Not Found"}
+        base = "http://{}:{}".format(*self.server.server_address)
+        if len(parts) == 2:
+            return 200, {"repos_url": "{}/orgs/{}/repos".format(base, parts[1])}
+        return 200, [{"name": "{}-repo{}".format(parts[1], i)} for i in range(3)]
+
+    def log_message(self, format: str, *args) -> None:
+        """Keep test output quiet"""
+
+
+class TestBatchOrgClient(unittest.TestCase):
+    """Integration tests for `BatchOrgClient` against a mock server."""
+
+    def start_server(self, limit: int, window: float,
+                     headers: bool = True) -> ThreadingHTTPServer:
+        """
+        Start a mock API allowing `limit` requests per `window` seconds,
+        reporting the budget in `X-RateLimit-*` headers with `headers`.
+        """
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _RateLimitedHandler)
+        server.daemon_threads = True
+        server.rate_limit_headers = headers
+        server.lock = threading.Lock()
+        server.limit, server.window = limit, window
+        server.remaining, server.reset_at = limit, time.time() + window
+        server.in_flight = server.max_in_flight = server.rejected = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        class LocalOrgClient(GithubOrgClient):
+            """GithubOrgClient pointed at the mock server."""
+            ORG_URL = "http://{}:{}/orgs/{{org}}".format(*server.server_address)
+        self.client_class = LocalOrgClient
+        return server
+
+    def test_fetches_every_org_concurrently(self) -> None:
+        """Tests that orgs and repos are fetched in parallel."""
+        server = self.start_server(limit=1000, window=60)
+        names = ["org{}".format(i) for i in range(20)]
+        batch = BatchOrgClient(names, max_workers=8,
+                               client_class=self.client_class)
+        clients, errors = batch.fetch_all()
+
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(clients), sorted(names))
+        self.assertEqual(clients["org3"].public_repos(),
+                         ["org3-repo0", "org3-repo1", "org3-repo2"])
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertEqual(batch.budget.stats()["requests"], 40)
+        self.assertEqual(server.rejected, 0)
+
+    def test_waits_for_reset_instead_of_tripping_limit(self) -> None:
+        """
+        Tests that a batch larger than the window waits for its reset
+        rather than getting rate-limited.
+        """
+        server = self.start_server(limit=10, window=0.5)
+        names = ["org{}".format(i) for i in range(8)]
+        batch = BatchOrgClient(names, max_workers=8,
+                               budget=RateLimitBudget(reserve=1),
+                               client_class=self.client_class)
+        clients, errors = batch.fetch_all()
+
+        self.assertEqual((len(clients), errors), (8, {}))
+        self.assertEqual(server.rejected, 0)
+        self.assertGreater(batch.budget.stats()["waits"], 0)
+        self.assertIsNone(utils.configure_rate_limit(None))
+
+    def test_runs_concurrently_without_rate_limit_headers(self) -> None:
+        """
+        Tests that a server that never reports its budget does not keep
+        the batch to one request at a time.
+        """
+        server = self.start_server(limit=1000, window=60, headers=False)
+        names = ["org{}".format(i) for i in range(16)]
+        batch = BatchOrgClient(names, max_workers=8,
+                               budget=RateLimitBudget(default_concurrency=4),
+                               client_class=self.client_class)
+        clients, errors = batch.fetch_all()
+
+        self.assertEqual((len(clients), errors), (16, {}))
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, 4)
+
+    def test_reports_failed_orgs(self) -> None:
+        """Tests that an org that fails does not stop the others."""
+        self.start_server(limit=100, window=60)
+        batch = BatchOrgClient(["org1", "missing"],
+                               client_class=self.client_class)
+        clients, errors = batch.fetch_all()
+        self.assertEqual(list(clients), ["org1"])
+        self.assertIsInstance(errors["missing"], KeyError)
+
+
+class TestRateLimitBudget(unittest.TestCase):
+    """Unit tests for the `RateLimitBudget` class."""
+
+    @staticmethod
+    def response(status: int, remaining: int, reset_at: float) -> Mock:
+        """A response carrying rate-limit headers."""
+        return Mock(status_code=status, headers={
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset_at)})
+
+    def test_keeps_lowest_remaining_of_a_window(self) -> None:
+        """
+        Tests that out-of-order responses cannot raise the remaining count
+        within the same window, but a new window replaces it.
+        """
+        budget = RateLimitBudget(clock=lambda: 100.0)
+        budget.acquire()
+        budget.release(self.response(200, 6, 160))
+        budget.acquire()
+        budget.acquire()
+        budget.release(self.response(200, 5, 160))
+        budget.release(self.response(200, 7, 160))
+        self.assertEqual(budget.stats()["remaining"], 5)
+        budget.acquire()
+        budget.release(self.response(200, 59, 220))
+        self.assertEqual(budget.stats()["remaining"], 59)
+        self.assertEqual(budget.stats()["in_flight"], 0)
+
+    def test_rate_limited_response_asks_for_retry(self) -> None:
+        """Tests that a 403 with no requests remaining asks for a retry."""
+        now = [100.0]
+        budget = RateLimitBudget(clock=lambda: now[0])
+        budget.acquire()
+        self.assertTrue(budget.release(self.response(403, 0, 160)))
+        now[0] = 160.0
+        budget.acquire()
+        self.assertFalse(budget.release(self.response(404, 3, 160)))
+        self.assertEqual(budget.stats()["rate_limited"], 1)
+
+    def test_headerless_responses_allow_default_concurrency(self) -> None:
+        """
+        Tests that one probe runs alone, but after a response without
+        rate-limit headers up to `default_concurrency` run at once.
+        """
+        budget = RateLimitBudget(default_concurrency=3)
+        budget.acquire()
+        with budget._condition:
+            self.assertFalse(budget._available())
+        budget.release(Mock(status_code=200, headers={}))
+        for _ in range(3):
+            budget.acquire()
+        with budget._condition:
+            self.assertFalse(budget._available())
+        self.assertEqual(budget.stats()["waits"], 0)
+
+    def test_stale_reset_does_not_ask_for_retry(self) -> None:
+        """
+        Tests that a 403 whose window already reset is not retried, since
+        waiting for the reset would not wait at all.
+        """
+        budget = RateLimitBudget(clock=lambda: 200.0)
+        budget.acquire()
+        self.assertFalse(budget.release(self.response(403, 0, 160)))
+        self.assertEqual(budget.stats()["rate_limited"], 1)
+
+    def test_get_response_caps_rate_limit_retries(self) -> None:
+        """
+        Tests that a request the limiter keeps rejecting is sent at most
+        RATE_LIMIT_RETRIES more times, then returned as is.
+        """
+        limiter = Mock()
+        limiter.release.return_value = True
+        rejected = Mock(status_code=429)
+        with patch('utils._send', return_value=rejected) as mock_send:
+            response = utils.get_response("http://example.com",
+                                          limiter=limiter)
+        self.assertIs(response, rejected)
+        self.assertEqual(mock_send.call_count, utils.RATE_LIMIT_RETRIES + 1)
+        self.assertEqual(limiter.acquire.call_count,
+                         utils.RATE_LIMIT_RETRIES + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -25,7 +25,7 @@ class TestGithubOrgClient(unittest.TestCase):
         test_client = GithubOrgClient(org_name)
         test_client.org()
         mock_get_json.assert_called_once_with(
-            f"https://api.github.com/orgs/{org_name}"
+            f"https://api.github.com/orgs/{org_name}", limiter=None
         )
 
     def test_public_repos_url(self) -> None:
@@ -38,11 +38,11 @@ class TestGithubOrgClient(unittest.TestCase):
             result = test_client._public_repos_url
             self.assertEqual(result, "http://example.com/repos")
 
-    @patch('client.get_json')
-    def test_public_repos(self, mock_get_json: Mock) -> None:
+    @patch('client.get_json_pages')
+    def test_public_repos(self, mock_get_json_pages: Mock) -> None:
         """Tests the `public_repos` method with a mocked payload."""
         test_payload = [{"name": "repo1"}, {"name": "repo2"}]
-        mock_get_json.return_value = test_payload
+        mock_get_json_pages.return_value = iter([test_payload])
 
         with patch('client.GithubOrgClient._public_repos_url',
                    new_callable=PropertyMock) as mock_public_repos_url:
@@ -50,7 +50,82 @@ class TestGithubOrgClient(unittest.TestCase):
             test_client = GithubOrgClient("test_org")
             self.assertEqual(test_client.public_repos(), ["repo1", "repo2"])
             mock_public_repos_url.assert_called_once()
-            mock_get_json.assert_called_once_with("http://example.com/repos")
+            mock_get_json_pages.assert_called_once_with(
+                "http://example.com/repos",
+                max_workers=GithubOrgClient.PAGE_WORKERS,
+                retries=GithubOrgClient.PAGE_RETRIES,
+                limiter=None)
+
+    @patch('client.get_json_pages')
+    def test_public_repos_across_pages(self, mock_get_json_pages: Mock) -> None:
+        """Tests that `public_repos` returns repos from every page."""
+        pages = [
+            [{"name": "repo1", "license": {"key": "mit"}}],
+            [{"name": "repo2"}, {"name": "repo3", "license": {"key": "mit"}}],
+        ]
+        mock_get_json_pages.side_effect = lambda url, **kwargs: iter(pages)
+
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock,
+                   return_value="http://example.com/repos"):
+            test_client = GithubOrgClient("test_org")
+            self.assertEqual(test_client.public_repos(),
+                             ["repo1", "repo2", "repo3"])
+            self.assertEqual(
+                test_client.public_repos(license="mit", bounded_memory=True),
+                ["repo1", "repo3"])
+
+    @patch('client.get_json_pages')
+    def test_iter_public_repos_is_lazy(self, mock_get_json_pages: Mock) -> None:
+        """Tests that `iter_public_repos` only fetches pages on demand."""
+        fetched = []
+
+        def pages(url, **kwargs):
+            for page in ([{"name": "repo1"}], [{"name": "repo2"}]):
+                fetched.append(page)
+                yield page
+        mock_get_json_pages.side_effect = pages
+
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock,
+                   return_value="http://example.com/repos"):
+            repos = GithubOrgClient("test_org").iter_public_repos()
+            self.assertEqual(next(repos), "repo1")
+            self.assertEqual(len(fetched), 1)
+            self.assertEqual(list(repos), ["repo2"])
+            mock_get_json_pages.assert_called_once_with(
+                "http://example.com/repos",
+                max_workers=GithubOrgClient.PAGE_WORKERS,
+                retries=GithubOrgClient.PAGE_RETRIES,
+                limiter=None,
+                fields=GithubOrgClient.REPO_FIELDS)
+
+    def test_license_index_is_built_once(self) -> None:
+        """
+        Tests that license lookups share one index, rebuilt only when the
+        repos payload changes.
+        """
+        payload = [
+            {"name": "repo1", "license": {"key": "mit"}},
+            {"name": "repo2", "license": None},
+            {"name": "repo3", "license": {"key": "apache-2.0"}},
+            {"name": "repo4", "license": {"key": "mit"}},
+        ]
+        with patch('client.GithubOrgClient.repos_payload',
+                   new_callable=PropertyMock, return_value=payload), \
+                patch.object(GithubOrgClient, 'license_key',
+                             wraps=GithubOrgClient.license_key) as mock_key:
+            test_client = GithubOrgClient("test_org")
+            self.assertEqual(test_client.public_repos("mit"), ["repo1", "repo4"])
+            self.assertEqual(test_client.public_repos("apache-2.0"), ["repo3"])
+            self.assertEqual(test_client.public_repos("gpl-3.0"), [])
+            self.assertEqual(mock_key.call_count, len(payload))
+
+        changed = payload + [{"name": "repo5", "license": {"key": "mit"}}]
+        with patch('client.GithubOrgClient.repos_payload',
+                   new_callable=PropertyMock, return_value=changed):
+            self.assertEqual(test_client.public_repos("mit"),
+                             ["repo1", "repo4", "repo5"])
 
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
@@ -75,14 +150,18 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
     """
     @classmethod
     def setUpClass(cls) -> None:
-        """Set up the class by patching `requests.get` with a side effect."""
+        """
+        Set up the class by patching `requests.Session.get` with a side effect.
+        """
         
-        def side_effect(url):
+        def side_effect(url, **kwargs):
             """
             Defines the side effect for the mock. It returns different
             payloads based on the URL that is requested.
             """
             mock_response = Mock()
+            mock_response.links = {}
+            mock_response.status_code = 200
             # The org name is hardcoded to 'google' in the fixture
             org_url = "https://api.github.com/orgs/google"
             
@@ -95,7 +174,7 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
                 mock_response.status_code = 404
             return mock_response
 
-        cls.get_patcher = patch('requests.get', side_effect=side_effect)
+        cls.get_patcher = patch('requests.Session.get', side_effect=side_effect)
         cls.mock_get = cls.get_patcher.start()
 
     @classmethod
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the `http_cache.py` module.
+"""
+import shutil
+import tempfile
+import unittest
+from typing import Dict
+from unittest.mock import Mock, patch
+
+import utils
+from http_cache import HTTPCache
+
+
+def make_response(status: int, body: bytes = b"", headers: Dict = None) -> Mock:
+    """Build a mock `requests.Response`."""
+    response = Mock()
+    response.status_code = status
+    response.content = body
+    response.headers = headers or {}
+    return response
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Unit tests for the `HTTPCache` class."""
+
+    def setUp(self) -> None:
+        """Create a cache in a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.cache = HTTPCache(self.directory, max_bytes=1024)
+        self.session = Mock()
+
+    def tearDown(self) -> None:
+        """Remove the cache directory."""
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_revalidates_with_etag(self) -> None:
+        """
+        Tests that a stored response is revalidated with If-None-Match and
+        that a 304 is served from disk.
+        """
+        self.session.get.side_effect = [
+            make_response(200, b'{"a": 1}', {"ETag": '"v1"', "Link": "<x>"}),
+            make_response(304),
+        ]
+        first = self.cache.fetch(self.session, "http://example.com/a")
+        self.assertEqual(first.content, b'{"a": 1}')
+
+        second = self.cache.fetch(self.session, "http://example.com/a")
+        self.assertEqual(second.json(), {"a": 1})
+        self.assertEqual(second.headers["Link"], "<x>")
+        self.assertEqual(second.headers["X-Cache"], "REVALIDATED")
+        self.session.get.assert_called_with(
+            "http://example.com/a", headers={"If-None-Match": '"v1"'},
+            timeout=None)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.stats()["revalidations"], 1)
+
+    def test_revalidated_body_evicted_meanwhile(self) -> None:
+        """
+        Tests that a 304 for an entry evicted during revalidation is
+        followed by an unconditional request.
+        """
+        responses = [make_response(200, b"[1]", {"ETag": '"v1"'}),
+                     make_response(304),
+                     make_response(200, b"[2]", {"ETag": '"v2"'})]
+
+        def get(url, **kwargs):
+            if kwargs.get("headers"):
+                self.cache.clear()
+            return responses.pop(0)
+
+        self.session.get.side_effect = get
+        self.cache.fetch(self.session, "http://example.com/a")
+        response = self.cache.fetch(self.session, "http://example.com/a")
+        self.assertEqual(response.content, b"[2]")
+        self.session.get.assert_called_with("http://example.com/a",
+                                            timeout=None)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+        self.assertEqual(self.cache.stats()["revalidations"], 0)
+
+    def test_fresh_response_is_a_hit(self) -> None:
+        """Tests that a response within its max-age needs no request."""
+        self.session.get.return_value = make_response(
+            200, b"[]", {"Cache-Control": "private, max-age=60"})
+        self.cache.fetch(self.session, "http://example.com/a")
+        response = self.cache.fetch(self.session, "http://example.com/a")
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+        self.session.get.assert_called_once()
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_no_store_is_not_cached(self) -> None:
+        """Tests that `Cache-Control: no-store` responses are not kept."""
+        self.session.get.return_value = make_response(
+            200, b"[]", {"ETag": '"v1"', "Cache-Control": "no-store"})
+        self.cache.fetch(self.session, "http://example.com/a")
+        self.cache.fetch(self.session, "http://example.com/a")
+        self.assertEqual(self.cache.stats()["misses"], 2)
+        self.assertEqual(self.cache.stats()["bytes"], 0)
+
+    def test_evicts_least_recently_used(self) -> None:
+        """Tests that the size budget evicts the least recently used entry."""
+        body = b"x" * 400
+        self.session.get.side_effect = lambda url, **kwargs: make_response(
+            200, body, {"Cache-Control": "max-age=60"})
+        with patch('http_cache.time.time', side_effect=range(100, 200)):
+            self.cache.fetch(self.session, "http://example.com/a")
+            self.cache.fetch(self.session, "http://example.com/b")
+            self.cache.fetch(self.session, "http://example.com/a")
+            self.cache.fetch(self.session, "http://example.com/c")
+
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(self.cache.stats()["bytes"], 800)
+        self.session.get.reset_mock()
+        self.cache.fetch(self.session, "http://example.com/b")
+        self.session.get.assert_called_once()
+
+    def test_persists_across_instances(self) -> None:
+        """Tests that a new cache on the same directory reuses entries."""
+        self.session.get.side_effect = [
+            make_response(200, b"[1]", {"ETag": '"v1"'}),
+            make_response(304),
+        ]
+        self.cache.fetch(self.session, "http://example.com/a")
+        reopened = HTTPCache(self.directory)
+        self.assertEqual(
+            reopened.fetch(self.session, "http://example.com/a").json(), [1])
+        reopened.close()
+
+
+class TestGetJsonCache(unittest.TestCase):
+    """Tests for `get_json` with a cache configured."""
+
+    def setUp(self) -> None:
+        """Configure a cache in a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.cache = utils.configure_cache(self.directory)
+
+    def tearDown(self) -> None:
+        """Turn the cache off and remove its directory."""
+        utils.configure_cache(None)
+        shutil.rmtree(self.directory)
+
+    def test_get_json_goes_through_cache(self) -> None:
+        """Tests that get_json is served from the cache on a 304."""
+        responses = [
+            make_response(200, b'{"repos_url": "x"}', {"ETag": '"v1"'}),
+            make_response(304),
+        ]
+        responses[0].json.return_value = {"repos_url": "x"}
+        with patch('utils.requests.Session.get', side_effect=responses):
+            self.assertEqual(utils.get_json("http://example.com/org"),
+                             {"repos_url": "x"})
+            self.assertEqual(utils.get_json("http://example.com/org"),
+                             {"repos_url": "x"})
+        self.assertEqual(self.cache.stats()["revalidations"], 1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the `replay_server.py` module.
+"""
+import unittest
+
+import requests
+
+from fixtures import TEST_PAYLOAD
+from load_test import run_level
+from replay_server import ReplayServer, synthetic_org
+
+
+class TestReplayServer(unittest.TestCase):
+    """Integration tests for `GithubOrgClient` against `ReplayServer`."""
+
+    def setUp(self) -> None:
+        """Replay the fixture org and one synthetic org, 4 repos a page."""
+        self.server = ReplayServer(per_page=4).start()
+        self.server.add_org("big", *synthetic_org("big", 10))
+        self.addCleanup(self.server.stop)
+        self.client_class = self.server.client_class()
+
+    def test_replays_fixture_org(self) -> None:
+        """Tests that the paged replay gives the recorded results."""
+        _, _, expected_repos, apache2_repos = TEST_PAYLOAD[0]
+        client = self.client_class("google")
+        self.assertEqual(client.public_repos(), expected_repos)
+        self.assertEqual(client.public_repos("apache-2.0"), apache2_repos)
+        self.assertEqual(list(self.client_class("google").iter_public_repos()),
+                         expected_repos)
+        # One org request and three pages for each of the two clients.
+        self.assertEqual(self.server.stats()["requests"], 8)
+
+    def test_synthetic_org(self) -> None:
+        """Tests that a synthetic org has unique repos across its pages."""
+        repos = self.client_class("big").public_repos()
+        self.assertEqual(repos, ["big-repo{}".format(i) for i in range(10)])
+        self.assertEqual(synthetic_org("big", 10), synthetic_org("big", 10))
+
+    def test_etag_and_errors(self) -> None:
+        """Tests conditional requests, unknown orgs and injected errors."""
+        url = self.server.org_url.format(org="google")
+        etag = requests.get(url).headers["ETag"]
+        self.assertEqual(
+            requests.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(
+            requests.get(self.server.org_url.format(org="nope")).status_code,
+            404)
+        self.server.error_rate = 1.0
+        self.assertEqual(requests.get(url).status_code, 500)
+        self.assertEqual(self.server.stats()["errors"], 1)
+
+    def test_load_level(self) -> None:
+        """Tests that a load-test level reports every operation."""
+        result = run_level(self.client_class, ["google", "big"], 4, 8, 1)
+        self.assertEqual((result["operations"], result["failed"]), (8, 0))
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,26 @@
 """
 This module contains unit tests for the functions in `utils.py`.
 """
+import asyncio
+import json
+import threading
+import time
 import unittest
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from parameterized import parameterized
 from unittest.mock import patch, Mock
-from utils import access_nested_map, get_json, memoize
+import utils
+from utils import (
+    access_nested_map,
+    compile_path,
+    configure_session,
+    extract_many,
+    get_json,
+    get_json_pages,
+    get_session,
+    memoize,
+)
 from typing import Mapping, Sequence, Any, Dict
 
 
@@ -42,6 +58,59 @@ class TestAccessNestedMap(unittest.TestCase):
         )
 
 
+class TestCompilePath(unittest.TestCase):
+    """Unit tests for compile_path and extract_many."""
+
+    @parameterized.expand([
+        ({"a": 1}, ("a",), 1),
+        ({"a": {"b": 2}}, ("a", "b"), 2),
+        ({"a": {"b": {"c": 3}}}, ("a", "b", "c"), 3),
+        ({"a": {"b": {"c": {"d": 4}}}}, ("a", "b", "c", "d"), 4),
+    ])
+    def test_compile_path(self, nested_map: Mapping, path: Sequence,
+                          expected: Any) -> None:
+        """Test that compiled getters agree with access_nested_map."""
+        self.assertEqual(compile_path(path)(nested_map), expected)
+        self.assertEqual(compile_path(path)(nested_map),
+                         access_nested_map(nested_map, path))
+
+    @parameterized.expand([
+        ({}, ("a",)),
+        ({"a": 1}, ("a", "b")),
+        ({"a": None}, ("a", "b")),
+        ({"a": {"b": [1]}}, ("a", "b", "c")),
+    ])
+    def test_compile_path_missing(self, nested_map: Mapping,
+                                  path: Sequence) -> None:
+        """
+        Test that a missing path raises KeyError, or returns the default
+        when one is given.
+        """
+        with self.assertRaises(KeyError) as context:
+            compile_path(path)(nested_map)
+        self.assertEqual(str(context.exception), f"'{path[-1]}'")
+        self.assertEqual(compile_path(path, default=0)(nested_map), 0)
+
+    def test_compile_path_is_cached(self) -> None:
+        """Test that compiling a path twice returns the same getter."""
+        self.assertIs(compile_path(["x", "y"], None),
+                      compile_path(("x", "y"), None))
+        self.assertEqual(compile_path(("x",), default=[])({}), [])
+
+    def test_compile_path_defaults_of_equal_value(self) -> None:
+        """Test that defaults equal in value but not type get own getters."""
+        self.assertIs(compile_path(("x",), default=0)({}), 0)
+        self.assertIs(compile_path(("x",), default=False)({}), False)
+        self.assertIsInstance(compile_path(("x",), default=0.0)({}), float)
+        self.assertIs(compile_path(("x",), default=True)({}), True)
+
+    def test_extract_many(self) -> None:
+        """Test batch extraction with defaults for missing paths."""
+        documents = [{"license": {"key": "mit"}}, {"license": None}, {}]
+        self.assertEqual(extract_many(documents, ("license", "key")),
+                         ["mit", None, None])
+
+
 class TestGetJson(unittest.TestCase):
     """Unit tests for the get_json function."""
 
@@ -56,13 +125,195 @@ class TestGetJson(unittest.TestCase):
         """
         mock_response = Mock()
         mock_response.json.return_value = test_payload
+        mock_session = Mock()
+        mock_session.get.return_value = mock_response
 
-        with patch('utils.requests.get', return_value=mock_response) as mock_get:
+        with patch('utils.get_session', return_value=mock_session):
             result = get_json(test_url)
-            mock_get.assert_called_once_with(test_url)
+            mock_session.get.assert_called_once_with(
+                test_url, timeout=utils.DEFAULT_TIMEOUT)
             self.assertEqual(result, test_payload)
 
 
+class TestIterJsonArray(unittest.TestCase):
+    """Unit tests for the iter_json_array function."""
+
+    DOCUMENT = [
+        {"name": "café", "id": 12345, "license": {"key": "mit", "url": "x"}},
+        {"name": "b", "id": 6, "license": None, "topics": ["a", "]"]},
+        -7.5e3, "tail ,]", True,
+    ]
+
+    @parameterized.expand([(1,), (2,), (7,), (4096,)])
+    def test_any_chunking(self, size: int) -> None:
+        """
+        Test that the elements come out whole wherever the input is split,
+        including inside numbers and multi-byte characters.
+        """
+        body = json.dumps(self.DOCUMENT, ensure_ascii=False).encode()
+        chunks = [body[i:i + size] for i in range(0, len(body), size)]
+        self.assertEqual(list(utils.iter_json_array(chunks)), self.DOCUMENT)
+
+    def test_projects_fields(self) -> None:
+        """Test that only the requested dotted fields are kept."""
+        body = json.dumps(self.DOCUMENT[:2]).encode()
+        self.assertEqual(
+            list(utils.iter_json_array([body], fields=["name", "license.key"])),
+            [{"name": "café", "license": {"key": "mit"}},
+             {"name": "b", "license": {"key": None}}])
+
+    @parameterized.expand([
+        (b'{"a": 1}',),
+        (b'[1, 2',),
+        (b'[1, {"a": ]',),
+    ])
+    def test_invalid_input(self, body: bytes) -> None:
+        """Test that a non-array or truncated body raises ValueError."""
+        with self.assertRaises(ValueError):
+            list(utils.iter_json_array([body]))
+
+
+class TestGetJsonPages(unittest.TestCase):
+    """Unit tests for the get_json_pages function."""
+
+    def test_follows_next_links(self) -> None:
+        """Test that every page is fetched by following rel="next" links."""
+        responses = {
+            "http://example.com/repos": ([1, 2], "http://example.com/repos?page=2"),
+            "http://example.com/repos?page=2": ([3], "http://example.com/repos?page=3"),
+            "http://example.com/repos?page=3": ([4], None),
+        }
+
+        def fake_get_response(url):
+            payload, next_url = responses[url]
+            response = Mock()
+            response.json.return_value = payload
+            response.links = {"next": {"url": next_url}} if next_url else {}
+            return response
+
+        with patch('utils.get_response', side_effect=fake_get_response) as mock_get:
+            self.assertEqual(list(get_json_pages("http://example.com/repos")),
+                             [[1, 2], [3], [4]])
+            self.assertEqual(mock_get.call_count, 3)
+
+    def test_fetches_remaining_pages_concurrently(self) -> None:
+        """
+        Test that once rel="last" gives the page count, the remaining pages
+        are fetched on the thread pool and reassembled in order.
+        """
+        base = "http://example.com/repos?per_page=2"
+
+        def fake_get_response(url):
+            response = Mock()
+            response.status_code = 200
+            page = int(url.rsplit("page=", 1)[1]) if "&page=" in url else 1
+            response.json.return_value = [page]
+            response.links = {
+                "next": {"url": base + "&page=2"},
+                "last": {"url": base + "&page=5"},
+            } if page == 1 else {}
+            return response
+
+        with patch('utils.get_response', side_effect=fake_get_response) as mock_get:
+            pages = list(get_json_pages(base, max_workers=3))
+        self.assertEqual(pages, [[1], [2], [3], [4], [5]])
+        self.assertEqual(mock_get.call_count, 5)
+
+    def test_streams_projected_pages(self) -> None:
+        """
+        Test that with fields, pages are streamed with iter_content and
+        projected instead of decoded with json().
+        """
+        def fake_get_response(url, stream=False):
+            response = Mock()
+            response.status_code = 200
+            body = json.dumps([{"name": url[-1], "owner": {"id": 1}}]).encode()
+            response.iter_content.return_value = [body[:5], body[5:]]
+            response.links = {
+                "next": {"url": "http://example.com/repos?page=2"},
+            } if url.endswith("1") else {}
+            self.assertTrue(stream)
+            return response
+
+        with patch('utils.get_response', side_effect=fake_get_response):
+            pages = list(get_json_pages("http://example.com/repos?page=1",
+                                        fields=["name"]))
+        self.assertEqual(pages, [[{"name": "1"}], [{"name": "2"}]])
+
+    def test_retries_failed_pages(self) -> None:
+        """Test that connection errors and 5xx responses are retried."""
+        ok = Mock(status_code=200, links={})
+        ok.json.return_value = ["repo"]
+        failures = [requests.ConnectionError(), Mock(status_code=502), ok]
+
+        with patch('utils.get_response', side_effect=failures), \
+                patch('utils.time.sleep') as mock_sleep:
+            pages = list(get_json_pages("http://example.com/repos", retries=2))
+        self.assertEqual(pages, [["repo"]])
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @staticmethod
+    def error_response(status: int) -> requests.Response:
+        """A real response with an error status and a JSON error body."""
+        response = requests.Response()
+        response.status_code = status
+        response.url = "http://example.com/repos"
+        response._content = b'{"message": "error"}'
+        response.raw = Mock()
+        return response
+
+    def test_page_failing_after_retries_raises(self) -> None:
+        """Test that a page still 5xx once retries run out is not decoded."""
+        with patch('utils.get_response',
+                   side_effect=lambda url: self.error_response(503)) \
+                as mock_get, patch('utils.time.sleep'):
+            with self.assertRaises(requests.HTTPError):
+                list(get_json_pages("http://example.com/repos", retries=2))
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_missing_page_raises_without_retrying(self) -> None:
+        """Test that a 404 page raises at once instead of being decoded."""
+        with patch('utils.get_response',
+                   side_effect=lambda url: self.error_response(404)) \
+                as mock_get:
+            with self.assertRaises(requests.HTTPError):
+                list(get_json_pages("http://example.com/repos", retries=2))
+        self.assertEqual(mock_get.call_count, 1)
+
+
+class TestSession(unittest.TestCase):
+    """Unit tests for the shared HTTP session."""
+
+    def tearDown(self) -> None:
+        """Restore the default session settings."""
+        configure_session(pool_maxsize=10, pool_block=False,
+                          timeout=utils.DEFAULT_TIMEOUT)
+
+    def test_get_session_is_shared(self) -> None:
+        """Test that every call returns the same session."""
+        self.assertIs(get_session(), get_session())
+
+    def test_configure_session(self) -> None:
+        """
+        Test that configure_session replaces the session and applies the
+        per-host pool limit.
+        """
+        old_session = get_session()
+        configure_session(pool_maxsize=3, pool_block=True)
+        session = get_session()
+        self.assertIsNot(session, old_session)
+        adapter = session.get_adapter("https://api.github.com")
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertTrue(adapter._pool_block)
+
+    def test_configured_timeout_is_used(self) -> None:
+        """Test that get_json passes the configured timeout."""
+        configure_session(timeout=1.5)
+        with patch('utils.requests.Session.get') as mock_get:
+            get_json("http://example.com")
+            mock_get.assert_called_once_with("http://example.com", timeout=1.5)
+
+
 class TestMemoize(unittest.TestCase):
     """Unit tests for the memoize decorator."""
 
@@ -88,4 +339,150 @@ class TestMemoize(unittest.TestCase):
             instance = TestClass()
             self.assertEqual(instance.a_property, 42)
             self.assertEqual(instance.a_property, 42)
-            mock_method.assert_called_once()
\ No newline at end of file
+            mock_method.assert_called_once()
+
+    def test_memoize_computes_once_across_threads(self) -> None:
+        """
+        Test that concurrent first accesses run the method only once.
+        """
+        calls = []
+        barrier = threading.Barrier(8)
+
+        class TestClass:
+            """A sample class with a slow memoized property."""
+            @memoize
+            def a_property(self):
+                """Record the call and take a while to finish."""
+                calls.append(1)
+                time.sleep(0.05)
+                return 42
+
+        instance = TestClass()
+
+        def access():
+            barrier.wait()
+            return instance.a_property
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda _: access(), range(8)))
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(instance._a_property, 42)
+
+    def test_memoize_ttl(self) -> None:
+        """
+        Test that a value older than the ttl is recomputed.
+        """
+        class TestClass:
+            """A sample class with an expiring memoized property."""
+            def a_method(self):
+                """A method that returns a fixed value."""
+                return 42
+
+            @memoize(ttl=10)
+            def a_property(self):
+                """A memoized property that calls a_method."""
+                return self.a_method()
+
+        with patch.object(TestClass, 'a_method', return_value=42) as mock_method, \
+                patch('utils.time.monotonic', side_effect=[0, 5, 11, 12, 13]):
+            instance = TestClass()
+            self.assertEqual(instance.a_property, 42)
+            self.assertEqual(instance.a_property, 42)
+            self.assertEqual(mock_method.call_count, 1)
+            self.assertEqual(instance.a_property, 42)
+            self.assertEqual(mock_method.call_count, 2)
+
+    def test_memoize_invalidate(self) -> None:
+        """
+        Test that invalidate drops the value from one instance only.
+        """
+        class TestClass:
+            """A sample class to test invalidation on."""
+            def a_method(self):
+                """A method that returns a fixed value."""
+                return 42
+
+            @memoize
+            def a_property(self):
+                """A memoized property that calls a_method."""
+                return self.a_method()
+
+        with patch.object(TestClass, 'a_method', return_value=42) as mock_method:
+            first, second = TestClass(), TestClass()
+            first.a_property, second.a_property
+            TestClass.a_property.invalidate(first)
+            first.a_property, second.a_property
+            self.assertEqual(mock_method.call_count, 3)
+        with self.assertRaises(AttributeError):
+            first.a_property = 0
+
+    def test_memoize_ttl_read_during_invalidate(self) -> None:
+        """
+        Test that a read racing with invalidate recomputes instead of
+        raising KeyError, both for the exact interleaving and under load.
+        """
+        class TestClass:
+            """A sample class with an expiring memoized property."""
+            @memoize(ttl=60)
+            def a_property(self):
+                """A memoized property with a fixed value."""
+                return 42
+
+        class InvalidatingDict(dict):
+            """Instance state invalidated right after the value is read."""
+            armed = True
+
+            def get(self, key, default=None):
+                value = dict.get(self, key, default)
+                if key == "_a_property" and self.armed:
+                    self.armed = False
+                    TestClass.a_property.invalidate(instance)
+                return value
+
+        instance = TestClass()
+        instance.a_property
+        instance.__dict__ = InvalidatingDict(instance.__dict__)
+        self.assertEqual(instance.a_property, 42)
+
+        instance = TestClass()
+        stop = threading.Event()
+
+        def invalidate_loop():
+            while not stop.is_set():
+                TestClass.a_property.invalidate(instance)
+
+        invalidator = threading.Thread(target=invalidate_loop)
+        invalidator.start()
+        try:
+            results = [instance.a_property for _ in range(20000)]
+        finally:
+            stop.set()
+            invalidator.join()
+        self.assertEqual(set(results), {42})
+
+    def test_memoize_coroutine(self) -> None:
+        """
+        Test that concurrent awaiters of a coroutine method share one call.
+        """
+        calls = []
+
+        class TestClass:
+            """A sample class with a memoized coroutine method."""
+            @memoize
+            async def a_property(self):
+                """Record the call and yield to the loop once."""
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return 42
+
+        async def main():
+            instance = TestClass()
+            results = await asyncio.gather(
+                *(instance.a_property for _ in range(5)))
+            return results, await instance.a_property
+
+        results, again = asyncio.run(main())
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(again, 42)
+        self.assertEqual(len(calls), 1)
@@ -1,22 +1,78 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
+import asyncio
+import codecs
+import inspect
+import json
+import threading
+import time
 import requests
-from functools import wraps
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+from functools import lru_cache, wraps
 from typing import (
     Mapping,
     Sequence,
     Any,
     Dict,
     Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
 
+from http_cache import HTTPCache
+
 __all__ = [
     "access_nested_map",
+    "compile_path",
+    "configure_cache",
+    "configure_rate_limit",
+    "configure_session",
+    "extract_many",
     "get_json",
+    "get_json_pages",
+    "get_response",
+    "get_response_with_retries",
+    "get_session",
+    "iter_json_array",
     "memoize",
 ]
 
+# Default of compile_path meaning "raise KeyError".
+_RAISE = object()
+
+# Whitespace and separators between the elements of a JSON array.
+_JSON_SKIP = frozenset(" \t\n\r,")
+# Bytes read at a time when streaming a response body.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Times a request rejected for going over the rate limit is sent again.
+RATE_LIMIT_RETRIES = 3
+# (connect, read) timeouts in seconds for every request.
+DEFAULT_TIMEOUT = (3.05, 30)
+Timeout = Union[float, Tuple[float, float]]
+
+_session = None
+_http_cache = None
+_rate_limiter = None
+_session_lock = threading.Lock()
+# Guards creating the per-instance locks of memoized attributes.
+_memoize_lock = threading.Lock()
+_session_settings = {
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "pool_block": False,
+    "timeout": DEFAULT_TIMEOUT,
+}
+
 
 def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     """Access nested map with key path.
@@ -33,22 +89,603 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     1
     """
     for key in path:
-        if not isinstance(nested_map, Mapping):
+        # `type(...) is dict` settles the common case without going
+        # through the much slower ABC instance check.
+        if type(nested_map) is not dict and not isinstance(nested_map, Mapping):
             raise KeyError(key)
         nested_map = nested_map[key]
 
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+def _is_mapping(value: Any) -> bool:
+    """Fast Mapping check: exact dicts never reach the ABC check.
+    """
+    return type(value) is dict or isinstance(value, Mapping)
+
+
+def _build_getter(path: Tuple) -> Callable[[Mapping], Any]:
+    """Build a getter for `path`, unrolled for the usual short paths.
+    Raises KeyError exactly like `access_nested_map`.
+    """
+    if len(path) == 1:
+        (k0,) = path
+
+        def getter(node):
+            if not _is_mapping(node):
+                raise KeyError(k0)
+            return node[k0]
+    elif len(path) == 2:
+        k0, k1 = path
+
+        def getter(node):
+            if not _is_mapping(node):
+                raise KeyError(k0)
+            node = node[k0]
+            if not _is_mapping(node):
+                raise KeyError(k1)
+            return node[k1]
+    elif len(path) == 3:
+        k0, k1, k2 = path
+
+        def getter(node):
+            if not _is_mapping(node):
+                raise KeyError(k0)
+            node = node[k0]
+            if not _is_mapping(node):
+                raise KeyError(k1)
+            node = node[k1]
+            if not _is_mapping(node):
+                raise KeyError(k2)
+            return node[k2]
+    else:
+        def getter(node):
+            return access_nested_map(node, path)
+    return getter
+
+
+@lru_cache(maxsize=1024, typed=True)
+def _compiled(path: Tuple, default: Any) -> Callable[[Mapping], Any]:
+    """Cached body of `compile_path` for hashable defaults.
+    """
+    if default is _RAISE:
+        return _build_getter(path)
+
+    def get_or_default(node):
+        # Missing keys are common here, so exact dicts are walked with
+        # `dict.get` rather than paying for a raised KeyError each time.
+        for key in path:
+            if type(node) is dict:
+                node = node.get(key, _RAISE)
+                if node is _RAISE:
+                    return default
+            elif isinstance(node, Mapping):
+                try:
+                    node = node[key]
+                except KeyError:
+                    return default
+            else:
+                return default
+        return node
+    return get_or_default
+
+
+def compile_path(path: Sequence, default: Any = _RAISE) -> Callable[[Mapping], Any]:
+    """Compile a key path into a reusable getter.
+    Parameters
+    ----------
+    path: Sequence
+        a sequence of key representing a path to the value
+    default: Any
+        value returned when the path does not exist; without it the getter
+        raises KeyError like `access_nested_map`
+    Getters are cached, so compiling the same path again is cheap.
+    Example
+    -------
+    >>> license_key = compile_path(("license", "key"), default=None)
+    >>> license_key({"license": {"key": "mit"}})
+    'mit'
+    >>> license_key({"license": None}) is None
+    True
+    """
+    path = tuple(path)
+    try:
+        return _compiled(path, default)
+    except TypeError:
+        # Unhashable default: build an uncached getter around it.
+        return _compiled.__wrapped__(path, default)
+
+
+def extract_many(documents: Iterable[Mapping], path: Sequence,
+                 default: Any = None) -> List[Any]:
+    """Extract the value at `path` from every document.
+    Missing paths give `default` instead of raising.
+    Example
+    -------
+    >>> extract_many([{"a": {"b": 1}}, {"a": 2}], ("a", "b"))
+    [1, None]
+    """
+    get = compile_path(path, default)
+    return [get(document) for document in documents]
+
+
+def _build_session() -> requests.Session:
+    """Build a session from the current settings.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=_session_settings["pool_connections"],
+        pool_maxsize=_session_settings["pool_maxsize"],
+        pool_block=_session_settings["pool_block"],
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session, creating it on first use.
+    Connections are kept alive and reused across calls, so only the
+    first request to a host pays for the TCP and TLS handshakes.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def configure_session(pool_connections: Optional[int] = None,
+                      pool_maxsize: Optional[int] = None,
+                      pool_block: Optional[bool] = None,
+                      timeout: Optional[Timeout] = None) -> None:
+    """Change the settings of the shared HTTP session.
+    Parameters
+    ----------
+    pool_connections: int
+        number of per-host connection pools to keep
+    pool_maxsize: int
+        maximum number of connections kept open to a single host
+    pool_block: bool
+        block instead of opening extra connections past `pool_maxsize`
+    timeout: float or (float, float)
+        request timeout, or (connect, read) timeouts, in seconds
+    The current session is closed and replaced on the next request.
+    """
+    global _session
+    updates = {
+        "pool_connections": pool_connections,
+        "pool_maxsize": pool_maxsize,
+        "pool_block": pool_block,
+        "timeout": timeout,
+    }
+    with _session_lock:
+        _session_settings.update(
+            (key, value) for key, value in updates.items() if value is not None
+        )
+        old_session, _session = _session, None
+    if old_session is not None:
+        old_session.close()
+
+
+def configure_cache(directory: Optional[str] = None,
+                    max_bytes: int = 100 * 1024 * 1024) -> Optional[HTTPCache]:
+    """Put a persistent HTTP cache in `directory` under every request.
+    Responses are revalidated with their ETag/Last-Modified, so an
+    unchanged resource costs a `304 Not Modified` rather than a full
+    download, even across processes. Passing no directory turns the
+    cache off. Returns the cache, whose `stats()` reports hits,
+    revalidations and misses.
+    """
+    global _http_cache
+    cache = HTTPCache(directory, max_bytes) if directory is not None else None
+    with _session_lock:
+        old_cache, _http_cache = _http_cache, cache
+    if old_cache is not None:
+        old_cache.close()
+    return cache
+
+
+def configure_rate_limit(limiter: Any = None) -> Any:
+    """Make every request wait for room in `limiter`'s rate-limit budget.
+    `limiter` is a `batch_client.RateLimitBudget` or anything with its
+    `acquire()`/`release(response)` methods; passing None removes it.
+    Returns the limiter it replaces.
+    """
+    global _rate_limiter
+    with _session_lock:
+        previous, _rate_limiter = _rate_limiter, limiter
+    return previous
+
+
+def _send(url: str, stream: bool) -> requests.Response:
+    """GET a URL through the HTTP cache if one is configured.
+    """
+    cache = _http_cache
+    if cache is not None:
+        return cache.fetch(get_session(), url,
+                           timeout=_session_settings["timeout"])
+    if stream:
+        return get_session().get(url, timeout=_session_settings["timeout"],
+                                 stream=True)
+    return get_session().get(url, timeout=_session_settings["timeout"])
+
+
+def get_response(url: str, stream: bool = False,
+                 limiter: Any = None) -> requests.Response:
+    """GET a URL through the shared session, and the HTTP cache if one
+    is configured.
+    With `stream`, the body is left unread for `iter_content`; cached
+    responses are always read in full. With a rate limiter, `limiter` or
+    else the one set by `configure_rate_limit`, the request waits for
+    room in its budget and is sent again, up to `RATE_LIMIT_RETRIES`
+    times, if the server rejects it for going over the limit. The last
+    rejection is returned as is.
+    """
+    if limiter is None:
+        limiter = _rate_limiter
+    if limiter is None:
+        return _send(url, stream)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire()
+        try:
+            response = _send(url, stream)
+        except BaseException:
+            limiter.release()
+            raise
+        if not limiter.release(response) or attempt == RATE_LIMIT_RETRIES:
+            return response
+        response.close()
+
+
+def get_json(url: str, limiter: Any = None) -> Dict:
     """Get JSON from remote URL.
     """
-    response = requests.get(url)
-    return response.json()
+    return get_response(url, limiter=limiter).json()
+
+
+def get_response_with_retries(url: str, retries: int = 0,
+                              backoff: float = 0.1,
+                              stream: bool = False,
+                              limiter: Any = None) -> requests.Response:
+    """GET a URL, retrying connection errors, timeouts and 5xx responses.
+    Waits `backoff`, then twice as long, and so on between attempts. The
+    last response is returned as is once the retries are used up.
+    """
+    options = {}
+    if stream:
+        options["stream"] = True
+    if limiter is not None:
+        options["limiter"] = limiter
+    for attempt in range(retries + 1):
+        try:
+            response = get_response(url, **options)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        else:
+            if attempt == retries or response.status_code < 500:
+                return response
+            response.close()
+        time.sleep(backoff * 2 ** attempt)
+
+
+def _projector(fields: Sequence[str]) -> Callable[[Mapping], Dict]:
+    """Build a function copying only the dotted `fields` of a document.
+    The copy keeps the nesting, so `"license.key"` gives
+    `{"license": {"key": ...}}`; missing values become None.
+    """
+    getters = [(field.split("."), compile_path(field.split("."), None))
+               for field in fields]
+
+    def project(document: Mapping) -> Dict:
+        projected = {}
+        for keys, get in getters:
+            node = projected
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = get(document)
+        return projected
+    return project
+
+
+def iter_json_array(chunks: Iterable[bytes],
+                    fields: Optional[Sequence[str]] = None) -> Iterator[Any]:
+    """Parse a JSON array from byte chunks, yielding one element at a time.
+    Only the element being decoded and the undecoded tail of the input
+    are held in memory, never the whole document.
+    Parameters
+    ----------
+    chunks: Iterable[bytes]
+        the UTF-8 encoded array, split anywhere
+    fields: Sequence[str]
+        dotted paths to keep from each element, e.g. `"license.key"`;
+        every other field is dropped as soon as the element is decoded
+    Example
+    -------
+    >>> list(iter_json_array([b'[{"a": 1, "b": {"c"', b': 2}}, {"a": 3}]'],
+    ...                      fields=["a", "b.c"]))
+    [{'a': 1, 'b': {'c': 2}}, {'a': 3, 'b': {'c': None}}]
+    """
+    project = _projector(fields) if fields is not None else None
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    raw_decode = json.JSONDecoder().raw_decode
+    buffer, position = "", 0
+    started = finished = False
+    chunks = iter(chunks)
+    while True:
+        chunk = next(chunks, None)
+        buffer = buffer[position:] + decoder.decode(chunk or b"",
+                                                    final=chunk is None)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in _JSON_SKIP:
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if not started:
+                if char != "[":
+                    raise ValueError("expected a JSON array, got {!r}"
+                                     .format(char))
+                started = True
+                position += 1
+            elif char == "]":
+                finished = True
+                break
+            else:
+                try:
+                    element, end = raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if chunk is None:
+                        raise
+                    break  # element continues in the next chunk
+                follow = end
+                while follow < len(buffer) and buffer[follow] in " \t\n\r":
+                    follow += 1
+                if follow == len(buffer) or buffer[follow] not in ",]":
+                    if chunk is not None:
+                        break  # a number like 7.5 may still be 7.5e3
+                    if follow < len(buffer):
+                        raise ValueError("invalid JSON array at {!r}"
+                                         .format(buffer[follow:follow + 20]))
+                position = end
+                yield project(element) if project is not None else element
+        if finished:
+            return
+        if chunk is None:
+            raise ValueError("unterminated JSON array")
+
+
+def _page_json(response: requests.Response,
+               fields: Optional[Sequence[str]]) -> Any:
+    """Decode a page: fully, or streamed and projected to `fields`.
+    An error response raises `requests.HTTPError` instead of being
+    decoded as a page.
+    """
+    if fields is None:
+        response.raise_for_status()
+        return response.json()
+    try:
+        response.raise_for_status()
+        return list(iter_json_array(
+            response.iter_content(STREAM_CHUNK_SIZE), fields))
+    finally:
+        response.close()
+
+
+def _page_number(url: str) -> Optional[int]:
+    """Return the `page` query parameter of a URL, if it is a number.
+    """
+    pages = parse_qs(urlsplit(url).query).get("page", [])
+    return int(pages[0]) if pages and pages[0].isdigit() else None
+
+
+def _with_page(url: str, page: int) -> str:
+    """Return `url` with its `page` query parameter set to `page`.
+    """
+    parts = urlsplit(url)
+    query = [(key, value)
+             for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key != "page"]
+    query.append(("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
 
 
-def memoize(fn: Callable) -> Callable:
+def _fetch_concurrently(urls: Sequence[str], max_workers: int,
+                        retries: int,
+                        fields: Optional[Sequence[str]] = None,
+                        limiter: Any = None) -> Iterator[Any]:
+    """Fetch the JSON of `urls` on a thread pool and yield it in order.
+    At most twice `max_workers` pages are requested ahead of the one
+    being yielded, which bounds memory for very long listings.
+    """
+    def fetch(url):
+        response = get_response_with_retries(
+            url, retries, stream=fields is not None, limiter=limiter)
+        return _page_json(response, fields)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    remaining = iter(urls)
+    try:
+        for url in islice(remaining, 2 * max_workers):
+            pending.append(executor.submit(fetch, url))
+        while pending:
+            page = pending.popleft().result()
+            for url in islice(remaining, 1):
+                pending.append(executor.submit(fetch, url))
+            yield page
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_json_pages(url: str, max_workers: int = 1, retries: int = 0,
+                   fields: Optional[Sequence[str]] = None,
+                   limiter: Any = None) -> Iterator[Any]:
+    """Get the JSON of every page of a paginated resource.
+    Pages are yielded in order as soon as they arrive, so only the pages
+    being processed are held in memory.
+    Parameters
+    ----------
+    url: str
+        URL of the first page
+    max_workers: int
+        with more than one worker, once the first response's
+        `Link: rel="last"` header reveals the page count, the remaining
+        pages are fetched concurrently on a thread pool of that size;
+        otherwise pages are fetched one at a time by following
+        `Link: rel="next"`. Raise `pool_maxsize` with `configure_session`
+        to at least this value so every worker keeps its connection alive
+    retries: int
+        times to retry a page after a connection error, timeout or 5xx;
+        a page still failing after that, or failing with a 4xx, raises
+        `requests.HTTPError`
+    fields: Sequence[str]
+        for pages that are JSON arrays, stream each body and keep only
+        these dotted fields of every element (see `iter_json_array`)
+    limiter: batch_client.RateLimitBudget
+        rate limiter for every page, instead of the one set by
+        `configure_rate_limit`
+    """
+    stream = fields is not None
+    response = get_response_with_retries(url, retries, stream=stream,
+                                         limiter=limiter)
+    links = response.links
+    yield _page_json(response, fields)
+
+    last_url = links.get("last", {}).get("url")
+    last_page = _page_number(last_url) if last_url else None
+    if max_workers > 1 and last_page is not None:
+        start = (_page_number(url) or 1) + 1
+        urls = [_with_page(last_url, page) for page in range(start, last_page + 1)]
+        yield from _fetch_concurrently(urls, max_workers, retries, fields,
+                                       limiter)
+        return
+
+    url = links.get("next", {}).get("url")
+    while url:
+        response = get_response_with_retries(url, retries, stream=stream,
+                                             limiter=limiter)
+        links = response.links
+        yield _page_json(response, fields)
+        url = links.get("next", {}).get("url")
+
+
+class _Memoized:
+    """Descriptor behind `memoize`.
+    The value of `fn(obj)` is kept on the instance as `_<name>`. A
+    per-instance lock makes sure concurrent first accesses compute it
+    only once; with a `ttl` it is recomputed once older than that many
+    seconds. For coroutine methods, the attribute is an awaitable and
+    concurrent awaiters share a single in-flight call.
+    """
+
+    def __init__(self, fn: Callable, ttl: Optional[float] = None) -> None:
+        """Init method of _Memoized"""
+        wraps(fn)(self)
+        self.fn = fn
+        self.ttl = ttl
+        self.attr_name = "_{}".format(fn.__name__)
+        self._expires_name = "{}_expires_at".format(self.attr_name)
+        self._lock_name = "{}_lock".format(self.attr_name)
+        self._task_name = "{}_task".format(self.attr_name)
+        self.is_async = inspect.iscoroutinefunction(fn)
+
+    def _cached(self, obj: Any) -> Any:
+        """The stored value, or _RAISE if missing or expired"""
+        state = obj.__dict__
+        value = state.get(self.attr_name, _RAISE)
+        if value is not _RAISE and self.ttl is not None:
+            # Read without the lock: `invalidate` may have just removed
+            # the expiry, which counts as expired.
+            expires_at = state.get(self._expires_name)
+            if expires_at is None or time.monotonic() >= expires_at:
+                return _RAISE
+        return value
+
+    def _store(self, obj: Any, value: Any) -> Any:
+        """Keep `value` on the instance, with its expiry time"""
+        if self.ttl is not None:
+            obj.__dict__[self._expires_name] = time.monotonic() + self.ttl
+        obj.__dict__[self.attr_name] = value
+        return value
+
+    def _lock(self, obj: Any) -> threading.Lock:
+        """The per-instance lock, created on first use"""
+        lock = obj.__dict__.get(self._lock_name)
+        if lock is None:
+            with _memoize_lock:
+                lock = obj.__dict__.setdefault(self._lock_name, threading.Lock())
+        return lock
+
+    def __get__(self, obj: Any, owner: type = None) -> Any:
+        """Return the memoized value, computing it if needed"""
+        if obj is None:
+            return self
+        if self.is_async:
+            return self._get_async(obj)
+        value = self._cached(obj)
+        if value is not _RAISE:
+            return value
+        with self._lock(obj):
+            value = self._cached(obj)
+            if value is _RAISE:
+                value = self._store(obj, self.fn(obj))
+        return value
+
+    async def _get_async(self, obj: Any) -> Any:
+        """Awaitable form of `__get__` for coroutine methods"""
+        value = self._cached(obj)
+        if value is not _RAISE:
+            return value
+        task = obj.__dict__.get(self._task_name)
+        if task is None:
+            task = asyncio.ensure_future(self.fn(obj))
+            obj.__dict__[self._task_name] = task
+
+            def done(task: asyncio.Future) -> None:
+                """Store the result and forget the finished call"""
+                if obj.__dict__.get(self._task_name) is not task:
+                    return  # invalidated while in flight
+                del obj.__dict__[self._task_name]
+                if not task.cancelled() and task.exception() is None:
+                    self._store(obj, task.result())
+            task.add_done_callback(done)
+        # Shielded, so one cancelled awaiter does not cancel the call for
+        # everyone else waiting on it.
+        return await asyncio.shield(task)
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        """Memoized attributes are read-only, like a property"""
+        raise AttributeError("can't set attribute '{}'".format(self.__name__))
+
+    def invalidate(self, obj: Any) -> None:
+        """Forget the value stored on `obj`, so the next access recomputes
+        it.
+        Example
+        -------
+        >>> GithubOrgClient.org.invalidate(client)  # doctest: +SKIP
+        """
+        with self._lock(obj):
+            obj.__dict__.pop(self.attr_name, None)
+            obj.__dict__.pop(self._expires_name, None)
+            obj.__dict__.pop(self._task_name, None)
+
+
+def memoize(fn: Callable = None, *,
+            ttl: Optional[float] = None) -> Callable:
     """Decorator to memoize a method.
+    Use it bare, or as `@memoize(ttl=seconds)` to recompute the value
+    once it is older than `ttl`. The value is stored on the instance as
+    `_<name>` and computed only once even under concurrent access.
+    `Class.name.invalidate(instance)` drops it. Coroutine methods become
+    awaitable attributes: `await instance.name`.
     Example
     -------
     class MyClass:
@@ -63,13 +700,6 @@ def memoize(fn: Callable) -> Callable:
     >>> my_object.a_method
     42
     """
-    attr_name = "_{}".format(fn.__name__)
-
-    @wraps(fn)
-    def memoized(self):
-        """"memoized wraps"""
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
-
-    return property(memoized)
\ No newline at end of file
+    if fn is None:
+        return lambda fn: _Memoized(fn, ttl)
+    return _Memoized(fn, ttl)
@@ -0,0 +1,470 @@
+# Django-Middleware-0x03/bench_middleware.py
+"""
+Per-request cost of the custom middleware, measured outside a full
+project: Django is configured here with just enough settings to build
+requests with RequestFactory and run each middleware around a trivial
+view.
+
+Usage:
+    python3 bench_middleware.py ratelimit --requests 20000
+    python3 bench_middleware.py store --processes 4
+    python3 bench_middleware.py rules
+    python3 bench_middleware.py asgi --concurrency 50
+    python3 bench_middleware.py metrics --queries 3
+    python3 bench_middleware.py filter --terms 10000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+
+import django
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=False,
+        ALLOWED_HOSTS=['*'],
+        INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        ROLE_CACHE={'ALLOW_LOCAL': True},  # a single process
+        ROOT_URLCONF=__name__,
+        SECRET_KEY='bench-middleware',
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+        REQUEST_LOG={'PATH': os.path.join(tempfile.gettempdir(), 'bench_requests.log')},
+    )
+    django.setup()
+
+from django.contrib.auth import SESSION_KEY  # noqa: E402
+from django.contrib.sessions.backends.signed_cookies import SessionStore  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse, JsonResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import path, resolve  # noqa: E402
+
+from chats import metrics, middleware, roles, rules  # noqa: E402
+from chats.content_filter import AhoCorasick, ContentFilter  # noqa: E402
+from chats.middleware import OffensiveLanguageMiddleware  # noqa: E402
+from chats.ratelimit import SlidingWindowLimiter  # noqa: E402
+from chats.shared_store import build_store  # noqa: E402
+
+
+def view(request):
+    return HttpResponse('ok')
+
+
+async def async_view(request):
+    return HttpResponse('ok')
+
+
+urlpatterns = [path('api/messages/', async_view)]
+
+
+class ListRateLimitMiddleware:
+    """
+    The original limiter, kept as the baseline: a list of every
+    timestamp per IP, filtered and rewritten on each request.
+    """
+    def __init__(self, get_response, limit=5, period=60):
+        self.get_response = get_response
+        self.limit = limit
+        self.period = period
+
+    def __call__(self, request):
+        if request.method == 'POST' and 'messages' in request.path:
+            ip_address = request.META.get('REMOTE_ADDR')
+            cache_key = f"rate_limit_{ip_address}"
+            request_timestamps = cache.get(cache_key, [])
+            current_time = time.time()
+            valid_timestamps = [ts for ts in request_timestamps if current_time - ts < self.period]
+            if len(valid_timestamps) >= self.limit:
+                return JsonResponse({'error': 'Request limit exceeded. Please try again later.'}, status=429)
+            valid_timestamps.append(current_time)
+            cache.set(cache_key, valid_timestamps, self.period)
+        return self.get_response(request)
+
+
+def time_requests(middleware, requests):
+    """
+    Runs every request through `middleware` and returns the mean cost
+    in microseconds and how many were refused.
+    """
+    for request in requests:
+        request.__dict__.pop('_access_policy', None)
+    refused = 0
+    start = time.perf_counter()
+    for request in requests:
+        if middleware(request).status_code == 429:
+            refused += 1
+    return (time.perf_counter() - start) / len(requests) * 1e6, refused
+
+
+def bench_ratelimit(args):
+    """
+    Every client's window is filled to the limit before timing, so each
+    timed request finds a full window: the list limiter then filters
+    `limit` timestamps per request, the sliding window two counters.
+    """
+    factory = RequestFactory()
+    addresses = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+    requests = [factory.post('/api/messages/', REMOTE_ADDR=addresses[i % args.clients])
+                for i in range(args.requests)]
+    print(f"{args.requests} POSTs from {args.clients} clients, each already at the limit")
+    print(f"{'limit':>8}{'list us/req':>14}{'window us/req':>16}{'refused (list/window)':>24}")
+    for limit in args.limits:
+        cache.clear()
+        # The list a client has after `limit` requests, set directly:
+        # sending them costs O(limit ** 2) with this limiter.
+        now = time.time()
+        for address in addresses:
+            cache.set(f"rate_limit_{address}", [now] * limit, 60)
+        baseline = ListRateLimitMiddleware(view, limit=limit)
+        list_cost, list_refused = time_requests(baseline, requests)
+        cache.clear()
+        rules._engine = rules.RuleEngine.from_config([
+            {'regex': r'messages', 'methods': ['POST'], 'rate': {'limit': limit, 'period': 60}}])
+        middleware = OffensiveLanguageMiddleware(view)
+        time_requests(middleware, requests[:args.clients] * limit)
+        window_cost, window_refused = time_requests(middleware, requests)
+        print(f"{limit:>8}{list_cost:>14.1f}{window_cost:>16.1f}"
+              f"{f'{list_refused}/{window_refused}':>24}")
+
+
+def _hammer(config, limit, hits, label):
+    """
+    One worker process: `hits` requests from the same client. Returns
+    how many were allowed, the mean cost in microseconds and the store's
+    metrics.
+    """
+    store = build_store(config)
+    limiter = SlidingWindowLimiter(store, limit, 60, prefix=f"bench-{label}")
+    allowed = 0
+    start = time.perf_counter()
+    for _ in range(hits):
+        allowed += limiter.hit('10.0.0.1')[0]
+    cost = (time.perf_counter() - start) / hits * 1e6
+    return allowed, cost, store.stats() if hasattr(store, 'stats') else {}
+
+
+def bench_store(args):
+    limit = 100
+    hits = args.requests // args.processes
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimit.sqlite3')
+    print(f"{args.processes} processes x {hits} requests, one client, limit {limit}")
+    print(f"{'store':<10}{'allowed':>9}{'us/req':>9}{'fallbacks':>11}{'max ms':>9}")
+    for label, config in (('locmem', None), ('sqlite', {'BACKEND': 'sqlite', 'PATH': path})):
+        with multiprocessing.get_context('fork').Pool(args.processes) as pool:
+            results = pool.starmap(_hammer, [(config, limit, hits, label)] * args.processes)
+        allowed = sum(r[0] for r in results)
+        cost = sum(r[1] for r in results) / len(results)
+        fallbacks = sum(r[2].get('fallback_calls', 0) for r in results)
+        max_ms = max((r[2].get('max_ms', 0.0) for r in results), default=0.0)
+        print(f"{label:<10}{allowed:>9}{cost:>9.1f}{fallbacks:>11}{max_ms:>9.2f}")
+
+
+def _random_rules(count, rng):
+    """
+    A rule table of `count` rules over made-up API paths, one in ten
+    of them a regex.
+    """
+    table = []
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+        path = '/api/' + '/'.join(words) + f"{i}/"
+        if i % 10 == 9:
+            entry = {'regex': rf"^/api/{words[0]}/\d+/{words[-1]}{i}$"}
+        else:
+            entry = {'prefix': path}
+        entry['methods'] = [rng.choice(['GET', 'POST', 'PUT', 'DELETE'])]
+        entry['roles'] = ['ADMIN']
+        table.append(entry)
+    return table
+
+
+class LinearRules:
+    """
+    The baseline: every rule checked in turn on every request, the way
+    each middleware used to test its own paths.
+    """
+    def __init__(self, table):
+        self.rules = [rules.Rule(name=f"rule{i}", **entry) for i, entry in enumerate(table)]
+
+    def match(self, method, path):
+        return [rule for rule in self.rules
+                if rule.applies_to(method)
+                and (path.startswith(rule.prefix) if rule.prefix is not None
+                     else rule.regex.search(path))]
+
+
+def bench_rules(args):
+    rng = random.Random(1337)
+    print(f"{'rules':>7}{'linear us':>11}{'compiled us':>13}{'cached us':>11}")
+    for count in args.rule_counts:
+        table = _random_rules(count, rng)
+        # Traffic repeats a few hundred distinct routes, as real traffic does.
+        routes = [(rng.choice(['GET', 'POST', 'PUT', 'DELETE']),
+                   rng.choice(table).get('prefix', '/api/users/') + f"{rng.randint(1, 50)}/")
+                  for _ in range(500)]
+        paths = [rng.choice(routes) for _ in range(args.requests)]
+        linear = LinearRules(table)
+        engine = rules.RuleEngine.from_config(table)
+        for method, path in paths[:200]:
+            assert ({r.name for r in linear.match(method, path)}
+                    == {r.name for r in engine.match(method, path)})
+        costs = []
+        for match in (linear.match, engine.match, engine.policy):
+            start = time.perf_counter()
+            for method, path in paths:
+                match(method, path)
+            costs.append((time.perf_counter() - start) / len(paths) * 1e6)
+        print(f"{count:>7}{costs[0]:>11.1f}{costs[1]:>13.1f}{costs[2]:>11.1f}")
+
+
+# The chats stack as it was: every middleware sync-only, so under ASGI
+# Django switches to a thread to get through it.
+class SyncOnlyLogging(middleware.RequestLoggingMiddleware):
+    async_capable = False
+
+
+class SyncOnlyRoles(middleware.RolePermissionMiddleware):
+    async_capable = False
+
+
+class SyncOnlyHours(middleware.RestrictAccessByTimeMiddleware):
+    async_capable = False
+
+
+class SyncOnlyRateLimit(middleware.OffensiveLanguageMiddleware):
+    async_capable = False
+
+
+SYNC_ONLY_STACK = [f"{__name__}.{name}" for name in (
+    'SyncOnlyLogging', 'SyncOnlyRoles', 'SyncOnlyHours', 'SyncOnlyRateLimit')]
+NATIVE_STACK = [f"chats.middleware.{name}" for name in (
+    'RequestLoggingMiddleware', 'RolePermissionMiddleware',
+    'RestrictAccessByTimeMiddleware', 'OffensiveLanguageMiddleware')]
+# Django's own session and auth middleware run their hooks through
+# sync_to_async in async mode; the chats subclasses only hop to save a
+# session. Behind them the role rule below applies, to a logged-in user.
+AUTH_MIDDLEWARE = [
+    'chats.middleware.SessionMiddleware',
+    'chats.middleware.AuthenticationMiddleware',
+]
+STACKS = {
+    'sync-only': SYNC_ONLY_STACK,
+    'native': NATIVE_STACK,
+    'auth + sync-only': AUTH_MIDDLEWARE + SYNC_ONLY_STACK,
+    'auth + native': AUTH_MIDDLEWARE + NATIVE_STACK,
+}
+
+
+async def _asgi_request(handler, index, headers=()):
+    """
+    One POST through the ASGI handler, as a server would send it.
+    Returns the response status.
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'POST', 'scheme': 'http', 'path': '/api/messages/',
+        'raw_path': b'/api/messages/', 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), *headers],
+        'client': (f"10.1.{index // 256 % 256}.{index % 256}", 40000),
+        'server': ('testserver', 80),
+    }
+    sent_body = False
+    status = []
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await handler(scope, receive, send)
+    return status[0]
+
+
+def bench_asgi(args):
+    # Every request allowed: no hours, and a limit nobody reaches.
+    rate_rule = {'regex': r'messages', 'methods': ['POST'],
+                 'rate': {'limit': 10 ** 9, 'period': 60}}
+    # With sessions, the user is an admin, role cached as roles.py would.
+    role_rule = {'prefix': '/api/', 'methods': ['POST'], 'roles': ['ADMIN']}
+    session = SessionStore()
+    session[SESSION_KEY] = '1'
+    session.save()
+    cookie = (b'cookie', f"{settings.SESSION_COOKIE_NAME}={session.session_key}".encode())
+    hops = [0]
+    original_call = SyncToAsync.__call__
+
+    async def counting_call(self, *args, **kwargs):
+        hops[0] += 1
+        return await original_call(self, *args, **kwargs)
+
+    async def run(handler, headers):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited(index):
+            async with semaphore:
+                return await _asgi_request(handler, index, headers)
+
+        return await asyncio.gather(*(limited(i) for i in range(args.requests)))
+
+    def seed_role():
+        role_cache = roles.get_role_cache()
+        role_key, version_key = role_cache._keys('1')
+        cache.set(version_key, 1.0, None)
+        cache.set(role_key, (1.0, 'ADMIN'), None)
+
+    print(f"{args.requests} POSTs through ASGIHandler, {args.concurrency} in flight")
+    print(f"{'stack':<18}{'us/req':>9}{'req/s':>9}{'thread hops/req':>17}")
+    SyncToAsync.__call__ = counting_call
+    try:
+        for label, stack in STACKS.items():
+            with_auth = stack[:len(AUTH_MIDDLEWARE)] == AUTH_MIDDLEWARE
+            rules._engine = rules.RuleEngine.from_config(
+                [role_rule, rate_rule] if with_auth else [rate_rule])
+            headers = [cookie] if with_auth else []
+            settings.MIDDLEWARE = stack
+            handler = ASGIHandler()
+            seed_role()
+            asyncio.run(run(handler, headers))  # warm-up
+            cache.clear()
+            seed_role()
+            hops[0] = 0
+            start = time.perf_counter()
+            statuses = asyncio.run(run(handler, headers))
+            elapsed = time.perf_counter() - start
+            assert set(statuses) == {200}, set(statuses)
+            print(f"{label:<18}{elapsed / args.requests * 1e6:>9.1f}"
+                  f"{args.requests / elapsed:>9.0f}{hops[0] / args.requests:>17.1f}")
+    finally:
+        SyncToAsync.__call__ = original_call
+
+
+def bench_metrics(args):
+    def query_view(request):
+        with connection.cursor() as cursor:
+            for _ in range(args.queries):
+                cursor.execute('SELECT 1')
+        return HttpResponse('ok' * 100)
+
+    factory = RequestFactory()
+    match = resolve('/api/messages/')
+    requests = [factory.get('/api/messages/') for _ in range(args.requests)]
+    for request in requests:
+        request.resolver_match = match
+    print(f"{args.requests} GETs, {args.queries} queries each")
+    print(f"{'sample rate':<12}{'us/req':>9}{'overhead us':>13}")
+    baseline = None
+    for rate in (None, 0.0, 0.01, 0.1, 1.0):
+        if rate is None:
+            handler = query_view
+        else:
+            metrics._metrics = metrics.RequestMetrics({'SAMPLE_RATE': rate})
+            handler = middleware.RequestMetricsMiddleware(query_view)
+        cost = time_requests(handler, requests)[0]
+        baseline = cost if baseline is None else baseline
+        label = 'no metrics' if rate is None else str(rate)
+        print(f"{label:<12}{cost:>9.1f}{cost - baseline:>13.1f}")
+    observed = metrics._metrics.render()
+    assert f'chats_db_queries_per_request_sum{{route="api/messages/",method="GET"}} ' \
+        f'{args.queries * args.requests}' in observed, observed
+
+
+def bench_filter(args):
+    rng = random.Random(1337)
+    letters = string.ascii_lowercase
+
+    def word(low, high):
+        return ''.join(rng.choice(letters) for _ in range(rng.randint(low, high)))
+
+    terms = list({word(6, 12) for _ in range(args.terms)})
+    start = time.perf_counter()
+    automaton = AhoCorasick(terms)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    alternation = re.compile('|'.join(map(re.escape, sorted(terms, key=len, reverse=True))))
+    regex_build = time.perf_counter() - start
+    print(f"{len(terms)} terms: automaton built in {build * 1000:.0f} ms "
+          f"({len(automaton.goto)} states), regex in {regex_build * 1000:.0f} ms")
+    print(f"{'chars':>7}{'naive us':>11}{'regex us':>11}{'automaton us':>14}")
+    for size in (100, 1000, 10000):
+        # Clean messages, the common case: every matcher reads all of them.
+        messages = []
+        while len(messages) < 20:
+            words = []
+            while sum(map(len, words)) < size:
+                words.append(word(1, 8))
+            message = ' '.join(words)[:size]
+            if automaton.search(message) is None:
+                messages.append(message)
+        costs = []
+        for matcher in (lambda text: any(term in text for term in terms),
+                        alternation.search, automaton.search):
+            rounds = max(1, 2000 // size)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for message in messages:
+                    matcher(message)
+            costs.append((time.perf_counter() - start) / (rounds * len(messages)) * 1e6)
+        print(f"{size:>7}{costs[0]:>11.1f}{costs[1]:>11.1f}{costs[2]:>14.1f}")
+    content_filter = ContentFilter(terms)
+    factory = RequestFactory()
+    body = {'message_body': ' '.join(word(1, 8) for _ in range(40))}
+    requests = [factory.post('/api/messages/', body, content_type='application/json')
+                for _ in range(2000)]
+    start = time.perf_counter()
+    for request in requests:
+        content_filter.inspect(request)
+    print(f"JSON message of {len(body['message_body'])} chars through ContentFilter.inspect: "
+          f"{(time.perf_counter() - start) / len(requests) * 1e6:.1f} us")
+
+
+WORDS = ['users', 'messages', 'conversations', 'files', 'reports', 'teams', 'search']
+
+
+BENCHMARKS = {
+    'asgi': bench_asgi,
+    'filter': bench_filter,
+    'metrics': bench_metrics,
+    'rules': bench_rules,
+    'ratelimit': bench_ratelimit,
+    'store': bench_store,
+}
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--terms', type=int, default=10000, help='blocklist size for filter')
+    parser.add_argument('--queries', type=int, default=3, help='queries per request for metrics')
+    parser.add_argument('--rule-counts', type=lambda v: [int(x) for x in v.split(',')],
+                        default=[10, 1000, 5000], help='comma-separated rule table sizes')
+    parser.add_argument('--limits', type=lambda v: [int(x) for x in v.split(",")],
+                        default=[5, 1000, 10000], help='comma-separated limits to compare')
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,227 @@
+# Django-Middleware-0x03/chats/content_filter.py
+
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+# Defaults for the CONTENT_FILTER setting. Any key can be overridden, e.g.
+# CONTENT_FILTER = {'TERMS_FILE': '/etc/chats/blocklist.txt'}
+# Which requests are filtered is set by the rule table (see rules.py).
+DEFAULTS = {
+    'TERMS': (),              # blocked terms, on top of TERMS_FILE
+    'TERMS_FILE': None,       # one term per line; '#' starts a comment
+    'RELOAD_INTERVAL': 5.0,   # seconds between checks of TERMS_FILE for changes
+    'WHOLE_WORDS': True,      # 'ass' blocks "ass" but not "class"
+    'FIELDS': None,           # JSON/form fields to inspect; None for every string
+}
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a set of terms: `search` finds any of
+    them in one pass over the text, however many terms there are.
+
+    States are indices into parallel lists: `goto` holds each state's
+    transitions, `fail` the state of its longest proper suffix, and
+    `out` the lengths of every term ending there, its suffixes' included.
+    """
+    def __init__(self, terms):
+        goto = [{}]
+        out = [()]
+        terms = sorted({term for term in terms if term})
+        for term in terms:
+            state = 0
+            for char in term:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    out.append(())
+                state = next_state
+            out[state] = (len(term),)
+        fail = [0] * len(goto)
+        # Breadth first, so a state's fail state is final before its children's.
+        level = list(goto[0].values())
+        while level:
+            next_level = []
+            for state in level:
+                for char, child in goto[state].items():
+                    suffix = fail[state]
+                    while suffix and char not in goto[suffix]:
+                        suffix = fail[suffix]
+                    fail_state = goto[suffix].get(char, 0)
+                    fail[child] = fail_state if fail_state != child else 0
+                    if out[fail[child]]:
+                        out[child] = out[child] + out[fail[child]]
+                    next_level.append(child)
+            level = next_level
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+        self.terms = len(terms)
+
+    def search(self, text, whole_words=False):
+        """
+        Returns the first term found in `text` as (start, end), or None.
+        With `whole_words`, a match must not have a letter or digit
+        right before or after it.
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for index, char in enumerate(text):
+            transitions = goto[state]
+            while char not in transitions and state:
+                state = fail[state]
+                transitions = goto[state]
+            state = transitions.get(char, 0)
+            if out[state]:
+                end = index + 1
+                for length in out[state]:
+                    start = end - length
+                    if not whole_words or (
+                        (start == 0 or not text[start - 1].isalnum())
+                        and (end == len(text) or not text[end].isalnum())
+                    ):
+                        return start, end
+        return None
+
+
+def load_terms(path):
+    """
+    The terms of a blocklist file: one per line, '#' comments ignored.
+    """
+    with open(path, encoding='utf-8') as terms_file:
+        return [line.split('#', 1)[0].strip() for line in terms_file]
+
+
+class ContentFilter:
+    """
+    Checks message payloads against a blocklist.
+
+    The automaton is built once; when TERMS_FILE changes, a new one is
+    built on a background thread and swapped in when ready, so requests
+    never wait for a rebuild. Text is case-folded before matching, and
+    all inspected fields are joined so they are scanned in one pass.
+    """
+    def __init__(self, terms=(), terms_file=None, reload_interval=5.0,
+                 whole_words=True, fields=None):
+        self.extra_terms = list(terms)
+        self.terms_file = terms_file
+        self.reload_interval = reload_interval
+        self.whole_words = whole_words
+        self.fields = frozenset(fields) if fields is not None else None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._next_check = time.monotonic() + reload_interval
+        self._mtime = self._terms_mtime()
+        self.matcher = self._build()
+
+    @classmethod
+    def from_settings(cls):
+        config = dict(DEFAULTS, **getattr(settings, 'CONTENT_FILTER', {}))
+        return cls(config['TERMS'], config['TERMS_FILE'], config['RELOAD_INTERVAL'],
+                   config['WHOLE_WORDS'], config['FIELDS'])
+
+    def _terms_mtime(self):
+        try:
+            return os.stat(self.terms_file).st_mtime_ns if self.terms_file else None
+        except OSError:
+            return None
+
+    def _build(self):
+        terms = list(self.extra_terms)
+        if self.terms_file:
+            terms += load_terms(self.terms_file)
+        return AhoCorasick(term.casefold() for term in terms)
+
+    def reload(self):
+        """
+        Rebuilds the automaton from the current terms, in this thread.
+        """
+        self.matcher = self._build()
+        self.reloads += 1
+
+    def _check_for_changes(self):
+        # At most one stat per `reload_interval`, and one rebuild at a time.
+        now = time.monotonic()
+        if not self.terms_file or now < self._next_check or self._reloading:
+            return
+        with self._lock:
+            if self._reloading or now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+            mtime = self._terms_mtime()
+            if mtime is None or mtime == self._mtime:
+                return
+            self._mtime = mtime
+            self._reloading = True
+        threading.Thread(target=self._background_reload, name='content-filter-reload',
+                         daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except (OSError, ValueError):
+            pass  # keep the current automaton until the file is readable again
+        finally:
+            self._reloading = False
+
+    def find(self, text):
+        """
+        The first blocked term in `text`, or None.
+        """
+        self._check_for_changes()
+        text = text.casefold()
+        match = self.matcher.search(text, self.whole_words)
+        return text[match[0]:match[1]] if match else None
+
+    def inspect(self, request):
+        """
+        The first blocked term in the request's message fields, or None.
+        JSON bodies and form posts are inspected; other bodies are not.
+        """
+        content_type = request.content_type or ''
+        if content_type == 'application/json' or content_type.endswith('+json'):
+            try:
+                payload = json.loads(request.body or b'null')
+            except (ValueError, UnicodeDecodeError):
+                return None  # left to the view to reject
+        elif content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+            payload = {key: request.POST.getlist(key) for key in request.POST}
+        else:
+            return None
+        texts = []
+        self._collect(payload, texts, self.fields is None)
+        # NUL never occurs in a term, so no match spans two fields.
+        return self.find('\0'.join(texts)) if texts else None
+
+    def _collect(self, value, texts, wanted):
+        if isinstance(value, str):
+            if wanted:
+                texts.append(value)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                self._collect(item, texts, wanted or key in self.fields)
+        elif isinstance(value, list):
+            for item in value:
+                self._collect(item, texts, wanted)
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_filter():
+    """
+    Returns the process-wide content filter, built on first use.
+    """
+    global _filter
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = ContentFilter.from_settings()
+    return _filter
@@ -0,0 +1,392 @@
+# Django-Middleware-0x03/chats/log_archive.py
+
+import contextlib
+import glob
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking, so one writer per file there
+    fcntl = None
+
+INDEX_SUFFIX = '.idx'
+LOCK_SUFFIX = '.lock'
+ARCHIVE_LOCK_SUFFIX = '.archive.lock'
+# A chunk listing more users than this is indexed as "any user".
+MAX_INDEXED_USERS = 256
+_SEGMENT_SUFFIX = re.compile(r'\.\d{8}-\d{6}(?:-\d+)?$')
+_ROTATION_STAMP = re.compile(r'\.(\d{8}-\d{6})(?:-(\d+))?(?:\.gz)?$')
+
+
+class FileLock:
+    """
+    An exclusive flock on `path`, taken by every process writing or
+    archiving the same log. Does nothing without fcntl.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'a') if fcntl is not None else None
+
+    @contextlib.contextmanager
+    def held(self):
+        if self.file is None:
+            yield
+            return
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class RotatingLogFile:
+    """
+    The live log file, rotated once it would grow past `max_bytes` or
+    has been open for `interval` seconds (None turns either off).
+
+    A rotated file is renamed to `<path>.<UTC time>` and handed to the
+    `compressor`, if any. Several processes may append to the same
+    `path`: each batch and each rotation holds `<path>.lock`, and a
+    writer reopens `path` first if another process has moved it aside,
+    so no line lands in a segment once it is rotated.
+    """
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, interval=24 * 60 * 60, compressor=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compressor = compressor
+        self.rotations = 0
+        self.lock = FileLock(path + LOCK_SUFFIX)
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.size = self.file.tell()
+        self.opened_at = _first_record_time(self.path) if self.size else time.time()
+
+    def _follow(self):
+        # Reopens `path` if another process rotated it, and catches up
+        # with the size their writes gave it.
+        try:
+            moved = os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self.file.close()
+            self._open()
+        else:
+            self.size = os.fstat(self.file.fileno()).st_size
+
+    def _rotation_due(self, data_size):
+        return self.size and (
+            (self.max_bytes and self.size + data_size > self.max_bytes)
+            or (self.interval and time.time() - self.opened_at >= self.interval)
+        )
+
+    def write(self, text):
+        data_size = len(text.encode('utf-8'))
+        with self.lock.held():
+            self._follow()
+            if self._rotation_due(data_size):
+                self._rotate()
+            self.file.write(text)
+            self.file.flush()
+            self.size += data_size
+
+    def rotate(self):
+        """
+        Closes the current file, moves it aside and starts a new one.
+        """
+        with self.lock.held():
+            self._follow()
+            self._rotate()
+
+    def _rotate(self):
+        self.file.close()
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+        segment = f"{self.path}.{stamp}"
+        suffix = 1
+        while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            segment = f"{self.path}.{stamp}-{suffix}"
+            suffix += 1
+        os.replace(self.path, segment)
+        self.rotations += 1
+        self._open()
+        if self.compressor is not None:
+            self.compressor.submit(segment)
+
+    def close(self):
+        self.file.close()
+        self.lock.close()
+
+
+def _first_record_time(path):
+    # When the file's first record was written; the rotation clock of a
+    # file left over from a previous run starts there.
+    try:
+        with open(path, encoding='utf-8') as log_file:
+            return _parse_time(json.loads(log_file.readline())['time']).timestamp()
+    except (OSError, ValueError, KeyError, TypeError):
+        return time.time()
+
+
+class ArchiveCompressor(threading.Thread):
+    """
+    Background thread turning rotated segments into indexed gzip
+    archives and deleting archives past the retention policy.
+
+    An archive is a series of independent gzip members of about
+    `chunk_bytes` of log each, which gzip tools still read as one file.
+    Its index, `<archive>.idx`, gives every member's offset, time range
+    and users, so `query` only decompresses the members it needs.
+
+    Compressing and pruning hold `<path>.archive.lock`, so when several
+    processes share the log, each segment is archived by one of them.
+    """
+    def __init__(self, path, retention_days=14, max_archives=None, chunk_bytes=1024 * 1024):
+        super().__init__(name='request-log-compressor', daemon=True)
+        self.path = path
+        self.retention_days = retention_days
+        self.max_archives = max_archives
+        self.chunk_bytes = chunk_bytes
+        self.queue = queue.Queue()
+        self.archived = 0
+        self.failed = 0
+        self.deleted = 0
+        self.lock = FileLock(path + ARCHIVE_LOCK_SUFFIX)
+
+    def submit(self, segment):
+        self.queue.put(segment)
+
+    def recover(self):
+        """
+        Queues segments a previous run rotated but never compressed.
+        Another process may queue the same ones; whichever gets to a
+        segment first archives it, and the other skips it.
+        """
+        for segment in pending_segments(self.path):
+            self.submit(segment)
+
+    def run(self):
+        while True:
+            segment = self.queue.get()
+            if segment is None:
+                break
+            with self.lock.held():
+                if os.path.exists(segment):
+                    try:
+                        compress_segment(segment, self.chunk_bytes)
+                        self.archived += 1
+                    except OSError:
+                        self.failed += 1  # left in place for the next run's recover()
+                self._prune()
+
+    def prune(self):
+        with self.lock.held():
+            self._prune()
+
+    def _prune(self):
+        archives = archive_files(self.path)
+        cutoff = time.time() - self.retention_days * 24 * 60 * 60 if self.retention_days else None
+        expired = [archive for archive in archives if cutoff and os.path.getmtime(archive) < cutoff]
+        if self.max_archives is not None:
+            kept = [archive for archive in archives if archive not in expired]
+            expired += kept[:max(len(kept) - self.max_archives, 0)]
+        for archive in expired:
+            for name in (archive, archive + INDEX_SUFFIX):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+            self.deleted += 1
+
+    def stop(self, timeout=30.0):
+        """
+        Compresses everything submitted so far, then ends the thread.
+        """
+        self.queue.put(None)
+        self.join(timeout)
+        if not self.is_alive():
+            self.lock.close()
+
+
+def compress_segment(segment, chunk_bytes=1024 * 1024):
+    """
+    Compresses `segment` into `<segment>.gz` plus its index, then
+    deletes it. Returns the index.
+    """
+    archive = segment + '.gz'
+    chunks = []
+    with open(segment, 'rb') as source, open(archive + '.tmp', 'wb') as target:
+        while True:
+            lines = source.readlines(chunk_bytes)
+            if not lines:
+                break
+            chunk = _summarize(lines)
+            chunk['offset'] = target.tell()
+            target.write(gzip.compress(b''.join(lines)))
+            chunk['length'] = target.tell() - chunk['offset']
+            chunks.append(chunk)
+    times = [chunk[key] for chunk in chunks for key in ('start', 'end') if chunk[key]]
+    index = {
+        'start': min(times, key=_parse_time, default=None),
+        'end': max(times, key=_parse_time, default=None),
+        'records': sum(chunk['records'] for chunk in chunks),
+        'chunks': chunks,
+    }
+    with open(archive + INDEX_SUFFIX + '.tmp', 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, separators=(',', ':'))
+    os.replace(archive + INDEX_SUFFIX + '.tmp', archive + INDEX_SUFFIX)
+    os.replace(archive + '.tmp', archive)
+    os.remove(segment)
+    return index
+
+
+def _summarize(lines):
+    start = end = None
+    users = set()
+    records = 0
+    for line in lines:
+        try:
+            record = json.loads(line)
+            moment = _parse_time(record['time'])
+        except (ValueError, KeyError, TypeError):
+            continue
+        records += 1
+        start = moment if start is None or moment < start else start
+        end = moment if end is None or moment > end else end
+        if users is not None:
+            users.add(record.get('user'))
+            if len(users) > MAX_INDEXED_USERS:
+                users = None
+    return {
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'records': records,
+        'users': sorted(users, key=str) if users is not None else None,
+    }
+
+
+def _rotation_order(name):
+    # By rotation time, then by the suffix of a segment rotated in the
+    # same second: as plain strings `.log.<stamp>-1` would sort first.
+    match = _ROTATION_STAMP.search(name)
+    if match is None:
+        return ('', 0, name)
+    return (match.group(1), int(match.group(2) or 0), name)
+
+
+def archive_files(path):
+    """
+    The compressed archives of `path`, oldest first.
+    """
+    return sorted(glob.glob(glob.escape(path) + '.*.gz'), key=_rotation_order)
+
+
+def pending_segments(path):
+    """
+    Rotated segments of `path` not compressed yet, oldest first.
+    """
+    return sorted((name for name in glob.glob(glob.escape(path) + '.*')
+                   if _SEGMENT_SUFFIX.search(name)), key=_rotation_order)
+
+
+def logged_user(user):
+    """
+    `user` as the request log records it: 'id:<pk>' for a user id, given
+    as a number or already in that form; anything else, such as
+    'AnonymousUser', as is.
+    """
+    user = str(user)
+    return f"id:{user}" if user.isdigit() else user
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class LogQuery:
+    """
+    Records of a request log and its archives matching a time range
+    and/or user, oldest file first.
+
+    Users are logged by id (see middleware._logged_user), so `user` is a
+    user id, as a number or 'id:<pk>' (see `logged_user`).
+
+    Archive members whose indexed time range or users rule them out are
+    skipped without being read; the live file and uncompressed segments
+    are scanned in full. `chunks_read` and `chunks_skipped` tell how much
+    was decompressed.
+    """
+    def __init__(self, path, since=None, until=None, user=None):
+        self.path = path
+        self.since = _parse_time(since) if since is not None else None
+        self.until = _parse_time(until) if until is not None else None
+        self.user = logged_user(user) if user is not None else None
+        self.chunks_read = 0
+        self.chunks_skipped = 0
+
+    def __iter__(self):
+        for archive in archive_files(self.path):
+            try:
+                with open(archive + INDEX_SUFFIX, encoding='utf-8') as index_file:
+                    index = json.load(index_file)
+            except (OSError, ValueError):
+                yield from self._scan(gzip.open(archive, 'rb'))  # no index: read it all
+                continue
+            with open(archive, 'rb') as archive_file:
+                for chunk in index['chunks']:
+                    if not self._may_match(chunk):
+                        self.chunks_skipped += 1
+                        continue
+                    self.chunks_read += 1
+                    archive_file.seek(chunk['offset'])
+                    data = gzip.decompress(archive_file.read(chunk['length']))
+                    yield from self._filter(data.splitlines())
+        for name in pending_segments(self.path) + [self.path]:
+            try:
+                yield from self._scan(open(name, 'rb'))
+            except FileNotFoundError:
+                continue
+
+    def _may_match(self, chunk):
+        if chunk['records'] == 0:
+            return False
+        if self.since is not None and _parse_time(chunk['end']) < self.since:
+            return False
+        if self.until is not None and _parse_time(chunk['start']) > self.until:
+            return False
+        return self.user is None or chunk['users'] is None or self.user in chunk['users']
+
+    def _scan(self, log_file):
+        with log_file:
+            yield from self._filter(log_file)
+
+    def _filter(self, lines):
+        for line in lines:
+            try:
+                record = json.loads(line)
+                moment = _parse_time(record['time'])
+            except (ValueError, KeyError, TypeError):
+                continue  # not a JSON request record
+            if self.user is not None and record.get('user') != self.user:
+                continue
+            if self.since is not None and moment < self.since:
+                continue
+            if self.until is not None and moment > self.until:
+                continue
+            yield record
@@ -0,0 +1,247 @@
+# Django-Middleware-0x03/chats/metrics.py
+
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+# Defaults for the REQUEST_METRICS setting. Any key can be overridden, e.g.
+# REQUEST_METRICS = {'SAMPLE_RATE': 0.05}
+DEFAULTS = {
+    'PATH': '/internal/metrics/',         # served by RequestMetricsMiddleware
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),  # who may read it; anyone else gets a 404
+    # Behind a reverse proxy on the same host every request comes from
+    # 127.0.0.1, so requests the proxy marks with X-Forwarded-For or
+    # Forwarded are refused too. Only a proxy that adds neither header
+    # needs PATH blocked there, or ALLOWED_IPS narrowed.
+    'REFUSE_FORWARDED': True,
+    'SAMPLE_RATE': 1.0,     # share of requests timed in full (0 to 1)
+    'MAX_ROUTES': 500,      # routes tracked before the rest share one '<other>' label
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100),
+    'SIZE_BUCKETS': (100, 1000, 10000, 100000, 1000000),
+}
+
+UNMATCHED_ROUTE = '<unmatched>'
+OTHER_ROUTE = '<other>'
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense: counts per upper
+    bound, plus the sum and count of every observation.
+    """
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.bounds, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class QueryTimer:
+    """
+    A `connection.execute_wrapper` hook counting the queries of one
+    request and the time spent in them. Used as a context manager, it
+    watches every database connection of the current thread.
+    """
+    __slots__ = ('count', 'seconds', '_connections')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._connections = ()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+    # What connection.execute_wrapper() does, without a generator-based
+    # context manager per connection on every request.
+    def __enter__(self):
+        self._connections = connections.all()
+        for connection in self._connections:
+            connection.execute_wrappers.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        for connection in self._connections:
+            connection.execute_wrappers.pop()
+        self._connections = ()
+
+
+class _RouteStats:
+    __slots__ = ('latency', 'queries', 'query_seconds', 'size')
+
+    def __init__(self, config):
+        self.latency = Histogram(config['LATENCY_BUCKETS'])
+        self.queries = Histogram(config['QUERY_BUCKETS'])
+        self.query_seconds = 0.0
+        self.size = Histogram(config['SIZE_BUCKETS'])
+
+
+class RequestMetrics:
+    """
+    In-process request metrics, rendered in the Prometheus text format.
+
+    Every request counts towards `chats_http_requests_total` by route,
+    method and status. Only a sampled share (`sample_rate`) is timed and
+    has its queries and response size recorded, so the histograms
+    describe that sample; `chats_metrics_sample_rate` says how large it
+    is. Each worker process keeps its own numbers, the way a Prometheus
+    scrape of each worker expects.
+    """
+    def __init__(self, config=None):
+        self.config = dict(DEFAULTS, **(config or {}))
+        self.sample_rate = float(self.config['SAMPLE_RATE'])
+        if not 0 <= self.sample_rate <= 1:
+            raise ValueError(f"SAMPLE_RATE must be between 0 and 1, not {self.sample_rate}")
+        self.max_routes = self.config['MAX_ROUTES']
+        self._lock = threading.Lock()
+        self._requests = {}  # (route, method, status) -> count
+        self._routes = {}    # (route, method) -> _RouteStats
+        self._known_routes = set()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(getattr(settings, 'REQUEST_METRICS', None))
+
+    def route_of(self, request):
+        """
+        The URL pattern that served the request, so /api/messages/12/ and
+        /api/messages/13/ share a label; capped at `max_routes` routes.
+        """
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None and match.route else UNMATCHED_ROUTE
+        if route not in self._known_routes:
+            with self._lock:
+                if len(self._known_routes) >= self.max_routes:
+                    return OTHER_ROUTE
+                self._known_routes.add(route)
+        return route
+
+    def count(self, route, method, status):
+        key = (route, method, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def observe(self, route, method, status, seconds, timer, size):
+        """
+        Records one sampled request. `timer` is its QueryTimer, or None
+        when its queries were not watched; `size` is None when unknown.
+        """
+        key = (route, method)
+        with self._lock:
+            self._requests[key + (status,)] = self._requests.get(key + (status,), 0) + 1
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = _RouteStats(self.config)
+            stats.latency.observe(seconds)
+            if timer is not None:
+                stats.queries.observe(timer.count)
+                stats.query_seconds += timer.seconds
+            if size is not None:
+                stats.size.observe(size)
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format (0.0.4).
+        """
+        with self._lock:
+            requests = sorted(self._requests.items())
+            routes = sorted((key, _copy(stats)) for key, stats in self._routes.items())
+        lines = [
+            '# HELP chats_metrics_sample_rate Share of requests recorded in the histograms.',
+            '# TYPE chats_metrics_sample_rate gauge',
+            f"chats_metrics_sample_rate {self.sample_rate}",
+            '# HELP chats_http_requests_total Requests by route, method and status.',
+            '# TYPE chats_http_requests_total counter',
+        ]
+        for (route, method, status), count in requests:
+            lines.append(f"chats_http_requests_total{_labels(route=route, method=method, status=status)} {count}")
+        for name, attribute, help_text in (
+            ('chats_http_request_duration_seconds', 'latency', 'Latency of sampled requests.'),
+            ('chats_db_queries_per_request', 'queries', 'Database queries per sampled request.'),
+            ('chats_http_response_size_bytes', 'size', 'Body size of sampled responses.'),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (route, method), stats in routes:
+                histogram = getattr(stats, attribute)
+                if not histogram.count:
+                    continue
+                for bound, total in histogram.cumulative():
+                    labels = _labels(route=route, method=method, le=_number(bound))
+                    lines.append(f"{name}_bucket{labels} {total}")
+                labels = _labels(route=route, method=method)
+                lines.append(f"{name}_sum{labels} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{labels} {histogram.count}")
+        lines.append('# HELP chats_db_query_seconds_total Time spent in queries of sampled requests.')
+        lines.append('# TYPE chats_db_query_seconds_total counter')
+        for (route, method), stats in routes:
+            if stats.queries.count:
+                lines.append(f"chats_db_query_seconds_total{_labels(route=route, method=method)} "
+                             f"{_number(stats.query_seconds)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(stats):
+    # A snapshot, so rendering happens outside the lock.
+    copy = _RouteStats.__new__(_RouteStats)
+    for name in ('latency', 'queries', 'size'):
+        source = getattr(stats, name)
+        histogram = Histogram(source.bounds)
+        histogram.counts = list(source.counts)
+        histogram.sum = source.sum
+        histogram.count = source.count
+        setattr(copy, name, histogram)
+    copy.query_seconds = stats.query_seconds
+    return copy
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    Returns the process-wide metrics, built from settings on first use.
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = RequestMetrics.from_settings()
+    return _metrics
@@ -1,89 +1,332 @@
 # Django-Middleware-0x03/chats/middleware.py
 
-import logging
 from datetime import datetime
-from django.http import HttpResponseForbidden, JsonResponse
+import random
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.sessions import middleware as session_middleware
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.functional import SimpleLazyObject
 import time
-from django.core.cache import cache
 
-# ... (Logging setup remains the same) ...
-logging.basicConfig(filename='requests.log', level=logging.INFO, format='%(message)s')
+from .content_filter import get_filter
+from .metrics import QueryTimer, get_metrics
+from .request_log import get_pipeline
+from .roles import get_role_cache, token_claims, token_user_id
+from .rules import policy_for
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs natively in both modes.
+
+    Django hands an async `get_response` to async-capable middleware
+    under ASGI; the middleware then marks itself as a coroutine function
+    and serves requests through `__acall__`, so no thread switch is
+    needed to get through it. Under WSGI everything stays synchronous.
+    """
+    sync_capable = True
+    async_capable = True
 
-class RequestLoggingMiddleware:
-    # ... (Keep this class as it is) ...
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+class SessionMiddleware(session_middleware.SessionMiddleware):
+    """
+    Django's SessionMiddleware, without its two thread hops per request
+    in async mode. Attaching the (unloaded) session does no I/O, and
+    neither does finishing the response unless the session has to be
+    saved, so only a save is sent to a thread.
+    """
+    async def __acall__(self, request):
+        self.process_request(request)
+        response = await self.get_response(request)
+        if request.session.modified or settings.SESSION_SAVE_EVERY_REQUEST:
+            return await sync_to_async(self.process_response)(request, response)
+        return self.process_response(request, response)
+
+class AuthenticationMiddleware(auth_middleware.AuthenticationMiddleware):
+    """
+    Django's AuthenticationMiddleware, without its thread hop per request
+    in async mode: it only attaches the lazy `request.user` and
+    `request.auser`, which does no I/O.
+    """
+    async def __acall__(self, request):
+        self.process_request(request)
+        return await self.get_response(request)
+
+class RequestLoggingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Logs every request as a JSON line in requests.log.
+
+    The request only puts a record on an in-memory queue; a background
+    thread formats and writes the records in batches (see request_log.py
+    and the REQUEST_LOG setting). The user is never loaded just to be
+    logged (see `_logged_user`).
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.pipeline = get_pipeline()
     def __call__(self, request):
-        user = request.user if request.user.is_authenticated else 'AnonymousUser'
-        log_message = f"{datetime.now()} - User: {user} - Path: {request.path}"
-        logging.info(log_message)
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
         response = self.get_response(request)
+        self._log(request, response, start)
+        return response
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._log(request, response, start)
         return response
+    def _log(self, request, response, start):
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.pipeline.log(_logged_user(request), request.method, request.path,
+                          response.status_code, round(latency_ms, 3))
+
+def _logged_user(request):
+    """
+    Who made the request, as far as is known without a lookup, as
+    'id:<pk>': from the user if the view or a middleware already loaded
+    it, else from an already loaded session or the bearer token. Always
+    the id, so one user is logged the same way whichever was at hand
+    (see LogQuery). 'AnonymousUser' if nobody is known.
+    """
+    user = request.__dict__.get('_cached_user') or request.__dict__.get('_acached_user')
+    if user is None:
+        # Set outright rather than lazily, e.g. by DRF's authentication.
+        assigned = request.__dict__.get('user')
+        if assigned is not None and not isinstance(assigned, SimpleLazyObject):
+            user = assigned
+    if user is not None:
+        return f"id:{user.pk}" if user.is_authenticated else 'AnonymousUser'
+    session = getattr(request, 'session', None)
+    user_id = getattr(session, '_session_cache', {}).get(SESSION_KEY)
+    if user_id is None:
+        claims = token_claims(request)
+        user_id = token_user_id(claims) if claims is not None else None
+    return f"id:{user_id}" if user_id is not None else 'AnonymousUser'
+
+class RequestMetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Records per-route latency, database queries, response size and
+    status (see metrics.py), and serves them in the Prometheus text
+    format at REQUEST_METRICS['PATH'] to the ALLOWED_IPS, unless the
+    request came through a proxy (see metrics.DEFAULTS).
 
-class RestrictAccessByTimeMiddleware:
-    # ... (Keep this class as it is) ...
+    Put it first in MIDDLEWARE so the latency covers the whole stack.
+    With a SAMPLE_RATE below 1, unsampled requests only bump a counter.
+    Queries are counted through `connection.execute_wrapper` on sync
+    requests only: in async mode the ORM runs on Django's sync thread,
+    where a wrapper installed here does not reach.
+    """
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
+        self.metrics = get_metrics()
+        self.path = self.metrics.config['PATH']
+        self.allowed_ips = frozenset(self.metrics.config['ALLOWED_IPS'])
+        self.refuse_forwarded = self.metrics.config['REFUSE_FORWARDED']
     def __call__(self, request):
-        if request.path.startswith('/api/'):
-            current_hour = datetime.now().hour
-            if not (9 <= current_hour < 18):
-                return HttpResponseForbidden("Access is restricted to between 9 AM and 6 PM.")
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path == self.path:
+            return self._serve(request)
+        if not self._sampled():
+            response = self.get_response(request)
+            self.metrics.count(self.metrics.route_of(request), request.method, response.status_code)
+            return response
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with timer:
+            response = self.get_response(request)
+        self._observe(request, response, time.perf_counter() - start, timer)
+        return response
+    async def __acall__(self, request):
+        if request.path == self.path:
+            return self._serve(request)
+        if not self._sampled():
+            response = await self.get_response(request)
+            self.metrics.count(self.metrics.route_of(request), request.method, response.status_code)
+            return response
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, time.perf_counter() - start, None)
+        return response
+    def _sampled(self):
+        rate = self.metrics.sample_rate
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+    def _observe(self, request, response, seconds, timer):
+        size = None if response.streaming else len(response.content)
+        self.metrics.observe(self.metrics.route_of(request), request.method,
+                             response.status_code, seconds, timer, size)
+    def _serve(self, request):
+        if request.META.get('REMOTE_ADDR') not in self.allowed_ips or (
+            self.refuse_forwarded
+            and ('HTTP_X_FORWARDED_FOR' in request.META or 'HTTP_FORWARDED' in request.META)
+        ):
+            raise Http404
+        return HttpResponse(self.metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _hour(hour):
+    return f"{hour % 12 or 12} {'AM' if hour % 24 < 12 else 'PM'}"
+
+def _roles_denied(role, role_rules):
+    """
+    Returns a 403 response if the role misses one the rules ask for,
+    else None. A role of None means nobody is authenticated.
+    """
+    if role is None:
+        return HttpResponseForbidden("Access Denied: Authentication required.")
+    user_role = (role or '').upper()
+    for rule in role_rules:
+        if user_role not in rule.roles:
+            allowed = ' or '.join(sorted(role.title() for role in rule.roles))
+            return HttpResponseForbidden(f"Access Denied: {allowed} privileges required.")
+    return None
+
+class RoleCheckMiddleware(SyncAndAsyncMiddleware):
+    """
+    Refuses requests whose user lacks a role the rule table asks for.
+
+    Only rules of the middleware's `role_set`, or of no set, are
+    enforced. Nothing is looked up unless one of them matches. The user
+    id comes from the bearer token, else from the session, and the role
+    from the token's role claim or the role cache (see roles.py), so the
+    user itself is never loaded. Verifying the session against the
+    user's password hash is left to the view's `request.user`.
+    """
+    role_set = None
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.role_cache = get_role_cache()
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        role_rules = policy_for(request).roles_for(self.role_set)
+        if role_rules:
+            claims = token_claims(request)
+            if claims is not None:
+                role = self.role_cache.role(token_user_id(claims), claims)
+            else:
+                session = getattr(request, 'session', None)
+                user_id = session.get(SESSION_KEY) if session is not None else None
+                role = self.role_cache.role(user_id) if user_id is not None else None
+            denied = _roles_denied(role, role_rules)
+            if denied is not None:
+                return denied
+        return self.get_response(request)
+    async def __acall__(self, request):
+        role_rules = policy_for(request).roles_for(self.role_set)
+        if role_rules:
+            claims = token_claims(request)
+            if claims is not None:
+                role = await self.role_cache.arole(token_user_id(claims), claims)
+            else:
+                session = getattr(request, 'session', None)
+                user_id = await session.aget(SESSION_KEY) if session is not None else None
+                role = await self.role_cache.arole(user_id) if user_id is not None else None
+            denied = _roles_denied(role, role_rules)
+            if denied is not None:
+                return denied
+        return await self.get_response(request)
+
+class RestrictAccessByTimeMiddleware(SyncAndAsyncMiddleware):
+    """
+    Refuses requests outside the opening hours the rule table sets for
+    their path (see rules.py; by default /api/ from 9 AM to 6 PM).
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        denied = self._check(request)
+        if denied is not None:
+            return denied
         response = self.get_response(request)
         return response
+    async def __acall__(self, request):
+        denied = self._check(request)
+        if denied is not None:
+            return denied
+        return await self.get_response(request)
+    def _check(self, request):
+        hours = policy_for(request).hours
+        if hours:
+            current_hour = datetime.now().hour
+            for start, end in hours:
+                if not (start <= current_hour < end):
+                    return HttpResponseForbidden(
+                        f"Access is restricted to between {_hour(start)} and {_hour(end)}.")
+        return None
+
+def _rate_limited(retry_after):
+    response = JsonResponse({'error': 'Request limit exceeded. Please try again later.'}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+def _blocked_content():
+    return JsonResponse({'error': 'Message contains prohibited language.'}, status=400)
 
-class OffensiveLanguageMiddleware: # Rate Limiting Middleware
-    # ... (Keep this class as it is) ...
+class OffensiveLanguageMiddleware(SyncAndAsyncMiddleware): # Rate Limiting Middleware
+    """
+    Limits how often each client IP may hit the paths the rule table
+    gives a 'rate' (see rules.py; by default 5 POSTs a minute to
+    messages), then refuses payloads containing a blocked term on the
+    paths it marks 'filter' (see content_filter.py).
+
+    Every matching rule is checked with a constant-memory sliding-window
+    counter (see ratelimit.py), kept in the store chosen by
+    settings.RATE_LIMIT_STORE: the local cache, or a SQLite file shared
+    by every worker (see shared_store.py). In async mode the counters go
+    through the async store API (`SlidingWindowLimiter.ahit`).
+    """
     def __init__(self, get_response):
-        self.get_response = get_response
-        self.limit = 5
-        self.period = 60
+        super().__init__(get_response)
+        self.content_filter = get_filter()
     def __call__(self, request):
-        if request.method == 'POST' and 'messages' in request.path:
+        if self.async_mode:
+            return self.__acall__(request)
+        policy = policy_for(request)
+        if policy.rate_rules:
             ip_address = request.META.get('REMOTE_ADDR')
             if not ip_address:
                 return JsonResponse({'error': 'Could not identify client IP.'}, status=400)
-            cache_key = f"rate_limit_{ip_address}"
-            request_timestamps = cache.get(cache_key, [])
-            current_time = time.time()
-            valid_timestamps = [ts for ts in request_timestamps if current_time - ts < self.period]
-            if len(valid_timestamps) >= self.limit:
-                return JsonResponse({'error': 'Request limit exceeded. Please try again later.'}, status=429)
-            valid_timestamps.append(current_time)
-            cache.set(cache_key, valid_timestamps, self.period)
+            for rule in policy.rate_rules:
+                allowed, retry_after = rule.limiter.hit(ip_address)
+                if not allowed:
+                    return _rate_limited(retry_after)
+        if policy.filter and self.content_filter.inspect(request) is not None:
+            return _blocked_content()
         response = self.get_response(request)
         return response
+    async def __acall__(self, request):
+        policy = policy_for(request)
+        if policy.rate_rules:
+            ip_address = request.META.get('REMOTE_ADDR')
+            if not ip_address:
+                return JsonResponse({'error': 'Could not identify client IP.'}, status=400)
+            for rule in policy.rate_rules:
+                allowed, retry_after = await rule.limiter.ahit(ip_address)
+                if not allowed:
+                    return _rate_limited(retry_after)
+        if policy.filter and self.content_filter.inspect(request) is not None:
+            return _blocked_content()
+        return await self.get_response(request)
 
 # --- New Middleware for this task ---
-class RolePermissionMiddleware:
+class RolePermissionMiddleware(RoleCheckMiddleware):
     """
     Middleware that checks a user's role before allowing access to
     specific, admin-only actions or paths.
-    """
-    def __init__(self, get_response):
-        self.get_response = get_response
 
-    def __call__(self, request):
-        # We define a list of paths or actions that require admin privileges.
-        # Let's say any 'DELETE' request to our API is admin-only.
-        # And accessing Django's admin site should also be restricted.
-        is_admin_path = request.path.startswith('/admin/')
-        is_sensitive_method = request.method in ['DELETE', 'PUT', 'PATCH']
-
-        # We only apply this check if the user is trying to access a sensitive area.
-        if is_admin_path or (request.path.startswith('/api/') and is_sensitive_method):
-            # First, ensure the user is logged in.
-            if not request.user.is_authenticated:
-                return HttpResponseForbidden("Access Denied: Authentication required.")
-            
-            # Now, check the role. We assume the role is stored on the user model.
-            # The role should be checked in uppercase to be safe.
-            if not hasattr(request.user, 'role') or request.user.role.upper() != 'ADMIN':
-                return HttpResponseForbidden("Access Denied: Admin privileges required.")
-        
-        # If the path is not restricted or the user is an admin, proceed.
-        response = self.get_response(request)
-        return response
+    Which paths and methods need which roles is set by the 'roles' of the
+    rule table (see rules.py): by default /admin/, and DELETE/PUT/PATCH
+    on /api/, need ADMIN.
+    """
+    role_set = 'RolePermissionMiddleware'
     
     # Django-Middleware-0x03/chats/middleware.py
 
@@ -97,25 +340,11 @@ from django.core.cache import cache
 
 
 # --- New Middleware for this task ---
-class RolepermissionMiddleware:  # <-- EXACT NAME AS REQUIRED BY CHECKER
+class RolepermissionMiddleware(RoleCheckMiddleware):  # <-- EXACT NAME AS REQUIRED BY CHECKER
     """
     Middleware that checks a user's role before allowing access.
-    """
-    def __init__(self, get_response):
-        self.get_response = get_response
 
-    def __call__(self, request):
-        # We will restrict access to the /admin/ path
-        if request.path.startswith('/admin/'):
-            if not request.user.is_authenticated:
-                return HttpResponseForbidden("Access Denied: Authentication required.")
-            
-            # Check if user has a 'role' attribute and if it is 'ADMIN'
-            user_role = getattr(request.user, 'role', '').upper()
-            if user_role not in ['ADMIN', 'MODERATOR']: # As per instruction
-                return HttpResponseForbidden(
-                    "Access Denied: Admin or Moderator privileges required."
-                )
-        
-        response = self.get_response(request)
-        return response
\ No newline at end of file
+    The roles come from the rule table (see rules.py): by default /admin/
+    needs ADMIN or MODERATOR.
+    """
+    role_set = 'RolepermissionMiddleware'
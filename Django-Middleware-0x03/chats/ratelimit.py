@@ -0,0 +1,119 @@
+# Django-Middleware-0x03/chats/ratelimit.py
+
+import math
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Caches living in this process. Their async methods are BaseCache's
+# defaults, which run the sync method in a thread, so the async path
+# calls them directly: they never block on I/O.
+IN_PROCESS_CACHES = (LocMemCache, DummyCache)
+
+
+class SlidingWindowLimiter:
+    """
+    Constant-memory sliding-window counter on top of a Django cache.
+
+    Each client has one counter per fixed window of `period` seconds.
+    The count over the sliding window is estimated as the current
+    window's count plus the previous window's count weighted by how much
+    of it still overlaps. Counters are only touched with the cache's
+    atomic `add`/`incr`, so concurrent workers sharing the cache never
+    lose updates, and a client costs two integers whatever the limit.
+    """
+    def __init__(self, cache, limit, period, prefix='rl'):
+        # A cache alias, or a cache. Going through the `django.core.cache.cache`
+        # proxy costs a thread-local lookup on every call, so an alias is
+        # resolved once per request instead.
+        self.cache = cache
+        self.limit = limit
+        self.period = period
+        self.prefix = prefix
+
+    def hit(self, client, now=None):
+        """
+        Counts one request from `client`. Returns (allowed, retry_after),
+        where retry_after is the number of seconds to wait when refused.
+        """
+        store = caches[self.cache] if isinstance(self.cache, str) else self.cache
+        steps = self._steps(client, time.time() if now is None else now)
+        result = error = None
+        while True:
+            try:
+                name, *args = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            try:
+                result, error = getattr(store, name)(*args), None
+            except ValueError as exc:
+                result, error = None, exc
+
+    async def ahit(self, client, now=None):
+        """
+        `hit` for async callers, through the store's async API
+        (aget_many, aincr, aadd, adecr).
+        """
+        store = caches[self.cache] if isinstance(self.cache, str) else self.cache
+        if isinstance(store, IN_PROCESS_CACHES):
+            return self.hit(client, now)
+        steps = self._steps(client, time.time() if now is None else now)
+        result = error = None
+        while True:
+            try:
+                name, *args = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            try:
+                result, error = await getattr(store, 'a' + name)(*args), None
+            except ValueError as exc:
+                result, error = None, exc
+
+    def _steps(self, client, now):
+        # The algorithm, shared by `hit` and `ahit`: a generator yielding
+        # each store call as (method name, *args) and receiving its
+        # result, or the ValueError it raised, so the same code runs
+        # against the sync and the async cache API.
+        window = int(now // self.period)
+        key = f"{self.prefix}:{client}:{window}"
+        previous_key = f"{self.prefix}:{client}:{window - 1}"
+        counts = yield 'get_many', [key, previous_key]
+        current = counts.get(key, 0)
+        previous = counts.get(previous_key, 0)
+        overlap = ((window + 1) * self.period - now) / self.period
+        # Refused requests are not counted, so they cost a single read.
+        if previous * overlap + current + 1 <= self.limit:
+            try:
+                current = yield 'incr', key
+            except ValueError:
+                # First request of the window. Two periods, so the
+                # counter outlives the window after it.
+                if (yield 'add', key, 1, self.period * 2):
+                    current = 1
+                else:
+                    current = yield 'incr', key
+            if previous * overlap + current <= self.limit:
+                return True, 0
+            # Another worker took the last slot between the read and
+            # the increment: give it back.
+            try:
+                current = (yield 'decr', key) + 1
+            except ValueError:
+                pass
+        else:
+            current += 1
+        return False, self._retry_after(now, window, current, previous)
+
+    def _retry_after(self, now, window, current, previous):
+        # `current` counts this request. If the current window alone is
+        # full, wait for the next one; otherwise until the previous
+        # window's weight has dropped to what the limit leaves over,
+        # previous * overlap <= limit - current.
+        if current > self.limit or previous == 0:
+            retry_after = (window + 1) * self.period - now
+        else:
+            allowed_at = (window + 1) * self.period - (self.limit - current) * self.period / previous
+            retry_after = max(allowed_at - now, 0)
+        return math.ceil(retry_after)
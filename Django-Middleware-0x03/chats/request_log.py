@@ -0,0 +1,236 @@
+# Django-Middleware-0x03/chats/request_log.py
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+
+from django.conf import settings
+
+from .log_archive import ArchiveCompressor, RotatingLogFile
+
+# Defaults for the REQUEST_LOG setting. Any key can be overridden, e.g.
+# REQUEST_LOG = {'PATH': 'requests.log', 'POLICY': 'block'}
+DEFAULTS = {
+    'PATH': 'requests.log',
+    'QUEUE_SIZE': 10000,     # records queued, and failed lines kept, at most
+    'BATCH_SIZE': 500,       # records written per file write
+    'FLUSH_INTERVAL': 0.5,   # seconds a record may wait for its batch
+    'POLICY': 'drop',        # 'drop' or 'block' when the queue is full
+    'BLOCK_TIMEOUT': 0.05,   # seconds 'block' waits before dropping anyway
+    # Rotation and archival (see log_archive.py). Every worker process
+    # may share PATH: rotating and archiving take lock files beside it.
+    'MAX_BYTES': 10 * 1024 * 1024,   # rotate before the file grows past this
+    'ROTATE_INTERVAL': 24 * 60 * 60, # or once it is this many seconds old
+    'COMPRESS': True,        # gzip and index rotated files in the background
+    'RETENTION_DAYS': 14,    # archives older than this are deleted
+    'MAX_ARCHIVES': None,    # and only this many are kept, if set
+}
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Formats a request record as one JSON object per line.
+    """
+    FIELDS = ('user', 'method', 'path', 'status', 'latency_ms')
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+        }
+        for field in self.FIELDS:
+            entry[field] = getattr(record, field, None)
+        return json.dumps(entry, separators=(',', ':'))
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    A QueueHandler that never lets logging block a request for long.
+
+    With the 'drop' policy a record is discarded as soon as the queue is
+    full; with 'block' the request waits up to `block_timeout` seconds for
+    room before dropping it. Dropped records are counted.
+    """
+    def __init__(self, log_queue, policy='drop', block_timeout=0.05):
+        super().__init__(log_queue)
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"Unknown queue policy: {policy!r}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()  # every request thread counts here
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread, off the request path.
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.policy == 'block':
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class BatchWriter(threading.Thread):
+    """
+    Background thread draining the queue into the log file in batches.
+
+    A batch is written with a single write call once it holds
+    `batch_size` records or its oldest record is `flush_interval`
+    seconds old, whichever comes first. `log_file` is a RotatingLogFile,
+    so rotating also happens on this thread, between batches.
+
+    A batch that fails to write, e.g. on a full disk, is kept and written
+    ahead of the next one. At most `max_retained` such lines are kept;
+    the oldest beyond that are counted as lost.
+    """
+    _STOP = object()
+
+    def __init__(self, log_queue, log_file, formatter, batch_size=500, flush_interval=0.5,
+                 max_retained=10000):
+        super().__init__(name='request-log-writer', daemon=True)
+        self.queue = log_queue
+        self.log_file = log_file
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retained = max_retained
+        self.written = 0
+        self.batches = 0
+        self.lost = 0
+        self._retained = []
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            record = self.queue.get()
+            if record is self._STOP:
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        record = self.queue.get(timeout=timeout)
+                    else:
+                        record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+        if self._retained:
+            self._write([])  # a last try for lines a failed write kept
+
+    def _write(self, batch):
+        lines, self._retained = self._retained, []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                continue  # a bad record must not take the writer down
+        if not lines:
+            return
+        try:
+            self.log_file.write('\n'.join(lines) + '\n')
+        except OSError:
+            # e.g. a full disk: keep the lines for the next batch.
+            overflow = len(lines) - self.max_retained
+            if overflow > 0:
+                del lines[:overflow]
+                self.lost += overflow
+            self._retained = lines
+            return
+        self.written += len(lines)
+        self.batches += 1
+
+    def stop(self, timeout=5.0):
+        """
+        Writes out everything queued so far, then ends the thread.
+        """
+        self.queue.put(self._STOP)
+        self.join(timeout)
+
+
+class RequestLogPipeline:
+    """
+    The logger, queue, writer thread and archiver behind
+    RequestLoggingMiddleware.
+    """
+    def __init__(self, path='requests.log', queue_size=10000, batch_size=500,
+                 flush_interval=0.5, policy='drop', block_timeout=0.05,
+                 max_bytes=10 * 1024 * 1024, rotate_interval=24 * 60 * 60,
+                 compress=True, retention_days=14, max_archives=None):
+        self.compressor = None
+        if compress:
+            self.compressor = ArchiveCompressor(path, retention_days, max_archives)
+            self.compressor.recover()
+            self.compressor.start()
+        self.log_file = RotatingLogFile(path, max_bytes, rotate_interval, self.compressor)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = BoundedQueueHandler(self.queue, policy, block_timeout)
+        self.writer = BatchWriter(self.queue, self.log_file, JsonLineFormatter(),
+                                  batch_size, flush_interval, max_retained=queue_size)
+        self.logger = logging.Logger('chats.requests')
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.writer.start()
+
+    @classmethod
+    def from_settings(cls):
+        config = dict(DEFAULTS, **getattr(settings, 'REQUEST_LOG', {}))
+        return cls(config['PATH'], config['QUEUE_SIZE'], config['BATCH_SIZE'],
+                   config['FLUSH_INTERVAL'], config['POLICY'], config['BLOCK_TIMEOUT'],
+                   config['MAX_BYTES'], config['ROTATE_INTERVAL'], config['COMPRESS'],
+                   config['RETENTION_DAYS'], config['MAX_ARCHIVES'])
+
+    def log(self, user, method, path, status, latency_ms):
+        self.logger.info('request', extra={
+            'user': user, 'method': method, 'path': path,
+            'status': status, 'latency_ms': latency_ms,
+        })
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'written': self.writer.written,
+            'lost': self.writer.lost,
+            'batches': self.writer.batches,
+            'rotations': self.log_file.rotations,
+            'archived': self.compressor.archived if self.compressor else 0,
+        }
+
+    def close(self):
+        self.writer.stop()
+        self.log_file.close()
+        if self.compressor is not None:
+            self.compressor.stop()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """
+    Returns the process-wide pipeline, starting it on first use.
+    """
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = RequestLogPipeline.from_settings()
+                atexit.register(_pipeline.close)
+    return _pipeline
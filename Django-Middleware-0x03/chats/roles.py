@@ -0,0 +1,205 @@
+# Django-Middleware-0x03/chats/roles.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+
+from .ratelimit import IN_PROCESS_CACHES
+
+try:
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+except ImportError:  # JWT support is optional
+    AccessToken = None
+
+# Defaults for the ROLE_CACHE setting. Any key can be overridden, e.g.
+# ROLE_CACHE = {'CACHE': 'shared', 'TIMEOUT': 600}
+# Role changes only reach every worker if the cache is shared by all of
+# them, so a local-memory CACHE is refused unless ALLOW_LOCAL says there
+# is a single process (runserver, tests).
+DEFAULTS = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,     # seconds a cached role is kept
+    'PREFIX': 'role',
+    'ALLOW_LOCAL': False,
+}
+
+
+class RoleCache:
+    """
+    Users' roles by user id, so checking a role needs no user row.
+
+    Each user has a version: the time their role last changed, kept in
+    the cache without expiry. A cached role is stored with the version it
+    was read under and only used while that is still the current one, so
+    a role change invalidates it by bumping the version. The role claim
+    of a JWT (see CustomTokenObtainPairView) is trusted the same way: only
+    if the token was issued after the last change. A version that is
+    missing, e.g. evicted, is reset to now, which only costs a reload.
+    """
+    def __init__(self, cache='default', timeout=300, prefix='role'):
+        self.cache = cache
+        self.timeout = timeout
+        self.prefix = prefix
+
+    @classmethod
+    def from_settings(cls):
+        config = dict(DEFAULTS, **getattr(settings, 'ROLE_CACHE', {}))
+        if not config['ALLOW_LOCAL'] and isinstance(caches[config['CACHE']], LocMemCache):
+            raise ImproperlyConfigured(
+                f"ROLE_CACHE['CACHE'] ({config['CACHE']!r}) is local to each process, so "
+                "a role change made in one worker would not reach the others. Use a cache "
+                "every worker shares, or set ROLE_CACHE['ALLOW_LOCAL'] for a single process.")
+        return cls(config['CACHE'], config['TIMEOUT'], config['PREFIX'])
+
+    def _keys(self, user_id):
+        return f"{self.prefix}:{user_id}", f"{self.prefix}-version:{user_id}"
+
+    def role(self, user_id, claims=None):
+        """
+        The role of a user: from the token `claims` if they carry a role
+        issued since the last change, else from the cache, else from the
+        database. None if the user does not exist.
+        """
+        store = caches[self.cache]
+        steps = self._lookup(user_id, claims)
+        result = None
+        while True:
+            try:
+                name, *args = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            result = self._load(*args) if name == 'load' else getattr(store, name)(*args)
+
+    async def arole(self, user_id, claims=None):
+        """
+        `role` for async callers. An in-process cache is read in place;
+        only a shared cache, or a role missing from it, costs an await.
+        """
+        store = caches[self.cache]
+        local = isinstance(store, IN_PROCESS_CACHES)
+        steps = self._lookup(user_id, claims)
+        result = None
+        while True:
+            try:
+                name, *args = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            if name == 'load':
+                result = await self._aload(*args)
+            elif local:
+                result = getattr(store, name)(*args)
+            else:
+                result = await getattr(store, 'a' + name)(*args)
+
+    def _lookup(self, user_id, claims):
+        # The lookup shared by `role` and `arole`, as in
+        # SlidingWindowLimiter._steps: each cache call is yielded as
+        # (method name, *args), and ('load', user_id) reads the row.
+        role_key, version_key = self._keys(user_id)
+        values = yield 'get_many', [role_key, version_key]
+        version = values.get(version_key)
+        if version is None:
+            now = time.time()
+            if (yield 'add', version_key, now, None):
+                version = now
+            else:
+                version = yield 'get', version_key, now
+        if claims is not None and 'role' in claims and claims.get('iat', 0) > version:
+            return claims['role']
+        entry = values.get(role_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        # The version was read before the row, so a change racing with
+        # this read leaves an entry that is already out of date.
+        role = yield 'load', user_id
+        if role is not None:
+            yield 'set', role_key, (version, role), self.timeout
+        return role
+
+    def _rows(self, user_id):
+        return get_user_model()._default_manager.filter(pk=user_id).values_list('role', flat=True)
+
+    def _load(self, user_id):
+        return self._rows(user_id).first()
+
+    async def _aload(self, user_id):
+        return await self._rows(user_id).afirst()
+
+    def invalidate(self, user_id):
+        """
+        Bumps the user's version, dropping their cached role and the role
+        claim of every token issued before now.
+        """
+        store = caches[self.cache]
+        version_key = self._keys(user_id)[1]
+        previous = store.get(version_key) or 0.0
+        store.set(version_key, max(time.time(), previous + 1e-6), None)
+
+
+def token_claims(request):
+    """
+    The verified claims of the request's bearer token, or None without
+    one (or without djangorestframework-simplejwt installed). An invalid
+    token also gives None: refusing it is left to the view. The token is
+    verified once per request, however many middleware ask.
+    """
+    if '_token_claims' in request.__dict__:
+        return request._token_claims
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    claims = None
+    if AccessToken is not None and header.startswith('Bearer '):
+        try:
+            claims = AccessToken(header[7:].strip()).payload
+        except TokenError:
+            pass
+    request._token_claims = claims
+    return claims
+
+
+def token_user_id(claims):
+    return claims.get(jwt_settings.USER_ID_CLAIM)
+
+
+_role_cache = None
+_role_cache_lock = threading.Lock()
+
+
+def get_role_cache():
+    """
+    Returns the process-wide role cache, built from settings on first use.
+    """
+    global _role_cache
+    if _role_cache is None:
+        with _role_cache_lock:
+            if _role_cache is None:
+                _role_cache = RoleCache.from_settings()
+    return _role_cache
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def _invalidate_changed_role(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or not hasattr(instance, 'role'):
+        return
+    if update_fields is not None and 'role' not in update_fields:
+        return  # e.g. the last_login update of every login
+    previous = (sender._default_manager.filter(pk=instance.pk)
+                .values_list('role', flat=True).first())
+    if previous is not None and previous != instance.role:
+        user_id = instance.pk
+        transaction.on_commit(lambda: get_role_cache().invalidate(user_id))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _invalidate_deleted_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: get_role_cache().invalidate(user_id))
@@ -0,0 +1,194 @@
+# Django-Middleware-0x03/chats/rules.py
+
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .ratelimit import SlidingWindowLimiter
+from .shared_store import build_store
+
+# Used when settings.ACCESS_RULES is not set. Each rule matches a path
+# 'prefix' or a 'regex' (searched anywhere in the path), optionally only
+# for some 'methods', and attaches any of these policies:
+#   'roles': the user must be authenticated with one of these roles;
+#            with a 'role_set', only the role middleware of that name
+#            (its `role_set`) enforces it, else every one does
+#   'hours': (start, end) hours of the day the path is open
+#   'rate':  {'limit': n, 'period': seconds} per client IP
+#   'filter': True to check the payload against the blocklist
+#             (see content_filter.py)
+# The role rules reproduce what each role middleware checked on its own
+# before the rule table.
+DEFAULT_ACCESS_RULES = [
+    {'name': 'admin', 'prefix': '/admin/', 'roles': ['ADMIN', 'MODERATOR'],
+     'role_set': 'RolepermissionMiddleware'},
+    {'name': 'admin-only', 'prefix': '/admin/', 'roles': ['ADMIN'],
+     'role_set': 'RolePermissionMiddleware'},
+    {'name': 'api-writes', 'prefix': '/api/', 'methods': ['DELETE', 'PUT', 'PATCH'],
+     'roles': ['ADMIN'], 'role_set': 'RolePermissionMiddleware'},
+    {'name': 'api-hours', 'prefix': '/api/', 'hours': (9, 18)},
+    {'name': 'messages', 'regex': r'messages', 'methods': ['POST'],
+     'rate': {'limit': 5, 'period': 60}, 'filter': True},
+]
+
+
+class Rule:
+    """
+    One compiled entry of the rule table.
+    """
+    def __init__(self, name, prefix=None, regex=None, methods=None, roles=None,
+                 hours=None, rate=None, filter=False, role_set=None, store='default'):
+        if (prefix is None) == (regex is None):
+            raise ValueError(f"Rule {name!r} needs exactly one of 'prefix' or 'regex'")
+        self.name = name
+        self.prefix = prefix
+        self.regex = re.compile(regex) if regex is not None else None
+        self.methods = frozenset(m.upper() for m in methods) if methods else None
+        self.roles = frozenset(r.upper() for r in roles) if roles else None
+        self.role_set = role_set
+        self.hours = tuple(hours) if hours else None
+        self.filter = bool(filter)
+        self.limiter = None
+        if rate:
+            self.limiter = SlidingWindowLimiter(store, rate['limit'], rate['period'],
+                                                prefix=f"rl:{name}")
+
+    def applies_to(self, method):
+        return self.methods is None or method in self.methods
+
+
+class Policy:
+    """
+    Everything the rule table says about one (method, path): the role
+    rules the user must satisfy, the opening hours that apply, the
+    rate-limit rules to count against and whether to filter the payload.
+    """
+    __slots__ = ('rules', 'roles', 'hours', 'rate_rules', 'filter')
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.roles = [rule for rule in rules if rule.roles]
+        self.hours = [rule.hours for rule in rules if rule.hours]
+        self.rate_rules = [rule for rule in rules if rule.limiter]
+        self.filter = any(rule.filter for rule in rules)
+
+    def roles_for(self, role_set):
+        """
+        The role rules enforced by the role middleware of `role_set`.
+        """
+        return [rule for rule in self.roles if rule.role_set in (None, role_set)]
+
+
+class _TrieNode(dict):
+    __slots__ = ('rules',)
+
+    def __init__(self):
+        super().__init__()
+        self.rules = ()
+
+
+class RuleEngine:
+    """
+    The rule table compiled for one pass per request.
+
+    Prefix rules live in a character trie, so walking the path once
+    finds every matching prefix whatever the number of rules. Regex
+    rules are also joined into one alternation that rules most paths out
+    with a single search before any rule is tried on its own. Decisions
+    are memoised per (method, path) in a bounded cache.
+    """
+    def __init__(self, rules, cache_size=4096):
+        self.rules = rules
+        self.trie = _TrieNode()
+        self.regex_rules = [rule for rule in rules if rule.regex is not None]
+        self.any_regex = None
+        if self.regex_rules:
+            self.any_regex = re.compile('|'.join(f"(?:{rule.regex.pattern})"
+                                                 for rule in self.regex_rules))
+        for rule in rules:
+            if rule.prefix is not None:
+                node = self.trie
+                for char in rule.prefix:
+                    node = node.setdefault(char, _TrieNode())
+                node.rules = node.rules + (rule,)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, store='default'):
+        return cls([Rule(**dict(entry, name=entry.get('name', f"rule{i}"), store=store))
+                    for i, entry in enumerate(config)])
+
+    def match(self, method, path):
+        """
+        Returns the rules matching a request: prefix rules from the
+        shortest prefix up, then regex rules in table order.
+        """
+        matched = []
+        node = self.trie
+        if node.rules:
+            matched.extend(node.rules)
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            if node.rules:
+                matched.extend(node.rules)
+        if self.any_regex is not None and self.any_regex.search(path):
+            matched.extend(rule for rule in self.regex_rules if rule.regex.search(path))
+        return [rule for rule in matched if rule.applies_to(method)]
+
+    def policy(self, method, path):
+        key = (method, path)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        policy = Policy(self.match(method, path))
+        with self._lock:
+            self._cache[key] = policy
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return policy
+
+
+def _legacy_rate_limits(config):
+    # settings.RATE_LIMITS entries ({'path': regex, 'methods', 'limit',
+    # 'period'}) from before the rule table.
+    return [{'name': entry.get('name', entry['path']), 'regex': entry['path'],
+             'methods': entry.get('methods'),
+             'rate': {'limit': entry['limit'], 'period': entry['period']}}
+            for entry in config]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the process-wide engine, compiled from settings.ACCESS_RULES
+    (plus any legacy settings.RATE_LIMITS) on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                config = list(getattr(settings, 'ACCESS_RULES', DEFAULT_ACCESS_RULES))
+                config += _legacy_rate_limits(getattr(settings, 'RATE_LIMITS', []))
+                store = build_store(getattr(settings, 'RATE_LIMIT_STORE', None))
+                _engine = RuleEngine.from_config(config, store)
+    return _engine
+
+
+def policy_for(request):
+    """
+    The policy for a request, decided once and shared by every middleware.
+    """
+    policy = getattr(request, '_access_policy', None)
+    if policy is None:
+        policy = get_engine().policy(request.method, request.path)
+        request._access_policy = policy
+    return policy
@@ -0,0 +1,251 @@
+# Django-Middleware-0x03/chats/shared_store.py
+
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+# settings.RATE_LIMIT_STORE, e.g.
+# RATE_LIMIT_STORE = {'BACKEND': 'sqlite', 'PATH': '/var/run/chats/ratelimit.sqlite3'}
+# Without it every process counts in its own 'default' cache.
+DEFAULTS = {
+    'BACKEND': 'cache',      # 'cache' (a Django cache alias) or 'sqlite'
+    'CACHE': 'default',      # the alias, and the fallback for 'sqlite'
+    'PATH': 'ratelimit.sqlite3',
+    'BUSY_TIMEOUT': 0.25,    # seconds a call waits for another worker's write
+    'BUDGET_MS': 5.0,        # a store call slower than this counts as slow
+    'MAX_SLOW': 3,           # consecutive slow or failed calls before falling back
+    'COOLDOWN': 30.0,        # seconds spent on the fallback before retrying
+}
+
+# For INSERT/UPDATE ... RETURNING.
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+class SQLiteCounterStore:
+    """
+    Counters with a TTL in one SQLite file, shared by every process and
+    pod that can see the file.
+
+    Implements the part of the Django cache API the rate limiter uses
+    (get_many, add, incr, decr). Each of them is a single statement in
+    autocommit mode, so increments from different processes are atomic.
+    WAL mode lets readers run alongside the writer, and a busy writer
+    waits at most `timeout` seconds before the call fails.
+
+    Setting the file up waits up to `setup_timeout` instead, so workers
+    starting together queue for the schema rather than failing on it.
+    Needs SQLite 3.35 or later.
+    """
+    def __init__(self, path, timeout=0.25, purge_every=1000, setup_timeout=5.0):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise ImproperlyConfigured(
+                f"The sqlite rate-limit store needs SQLite 3.35 or later, not {sqlite3.sqlite_version}")
+        self.path = path
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._set_up(setup_timeout)
+
+    def _set_up(self, timeout):
+        # SQLite gives up on some of the locks switching the journal mode
+        # takes without waiting out the busy timeout, so a locked file is
+        # retried until `timeout` has passed.
+        deadline = time.monotonic() + timeout
+        while True:
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            try:
+                if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+                    conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS counters "
+                    "(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+                )
+                return
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc) or time.monotonic() >= deadline:
+                    raise
+            finally:
+                conn.close()
+            time.sleep(0.01)
+
+    def _connection(self):
+        # SQLite connections cannot be shared between threads.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM counters WHERE key IN ({placeholders}) AND expires_at > ?",
+            (*keys, time.time()),
+        )
+        return dict(rows.fetchall())
+
+    def add(self, key, value, timeout):
+        """
+        Sets `key` unless it holds a live value. Returns True if it was set.
+        """
+        now = time.time()
+        row = self._connection().execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE counters.expires_at <= ? RETURNING value",
+            (key, value, now + timeout, now),
+        ).fetchone()
+        self._wrote()
+        return row is not None
+
+    def incr(self, key, delta=1):
+        row = self._connection().execute(
+            "UPDATE counters SET value = value + ? WHERE key = ? AND expires_at > ? RETURNING value",
+            (delta, key, time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def decr(self, key, delta=1):
+        return self.incr(key, -delta)
+
+    def _wrote(self):
+        # New keys are only created by add, so expired rows are swept
+        # from there every `purge_every` calls.
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self._connection().execute("DELETE FROM counters WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class FallbackStore:
+    """
+    Puts a latency budget on a shared store.
+
+    Every call is timed. After `max_slow` consecutive calls that fail or
+    take longer than `budget_ms`, calls go to the local `fallback` cache
+    for `cooldown` seconds before the shared store is tried again. While
+    on the fallback each process enforces limits on its own, which is
+    looser but keeps requests fast.
+    """
+    def __init__(self, primary, fallback='default', budget_ms=5.0, max_slow=3, cooldown=30.0):
+        self.primary = primary
+        self.fallback = fallback
+        self.budget = budget_ms / 1000
+        self.max_slow = max_slow
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._slow_streak = 0
+        self._fallback_until = 0.0
+        self.metrics = {
+            'calls': 0, 'errors': 0, 'slow': 0, 'fallback_calls': 0,
+            'trips': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+        }
+
+    def _fallback_store(self):
+        return caches[self.fallback] if isinstance(self.fallback, str) else self.fallback
+
+    def _call(self, name, *args):
+        if time.monotonic() < self._fallback_until:
+            with self._lock:
+                self.metrics['fallback_calls'] += 1
+            return getattr(self._fallback_store(), name)(*args)
+        start = time.perf_counter()
+        try:
+            result = getattr(self.primary, name)(*args)
+        except ValueError:
+            self._record(time.perf_counter() - start, failed=False)
+            raise  # a missing key for incr, not a store failure
+        except Exception:
+            self._record(time.perf_counter() - start, failed=True)
+            with self._lock:
+                self.metrics['fallback_calls'] += 1
+            return getattr(self._fallback_store(), name)(*args)
+        self._record(time.perf_counter() - start, failed=False)
+        return result
+
+    def _record(self, elapsed, failed):
+        with self._lock:
+            metrics = self.metrics
+            metrics['calls'] += 1
+            metrics['total_ms'] += elapsed * 1000
+            metrics['max_ms'] = max(metrics['max_ms'], elapsed * 1000)
+            if failed:
+                metrics['errors'] += 1
+            elif elapsed > self.budget:
+                metrics['slow'] += 1
+            else:
+                self._slow_streak = 0
+                return
+            self._slow_streak += 1
+            if self._slow_streak >= self.max_slow:
+                self._slow_streak = 0
+                self._fallback_until = time.monotonic() + self.cooldown
+                metrics['trips'] += 1
+
+    def get_many(self, keys):
+        return self._call('get_many', keys)
+
+    def add(self, key, value, timeout):
+        return self._call('add', key, value, timeout)
+
+    def incr(self, key, delta=1):
+        return self._call('incr', key, delta)
+
+    def decr(self, key, delta=1):
+        return self._call('decr', key, delta)
+
+    # The async API used by SlidingWindowLimiter.ahit. SQLite calls block,
+    # so they run in the thread pool rather than on the event loop;
+    # thread_sensitive=False keeps them off the single thread Django
+    # reserves for sync code.
+    async def aget_many(self, keys):
+        return await sync_to_async(self.get_many, thread_sensitive=False)(keys)
+
+    async def aadd(self, key, value, timeout):
+        return await sync_to_async(self.add, thread_sensitive=False)(key, value, timeout)
+
+    async def aincr(self, key, delta=1):
+        return await sync_to_async(self.incr, thread_sensitive=False)(key, delta)
+
+    async def adecr(self, key, delta=1):
+        return await sync_to_async(self.decr, thread_sensitive=False)(key, delta)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        stats['mean_ms'] = stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0
+        stats['on_fallback'] = time.monotonic() < self._fallback_until
+        return stats
+
+
+def build_store(config=None):
+    """
+    Returns the counter store described by a RATE_LIMIT_STORE setting:
+    a cache alias for 'cache', or a SQLite store behind a FallbackStore.
+    """
+    config = dict(DEFAULTS, **(config or {}))
+    if config['BACKEND'] == 'cache':
+        return config['CACHE']
+    if config['BACKEND'] == 'sqlite':
+        # Waiting out another worker's write is normal; only a call that
+        # is slow or fails even so counts against the budget.
+        primary = SQLiteCounterStore(config['PATH'], timeout=config['BUSY_TIMEOUT'])
+        return FallbackStore(primary, config['CACHE'], config['BUDGET_MS'],
+                             config['MAX_SLOW'], config['COOLDOWN'])
+    raise ValueError(f"Unknown RATE_LIMIT_STORE backend: {config['BACKEND']!r}")
@@ -0,0 +1,416 @@
+# Django-Middleware-0x03/loadtest.py
+"""
+Replays a request mix through the middleware stack of settings.py and
+reports what each middleware costs, on its own and in stack order.
+
+The mix is synthetic, or recorded: the method and path of every record
+in a request log (and its rotated archives, see chats/log_archive.py).
+Each backend runs the same mix through every configuration: no
+middleware, each middleware alone, and the stack built up one
+middleware at a time.
+
+Backends:
+    client   django.test.Client, i.e. the WSGI request path
+    asgi     Django's ASGIHandler, driven in-process
+    uvicorn  a real uvicorn server over HTTP
+
+Usage:
+    python3 loadtest.py --requests 2000
+    python3 loadtest.py --log requests.log --since 2026-10-19T09:00 --backends client,uvicorn
+"""
+import argparse
+import asyncio
+import gc
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=False,
+        ALLOWED_HOSTS=['*'],
+        SECRET_KEY='loadtest',
+        INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth',
+                        'django.contrib.messages'],
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        ROLE_CACHE={'ALLOW_LOCAL': True},  # a single process
+        ROOT_URLCONF=__name__,
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+        REQUEST_LOG={'PATH': os.path.join(tempfile.gettempdir(), 'loadtest_requests.log')},
+        MIDDLEWARE=[],
+    )
+    django.setup()
+
+from django.core.cache import caches  # noqa: E402
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.http import JsonResponse  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import re_path  # noqa: E402
+from django.views.decorators.csrf import csrf_exempt  # noqa: E402
+
+from chats import rules  # noqa: E402
+from chats.log_archive import LogQuery  # noqa: E402
+
+try:
+    import uvicorn
+except ImportError:  # the uvicorn backend is optional
+    uvicorn = None
+
+
+@csrf_exempt
+def view(request):
+    return JsonResponse({'ok': True})
+
+
+urlpatterns = [re_path(r'', view)]
+
+# Middleware that needs others in front of it to run at all. In
+# isolation it runs behind them, and only its own cost is reported.
+REQUIRES = {
+    'chats.middleware.AuthenticationMiddleware': [
+        'chats.middleware.SessionMiddleware'],
+    'django.contrib.messages.middleware.MessageMiddleware': [
+        'chats.middleware.SessionMiddleware'],
+    'chats.middleware.RolePermissionMiddleware': [
+        'chats.middleware.SessionMiddleware'],
+    'chats.middleware.RolepermissionMiddleware': [
+        'chats.middleware.SessionMiddleware'],
+}
+
+# (weight, method, path); {id} becomes a number.
+SYNTHETIC_MIX = [
+    (40, 'GET', '/api/messages/'),
+    (20, 'GET', '/api/conversations/{id}/'),
+    (20, 'POST', '/api/messages/'),
+    (10, 'GET', '/api/users/{id}/'),
+    (5, 'DELETE', '/api/messages/{id}/'),
+    (5, 'GET', '/admin/'),
+]
+MESSAGE_WORDS = ['hello', 'are', 'we', 'still', 'on', 'for', 'lunch', 'see', 'you', 'soon']
+
+
+def project_middleware(path):
+    """
+    The MIDDLEWARE list of a settings file, read without loading it as
+    the project's settings.
+    """
+    spec = importlib.util.spec_from_file_location('project_settings', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return list(module.MIDDLEWARE)
+
+
+def _message_body(rng):
+    return json.dumps({'message_body': ' '.join(rng.choices(MESSAGE_WORDS, k=rng.randint(3, 20)))})
+
+
+def synthetic_requests(count, clients, seed=1337):
+    """
+    `count` requests drawn from SYNTHETIC_MIX, as (method, path, body,
+    client IP) tuples.
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in SYNTHETIC_MIX]
+    requests = []
+    for _ in range(count):
+        _, method, path = rng.choices(SYNTHETIC_MIX, weights)[0]
+        path = path.format(id=rng.randint(1, 500))
+        body = _message_body(rng) if method == 'POST' else None
+        requests.append((method, path, body, _client_ip(rng.randrange(clients))))
+    return requests
+
+
+def recorded_requests(log_path, count, clients, since=None, until=None, seed=1337):
+    """
+    Up to `count` requests replayed from a request log, with a
+    synthetic body for POSTs. Users are mapped to client IPs so each
+    keeps its own rate-limit counters.
+    """
+    rng = random.Random(seed)
+    user_ips = {}
+    requests = []
+    for record in LogQuery(log_path, since, until):
+        method = record.get('method') or 'GET'
+        user = record.get('user')
+        if user not in user_ips:
+            user_ips[user] = _client_ip(len(user_ips) % clients)
+        body = _message_body(rng) if method == 'POST' else None
+        requests.append((method, record.get('path') or '/', body, user_ips[user]))
+        if len(requests) == count:
+            break
+    return requests
+
+
+def _client_ip(index):
+    return f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"
+
+
+def _reset_state():
+    # Every run starts from the same rate-limit counters and rule cache.
+    caches['default'].clear()
+    rules._engine = None
+
+
+class ClientBackend:
+    """
+    Requests through django.test.Client, one at a time.
+    """
+    name = 'client'
+
+    def run(self, middleware, requests):
+        settings.MIDDLEWARE = middleware
+        client = Client()
+        latencies = []
+        statuses = Counter()
+        for method, path, body, ip in requests:
+            start = time.perf_counter()
+            response = client.generic(method, path, body or '', content_type='application/json',
+                                      REMOTE_ADDR=ip)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+        return latencies, statuses
+
+
+class AsgiBackend:
+    """
+    Requests through Django's ASGIHandler in this process, as an ASGI
+    server would send them, `concurrency` at a time.
+    """
+    name = 'asgi'
+
+    def __init__(self, concurrency=1):
+        self.concurrency = concurrency
+
+    def run(self, middleware, requests):
+        settings.MIDDLEWARE = middleware
+        handler = ASGIHandler()
+        return asyncio.run(self._run(handler, requests))
+
+    async def _run(self, handler, requests):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+        statuses = Counter()
+
+        async def one(method, path, body, ip):
+            async with semaphore:
+                start = time.perf_counter()
+                status = await _asgi_request(handler, method, path, body, ip)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] += 1
+
+        await asyncio.gather(*(one(*request) for request in requests))
+        return latencies, statuses
+
+
+async def _asgi_request(handler, method, path, body, ip):
+    body = (body or '').encode()
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+        'client': (ip, 40000), 'server': ('testserver', 80),
+    }
+    sent_body = False
+    status = []
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await handler(scope, receive, send)
+    return status[0]
+
+
+class UvicornBackend:
+    """
+    Requests over HTTP to a uvicorn server running the ASGI handler in a
+    thread of this process, `concurrency` keep-alive connections at a
+    time. Each request names its client IP in X-Forwarded-For, which
+    uvicorn trusts from 127.0.0.1, so the rate limiter sees the same
+    clients as with the other backends.
+    """
+    name = 'uvicorn'
+
+    def __init__(self, concurrency=1):
+        self.concurrency = concurrency
+
+    def run(self, middleware, requests):
+        settings.MIDDLEWARE = middleware
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        config = uvicorn.Config(ASGIHandler(), host='127.0.0.1', port=port,
+                                log_level='warning', lifespan='off',
+                                proxy_headers=True, forwarded_allow_ips='127.0.0.1')
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        try:
+            shares = [requests[i::self.concurrency] for i in range(self.concurrency)]
+            with ThreadPoolExecutor(self.concurrency) as pool:
+                results = list(pool.map(lambda share: self._send_all(port, share), shares))
+        finally:
+            server.should_exit = True
+            thread.join()
+        latencies = [latency for share, _ in results for latency in share]
+        statuses = sum((counts for _, counts in results), Counter())
+        return latencies, statuses
+
+    def _send_all(self, port, requests):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        latencies = []
+        statuses = Counter()
+        try:
+            for method, path, body, ip in requests:
+                start = time.perf_counter()
+                connection.request(method, path, body=body,
+                                   headers={'Content-Type': 'application/json',
+                                            'X-Forwarded-For': ip})
+                response = connection.getresponse()
+                response.read()
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status] += 1
+        finally:
+            connection.close()
+        return latencies, statuses
+
+
+def measure(backend, middleware, requests):
+    """
+    One run of the mix with the garbage collector off. Returns (p50,
+    mean, p99) in microseconds and the status counts.
+    """
+    _reset_state()
+    gc.collect()
+    gc.disable()
+    try:
+        latencies, statuses = backend.run(middleware, requests)
+    finally:
+        gc.enable()
+    latencies.sort()
+    return (latencies[len(latencies) // 2] * 1e6, statistics.fmean(latencies) * 1e6,
+            latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e6, statuses)
+
+
+def profile(backend, stack, requests, repeat):
+    """
+    Every configuration of `stack` through `backend`: returns the rows
+    of the per-middleware table and the no-middleware and whole-stack
+    measurements.
+
+    Costs are compared on the median, which outliers such as a log
+    flush barely move. Configurations take turns, one run each per
+    round, and each keeps its best round, so drift in machine speed
+    does not favour the ones measured first.
+    """
+    configurations = {(): None}
+    for index, name in enumerate(stack):
+        requires = tuple(REQUIRES.get(name, []))
+        for middleware in (requires, requires + (name,), tuple(stack[:index + 1])):
+            configurations[middleware] = None
+    for middleware in configurations:
+        measure(backend, list(middleware), requests)  # warm-up
+    for _ in range(repeat):
+        for middleware, best in configurations.items():
+            result = measure(backend, list(middleware), requests)
+            if best is None or result[0] < best[0]:
+                configurations[middleware] = result
+
+    def cost(middleware):
+        return configurations[tuple(middleware)][0]
+
+    rows = []
+    for index, name in enumerate(stack):
+        requires = REQUIRES.get(name, [])
+        rows.append((name, cost(requires + [name]) - cost(requires),
+                     cost(stack[:index + 1]) - cost(stack[:index]),
+                     cost(stack[:index + 1]) - cost([])))
+    return rows, configurations[()], configurations[tuple(stack)]
+
+
+def print_report(backend, source, count, rows, baseline, full):
+    print(f"\n== {backend.name}: {count} requests ({source}) ==")
+    width = max(len(name) for name, *_ in rows) + 2
+    print("Median cost per request; 'in stack' is what adding it to the middleware above costs.")
+    print(f"{'middleware':<{width}}{'isolated us':>13}{'in stack us':>13}{'cumulative us':>15}")
+    for name, isolated, in_stack, cumulative in rows:
+        print(f"{name:<{width}}{isolated:>13.1f}{in_stack:>13.1f}{cumulative:>15.1f}")
+    print(f"\n{'configuration':<{width}}{'p50 us':>13}{'mean us':>13}{'p99 us':>15}  statuses")
+    for label, (p50, mean, p99, statuses) in (('no middleware', baseline), ('whole stack', full)):
+        mix = ' '.join(f"{status}:{n}" for status, n in sorted(statuses.items()))
+        print(f"{label:<{width}}{p50:>13.1f}{mean:>13.1f}{p99:>15.1f}  {mix}")
+
+
+BACKENDS = {
+    'client': lambda args: ClientBackend(),
+    'asgi': lambda args: AsgiBackend(args.concurrency),
+    'uvicorn': lambda args: UvicornBackend(args.concurrency),
+}
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--settings', default=os.path.join(HERE, 'settings.py'),
+                        help='settings file whose MIDDLEWARE is profiled')
+    parser.add_argument('--backends', default='client,asgi,uvicorn',
+                        type=lambda v: v.split(','), help='comma-separated, of ' + ', '.join(BACKENDS))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=1000, help='distinct client IPs')
+    parser.add_argument('--concurrency', type=int, default=1, help='requests in flight (asgi, uvicorn)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per configuration; the best is kept')
+    parser.add_argument('--log', help='replay this request log instead of the synthetic mix')
+    parser.add_argument('--since', help='with --log: ISO time of the first record')
+    parser.add_argument('--until', help='with --log: ISO time of the last record')
+    parser.add_argument('--open-hours', action='store_true',
+                        help="lift the rule table's opening hours, so results do not depend on the time of day")
+    args = parser.parse_args()
+
+    stack = project_middleware(args.settings)
+    if args.open_hours:
+        settings.ACCESS_RULES = [dict(rule, hours=(0, 24)) if 'hours' in rule else rule
+                                 for rule in rules.DEFAULT_ACCESS_RULES]
+    if args.log:
+        requests = recorded_requests(args.log, args.requests, args.clients, args.since, args.until)
+        source = f"replayed from {args.log}"
+        if not requests:
+            parser.error(f"no request records in {args.log} for that time range")
+    else:
+        requests = synthetic_requests(args.requests, args.clients)
+        source = 'synthetic mix'
+    for name in args.backends:
+        if name not in BACKENDS:
+            parser.error(f"unknown backend {name!r}")
+        if name == 'uvicorn' and uvicorn is None:
+            print("\n== uvicorn: skipped, uvicorn is not installed ==")
+            continue
+        backend = BACKENDS[name](args)
+        rows, baseline, full = profile(backend, stack, requests, args.repeat)
+        print_report(backend, source, len(requests), rows, baseline, full)
@@ -0,0 +1,64 @@
+# Django-Middleware-0x03/query_log.py
+"""
+Searches the request log and its rotated archives by time range and/or
+user. Archive chunks the index rules out are never decompressed.
+
+Usage:
+    python3 query_log.py --since 2026-10-19T09:00 --until 2026-10-19T10:00
+    python3 query_log.py --user 42 --path /var/log/chats/requests.log --count
+    DJANGO_SETTINGS_MODULE=messaging_app.settings python3 query_log.py --user alice
+
+Users are logged by id, so --user takes one (42 or id:42); a username is
+looked up through the project's user model, which needs
+DJANGO_SETTINGS_MODULE.
+"""
+import argparse
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from chats.log_archive import LogQuery, logged_user  # noqa: E402
+
+
+def resolve_user(user):
+    """
+    `user` as logged ('id:<pk>'), looking a username up in the database.
+    """
+    user = logged_user(user)
+    if user.startswith('id:') or user == 'AnonymousUser':
+        return user
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        sys.exit(f"{user!r} is not a user id; set DJANGO_SETTINGS_MODULE to look usernames up")
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    model = get_user_model()
+    try:
+        return logged_user(model._default_manager.get_by_natural_key(user).pk)
+    except model.DoesNotExist:
+        sys.exit(f"no user {user!r}")
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--path', default='requests.log', help="the live log (REQUEST_LOG['PATH'])")
+    parser.add_argument('--since', help='ISO time; naive times are UTC')
+    parser.add_argument('--until', help='ISO time; naive times are UTC')
+    parser.add_argument('--user', help='user id, or a username (see above)')
+    parser.add_argument('--count', action='store_true', help='print the number of records only')
+    args = parser.parse_args()
+    user = resolve_user(args.user) if args.user is not None else None
+    query = LogQuery(args.path, args.since, args.until, user)
+    matched = 0
+    for record in query:
+        matched += 1
+        if not args.count:
+            print(json.dumps(record, separators=(',', ':')))
+    if args.count:
+        print(matched)
+    print(f"{matched} records; read {query.chunks_read} archive chunks, "
+          f"skipped {query.chunks_skipped}", file=sys.stderr)
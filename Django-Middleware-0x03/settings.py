@@ -27,11 +27,13 @@ INSTALLED_APPS = [
 # --- MIDDLEWARE CONFIGURATION ---
 # This is the complete and correctly ordered list for all tasks.
 MIDDLEWARE = [
+    # First, so its latency histograms cover the whole stack.
+    'chats.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'chats.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'chats.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     
@@ -125,5 +127,13 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
-}
\ No newline at end of file
+    },
+    # Shared by every worker process, so a role change reaches them all
+    # (see chats/roles.py).
+    'roles': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'roles',
+    },
+}
+
+ROLE_CACHE = {'CACHE': 'roles'}
\ No newline at end of file
@@ -0,0 +1,26 @@
+# Django-Middleware-0x03/tests/conftest.py
+"""
+Just enough Django settings to test the chats modules outside a full
+project, the way bench_middleware.py runs them.
+"""
+import os
+import sys
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not settings.configured:
+    settings.configure(
+        ALLOWED_HOSTS=['*'],
+        INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        ROLE_CACHE={'ALLOW_LOCAL': True},
+        ROOT_URLCONF='tests.conftest',
+        USE_TZ=True,
+    )
+    django.setup()
+
+urlpatterns = []
@@ -0,0 +1,83 @@
+# Django-Middleware-0x03/tests/test_content_filter.py
+import json
+import os
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase
+
+from chats.content_filter import AhoCorasick, ContentFilter, load_terms
+
+
+class AhoCorasickTest(SimpleTestCase):
+    def test_finds_any_term(self):
+        matcher = AhoCorasick(['he', 'she', 'his', 'hers'])
+        self.assertEqual(matcher.search('ushers'), (1, 4))
+        self.assertIsNone(matcher.search('hxs'))
+
+    def test_finds_a_term_inside_a_longer_partial_match(self):
+        # 'abcd' fails at 'x'; the fail link must still find 'bc'.
+        self.assertEqual(AhoCorasick(['abcd', 'bc']).search('abcx'), (1, 3))
+
+    def test_whole_words_skips_matches_inside_words(self):
+        matcher = AhoCorasick(['ass'])
+        self.assertIsNone(matcher.search('class assignment', whole_words=True))
+        self.assertEqual(matcher.search('class assignment'), (2, 5))
+        self.assertEqual(matcher.search('you ass!', whole_words=True), (4, 7))
+
+    def test_whole_words_tries_the_shorter_term_ending_at_the_same_place(self):
+        matcher = AhoCorasick(['bad', 'xbad'])
+        self.assertEqual(matcher.search('axbad', whole_words=True), None)
+        self.assertEqual(matcher.search('a-bad', whole_words=True), (2, 5))
+        self.assertEqual(matcher.search('xbad', whole_words=True), (0, 4))
+
+    def test_no_terms_matches_nothing(self):
+        self.assertIsNone(AhoCorasick(['']).search('anything'))
+
+
+class ContentFilterTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.filter = ContentFilter(['Darn', 'heck'])
+
+    def post_json(self, payload):
+        return self.factory.post('/messages/', json.dumps(payload), content_type='application/json')
+
+    def test_matching_ignores_case(self):
+        self.assertEqual(self.filter.find('Oh DARN it'), 'darn')
+
+    def test_inspects_nested_json_strings(self):
+        request = self.post_json({'message': {'parts': ['fine', 'what the heck']}})
+        self.assertEqual(self.filter.inspect(request), 'heck')
+
+    def test_inspects_form_posts(self):
+        request = self.factory.post('/messages/', {'message': 'darn'})
+        self.assertEqual(self.filter.inspect(request), 'darn')
+
+    def test_no_match_across_fields(self):
+        request = self.post_json({'a': 'he', 'b': 'ck'})
+        self.assertIsNone(ContentFilter(['heck'], whole_words=False).inspect(request))
+
+    def test_only_listed_fields_are_inspected(self):
+        content_filter = ContentFilter(['heck'], fields=['message'])
+        self.assertIsNone(content_filter.inspect(self.post_json({'title': 'heck', 'message': 'hi'})))
+        self.assertEqual(content_filter.inspect(self.post_json({'message': ['heck']})), 'heck')
+
+    def test_other_bodies_are_not_inspected(self):
+        request = self.factory.post('/messages/', 'darn', content_type='text/plain')
+        self.assertIsNone(self.filter.inspect(request))
+        self.assertIsNone(self.filter.inspect(self.factory.post(
+            '/messages/', '{not json', content_type='application/json')))
+
+    def test_terms_file_comments_and_reload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'blocklist.txt')
+            with open(path, 'w', encoding='utf-8') as terms_file:
+                terms_file.write('# comment\nfoo  # trailing\n\n')
+            self.assertEqual([term for term in load_terms(path) if term], ['foo'])
+            content_filter = ContentFilter(terms_file=path)
+            self.assertEqual(content_filter.find('a foo'), 'foo')
+            with open(path, 'w', encoding='utf-8') as terms_file:
+                terms_file.write('bar\n')
+            content_filter.reload()
+            self.assertIsNone(content_filter.find('a foo'))
+            self.assertEqual(content_filter.find('a bar'), 'bar')
@@ -0,0 +1,141 @@
+# Django-Middleware-0x03/tests/test_log_archive.py
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from django.test import SimpleTestCase
+
+from chats.log_archive import (
+    ArchiveCompressor, LogQuery, RotatingLogFile, archive_files, compress_segment,
+    pending_segments,
+)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _line(minute, user='id:1'):
+    moment = START + timedelta(minutes=minute)
+    return json.dumps({'time': moment.isoformat(), 'user': user, 'path': f"/{minute}/"}) + '\n'
+
+
+class LogArchiveTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'requests.log')
+
+    def open_log(self, **kwargs):
+        log_file = RotatingLogFile(self.path, **dict({'interval': None}, **kwargs))
+        self.addCleanup(log_file.close)
+        return log_file
+
+    def paths(self, **filters):
+        return [record['path'] for record in LogQuery(self.path, **filters)]
+
+    def test_rotates_before_passing_max_bytes(self):
+        log_file = self.open_log(max_bytes=len(_line(0)) * 2)
+        for minute in range(5):
+            log_file.write(_line(minute))
+        self.assertEqual(log_file.rotations, 2)
+        self.assertEqual(len(pending_segments(self.path)), 2)
+        self.assertEqual(self.paths(), [f"/{minute}/" for minute in range(5)])
+
+    def test_rotates_a_file_left_open_too_long(self):
+        with open(self.path, 'w', encoding='utf-8') as leftover:
+            leftover.write(_line(0))  # written in 2026-01-01, long before now
+        log_file = self.open_log(interval=60)
+        log_file.write(_line(1))
+        self.assertEqual(log_file.rotations, 1)
+
+    def test_writers_sharing_a_file_follow_its_rotation(self):
+        # As two worker processes would: once one rotates the file and
+        # the segment is archived, the other's lines must not go to it.
+        first = self.open_log()
+        second = self.open_log()
+        first.write(_line(0))
+        second.write(_line(1))
+        first.rotate()
+        for segment in pending_segments(self.path):
+            compress_segment(segment)
+        second.write(_line(2))
+        first.write(_line(3))
+        self.assertEqual(self.paths(), ['/0/', '/1/', '/2/', '/3/'])
+
+    def test_writers_sharing_a_file_rotate_it_once(self):
+        first = self.open_log(max_bytes=len(_line(0)) * 3)
+        second = self.open_log(max_bytes=len(_line(0)) * 3)
+        for minute in range(9):
+            (first if minute % 2 else second).write(_line(minute))
+        self.assertEqual(first.rotations + second.rotations, 2)
+        self.assertEqual(self.paths(), [f"/{minute}/" for minute in range(9)])
+
+    def test_archive_is_gzip_with_an_index(self):
+        with open(self.path + '.20260101-000000', 'w', encoding='utf-8') as segment:
+            segment.writelines(_line(minute, user=f"u{minute % 3}") for minute in range(100))
+        index = compress_segment(self.path + '.20260101-000000', chunk_bytes=1000)
+        archive = self.path + '.20260101-000000.gz'
+        self.assertEqual(index['records'], 100)
+        self.assertGreater(len(index['chunks']), 1)
+        self.assertEqual(index['start'], START.isoformat())
+        with gzip.open(archive, 'rt', encoding='utf-8') as archived:
+            self.assertEqual(len(archived.readlines()), 100)
+        self.assertEqual(pending_segments(self.path), [])
+
+    def test_query_skips_chunks_outside_the_range(self):
+        with open(self.path + '.20260101-000000', 'w', encoding='utf-8') as segment:
+            segment.writelines(_line(minute) for minute in range(100))
+        compress_segment(self.path + '.20260101-000000', chunk_bytes=1000)
+        query = LogQuery(self.path, since=START + timedelta(minutes=90))
+        self.assertEqual([record['path'] for record in query],
+                         [f"/{minute}/" for minute in range(90, 100)])
+        self.assertGreater(query.chunks_skipped, 0)
+        self.assertEqual(query.chunks_read, 1)
+
+    def test_query_by_user(self):
+        log_file = self.open_log()
+        log_file.write(_line(0, 'id:1') + _line(1, 'id:2') + _line(2, 'id:1'))
+        self.assertEqual(self.paths(user='id:2'), ['/1/'])
+        self.assertEqual(self.paths(user=1), ['/0/', '/2/'])
+        self.assertEqual(self.paths(user='2'), ['/1/'])
+        self.assertEqual(self.paths(until=START + timedelta(minutes=1)), ['/0/', '/1/'])
+
+    def test_recovery_by_several_processes_archives_once(self):
+        for stamp in ('20260101-000000', '20260101-000100'):
+            with open(f"{self.path}.{stamp}", 'w', encoding='utf-8') as segment:
+                segment.write(_line(0))
+        compressors = [ArchiveCompressor(self.path, retention_days=None) for _ in range(2)]
+        for compressor in compressors:
+            compressor.recover()
+        for compressor in compressors:
+            compressor.start()
+        for compressor in compressors:
+            compressor.stop()
+        self.assertEqual(sum(compressor.archived for compressor in compressors), 2)
+        self.assertEqual(sum(compressor.failed for compressor in compressors), 0)
+        self.assertEqual(len(archive_files(self.path)), 2)
+        self.assertEqual(self.paths(), ['/0/', '/0/'])
+
+    def test_prune_keeps_the_newest_archives(self):
+        for stamp in ('20260101-000000', '20260101-000100', '20260101-000200'):
+            with open(f"{self.path}.{stamp}", 'w', encoding='utf-8') as segment:
+                segment.write(_line(0))
+            compress_segment(f"{self.path}.{stamp}")
+        compressor = ArchiveCompressor(self.path, retention_days=None, max_archives=1)
+        compressor.prune()
+        self.assertEqual(archive_files(self.path), [self.path + '.20260101-000200.gz'])
+        self.assertFalse(os.path.exists(self.path + '.20260101-000000.gz.idx'))
+
+    def test_same_second_rotations_are_read_in_order(self):
+        for name, minute in (('20260101-000000', 0), ('20260101-000000-1', 1),
+                             ('20260101-000000-2', 2), ('20260101-000100', 3)):
+            with open(f"{self.path}.{name}", 'w', encoding='utf-8') as segment:
+                segment.write(_line(minute))
+        self.assertEqual(pending_segments(self.path)[:2],
+                         [self.path + '.20260101-000000', self.path + '.20260101-000000-1'])
+        self.assertEqual(self.paths(), ['/0/', '/1/', '/2/', '/3/'])
+        for segment in pending_segments(self.path):
+            compress_segment(segment)
+        self.assertEqual(archive_files(self.path)[-1], self.path + '.20260101-000100.gz')
+        self.assertEqual(self.paths(), ['/0/', '/1/', '/2/', '/3/'])
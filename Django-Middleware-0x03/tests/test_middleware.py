@@ -0,0 +1,116 @@
+# Django-Middleware-0x03/tests/test_middleware.py
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import SyncToAsync, async_to_sync
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.utils.functional import SimpleLazyObject
+
+from chats import rules
+from chats.middleware import (
+    AuthenticationMiddleware, RequestMetricsMiddleware, RolePermissionMiddleware,
+    SessionMiddleware, _logged_user,
+)
+from chats.roles import RoleCache
+from chats.rules import RuleEngine
+
+
+class LoggedUserTest(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/api/messages/')
+
+    def test_a_lazy_user_is_not_loaded(self):
+        def load():
+            raise AssertionError('user loaded for the log')
+        self.request.user = SimpleLazyObject(load)
+        self.assertEqual(_logged_user(self.request), 'AnonymousUser')
+
+    def test_an_already_loaded_user_is_logged(self):
+        self.request._cached_user = User(pk=5, username='alice')
+        self.assertEqual(_logged_user(self.request), 'id:5')
+        self.request._cached_user = AnonymousUser()
+        self.assertEqual(_logged_user(self.request), 'AnonymousUser')
+
+    def test_a_loaded_session_gives_the_user_id(self):
+        self.request.session = SimpleNamespace(_session_cache={SESSION_KEY: '7'})
+        self.assertEqual(_logged_user(self.request), 'id:7')
+
+    def test_an_unloaded_session_is_not_read(self):
+        self.request.session = SimpleNamespace()
+        self.assertEqual(_logged_user(self.request), 'AnonymousUser')
+
+
+class MetricsEndpointTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = RequestMetricsMiddleware(lambda request: HttpResponse())
+
+    def scrape(self, **meta):
+        return self.middleware(self.factory.get('/internal/metrics/', **meta))
+
+    def test_served_to_allowed_ips(self):
+        response = self.scrape(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'chats_http_requests_total', response.content)
+
+    def test_hidden_from_other_ips(self):
+        with self.assertRaises(Http404):
+            self.scrape(REMOTE_ADDR='10.0.0.1')
+
+    def test_hidden_from_requests_through_a_local_proxy(self):
+        with self.assertRaises(Http404):
+            self.scrape(REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        with self.assertRaises(Http404):
+            self.scrape(REMOTE_ADDR='127.0.0.1', HTTP_FORWARDED='for=203.0.113.7')
+
+
+class _Session(dict):
+    async def aget(self, key, default=None):
+        return self.get(key, default)
+
+
+class RoleCheckTest(SimpleTestCase):
+    def setUp(self):
+        self._engine, rules._engine = rules._engine, RuleEngine.from_config(
+            [{'prefix': '/admin/', 'roles': ['ADMIN']}])
+        caches['default'].clear()
+
+    def tearDown(self):
+        rules._engine = self._engine
+
+    def status(self, session):
+        async def get_response(request):
+            return HttpResponse()
+
+        async def auser():
+            raise AssertionError('user loaded for the role check')
+        request = RequestFactory().get('/admin/')
+        request.session = session
+        request.auser = auser
+        middleware = RolePermissionMiddleware(get_response)
+        return async_to_sync(middleware)(request).status_code
+
+    def test_async_role_comes_from_the_session_user_id(self):
+        with mock.patch.object(RoleCache, '_aload', return_value='ADMIN') as aload:
+            self.assertEqual(self.status(_Session({SESSION_KEY: '3'})), 200)
+            self.assertEqual(self.status(_Session({SESSION_KEY: '3'})), 200)
+        aload.assert_awaited_once_with('3')
+
+    def test_async_role_of_an_anonymous_session_is_denied(self):
+        self.assertEqual(self.status(_Session()), 403)
+
+
+class SessionAndAuthTest(SimpleTestCase):
+    def test_async_mode_needs_no_thread_unless_the_session_is_saved(self):
+        async def view(request):
+            request.user  # attached, not loaded
+            return HttpResponse()
+        stack = SessionMiddleware(AuthenticationMiddleware(view))
+        request = RequestFactory().get('/')
+        with mock.patch.object(SyncToAsync, '__call__', side_effect=AssertionError):
+            response = async_to_sync(stack)(request)
+        self.assertEqual(response.status_code, 200)
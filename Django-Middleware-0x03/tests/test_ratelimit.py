@@ -0,0 +1,70 @@
+# Django-Middleware-0x03/tests/test_ratelimit.py
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from chats.ratelimit import SlidingWindowLimiter
+
+
+class AsyncOnlyCache:
+    """
+    A cache whose sync API is off limits, so `ahit` is seen to go
+    through the async calls.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __getattr__(self, name):
+        if not name.startswith('a'):
+            raise AssertionError(f"sync call {name}() from ahit")
+        return getattr(self.cache, name)
+
+
+class SlidingWindowLimiterTest(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.limiter = SlidingWindowLimiter('default', limit=5, period=60)
+
+    def hit_at(self, *moments):
+        return [self.limiter.hit('client', now) for now in moments]
+
+    def test_allows_up_to_the_limit_in_one_window(self):
+        self.assertEqual(self.hit_at(0, 1, 2, 3, 4), [(True, 0)] * 5)
+        self.assertEqual(self.hit_at(5), [(False, 55)])
+
+    def test_refused_requests_are_not_counted(self):
+        self.hit_at(0, 1, 2, 3, 4, 5, 6, 7)
+        self.assertEqual(caches['default'].get('rl:client:0'), 5)
+
+    def test_clients_are_counted_apart(self):
+        self.hit_at(0, 1, 2, 3, 4)
+        self.assertEqual(self.limiter.hit('other', 5), (True, 0))
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        self.hit_at(30, 31, 32, 33, 34)
+        # At 90, half of the previous window overlaps: 2.5 of 5 requests.
+        self.assertEqual(self.hit_at(90, 91), [(True, 0), (True, 0)])
+        self.assertFalse(self.hit_at(92)[0][0])
+
+    def test_retry_after_is_when_the_previous_window_has_slid_out(self):
+        self.hit_at(30, 31, 32, 33, 34)
+        # One slot frees up once the previous window weighs 4 of 5: at 72.
+        self.assertEqual(self.hit_at(61, 65, 70, 71.9),
+                         [(False, 11), (False, 7), (False, 2), (False, 1)])
+        self.assertEqual(self.hit_at(72), [(True, 0)])
+
+    def test_retry_after_is_never_early(self):
+        self.hit_at(30, 31, 32, 33, 34)
+        for now in range(60, 72):
+            allowed, retry_after = self.hit_at(now)[0]
+            self.assertFalse(allowed)
+            self.assertGreaterEqual(now + retry_after, 72)
+
+    def test_retry_after_waits_for_the_next_window_when_this_one_is_full(self):
+        self.hit_at(60, 61, 62, 63, 64)
+        self.assertEqual(self.hit_at(100), [(False, 20)])
+
+    def test_async_hit_uses_the_async_cache_api(self):
+        limiter = SlidingWindowLimiter(AsyncOnlyCache(caches['default']), limit=2, period=60)
+        results = [async_to_sync(limiter.ahit)('client', now) for now in (0, 1, 2)]
+        self.assertEqual(results, [(True, 0), (True, 0), (False, 58)])
@@ -0,0 +1,126 @@
+# Django-Middleware-0x03/tests/test_request_log.py
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from chats.request_log import (
+    BatchWriter, BoundedQueueHandler, JsonLineFormatter, RequestLogPipeline,
+)
+
+
+def _record(path):
+    return logging.makeLogRecord({'user': 'alice', 'method': 'GET', 'path': path,
+                                  'status': 200, 'latency_ms': 1.0})
+
+
+class _LogFile:
+    """Collects written lines; the first `failures` writes raise OSError."""
+    def __init__(self, failures=0):
+        self.writes = []
+        self.failures = failures
+
+    def write(self, data):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('No space left on device')
+        self.writes.append(data.splitlines())
+
+    def paths(self):
+        return [json.loads(line)['path'] for lines in self.writes for line in lines]
+
+
+class BoundedQueueHandlerTest(SimpleTestCase):
+    def test_drop_policy_discards_and_counts(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=2), 'drop')
+        for index in range(5):
+            handler.emit(_record(f"/{index}/"))
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_block_policy_waits_for_room(self):
+        log_queue = queue.Queue(maxsize=1)
+        handler = BoundedQueueHandler(log_queue, 'block', block_timeout=5.0)
+        handler.emit(_record('/0/'))
+        threading.Timer(0.05, log_queue.get).start()
+        handler.emit(_record('/1/'))
+        self.assertEqual(handler.dropped, 0)
+        self.assertEqual(log_queue.get_nowait().path, '/1/')
+
+    def test_block_policy_drops_after_its_timeout(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=1), 'block', block_timeout=0.01)
+        handler.emit(_record('/0/'))
+        handler.emit(_record('/1/'))
+        self.assertEqual(handler.dropped, 1)
+
+    def test_drops_are_counted_exactly_across_threads(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=10), 'drop')
+
+        def emit_many():
+            for index in range(2000):
+                handler.emit(_record(f"/{index}/"))
+        threads = [threading.Thread(target=emit_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(handler.dropped, 8 * 2000 - 10)
+
+    def test_unknown_policy_is_refused(self):
+        with self.assertRaises(ValueError):
+            BoundedQueueHandler(queue.Queue(), 'wait')
+
+
+class BatchWriterTest(SimpleTestCase):
+    def run_writer(self, records, log_file, **kwargs):
+        log_queue = queue.Queue()
+        for record in records:
+            log_queue.put(record)
+        writer = BatchWriter(log_queue, log_file, JsonLineFormatter(),
+                             **dict({'flush_interval': 60}, **kwargs))
+        writer.start()
+        writer.stop()
+        self.assertFalse(writer.is_alive())
+        return writer
+
+    def test_writes_full_batches_then_the_rest_on_stop(self):
+        log_file = _LogFile()
+        records = [_record(f"/{index}/") for index in range(7)]
+        writer = self.run_writer(records, log_file, batch_size=3)
+        self.assertEqual([len(lines) for lines in log_file.writes], [3, 3, 1])
+        self.assertEqual(log_file.paths(), [f"/{index}/" for index in range(7)])
+        self.assertEqual((writer.written, writer.batches, writer.lost), (7, 3, 0))
+
+    def test_a_failed_batch_is_written_with_the_next(self):
+        log_file = _LogFile(failures=1)
+        records = [_record(f"/{index}/") for index in range(4)]
+        writer = self.run_writer(records, log_file, batch_size=2)
+        self.assertEqual([len(lines) for lines in log_file.writes], [4])
+        self.assertEqual(log_file.paths(), ['/0/', '/1/', '/2/', '/3/'])
+        self.assertEqual((writer.written, writer.lost), (4, 0))
+
+    def test_lines_past_max_retained_are_counted_as_lost(self):
+        log_file = _LogFile(failures=2)
+        records = [_record(f"/{index}/") for index in range(6)]
+        writer = self.run_writer(records, log_file, batch_size=2, max_retained=3)
+        self.assertEqual(log_file.paths(), ['/1/', '/2/', '/3/', '/4/', '/5/'])
+        self.assertEqual((writer.written, writer.lost), (5, 1))
+
+
+class RequestLogPipelineTest(SimpleTestCase):
+    def test_close_flushes_everything_logged(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'requests.log')
+        pipeline = RequestLogPipeline(path, batch_size=100, flush_interval=60, compress=False)
+        for index in range(5):
+            pipeline.log('alice', 'GET', f"/{index}/", 200, 1.0)
+        pipeline.close()
+        with open(path, encoding='utf-8') as log:
+            paths = [json.loads(line)['path'] for line in log]
+        self.assertEqual(paths, [f"/{index}/" for index in range(5)])
+        self.assertEqual(pipeline.stats()['written'], 5)
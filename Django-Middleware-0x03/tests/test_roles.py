@@ -0,0 +1,108 @@
+# Django-Middleware-0x03/tests/test_roles.py
+from unittest import mock
+
+from asgiref.sync import SyncToAsync, async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from chats import roles
+from chats.roles import RoleCache
+
+
+class RoleCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.roles = RoleCache('default', timeout=300, prefix='role')
+        self.rows = {1: 'guest', 2: 'ADMIN'}
+        self.loads = []
+        patcher = mock.patch.object(RoleCache, '_load', side_effect=self._load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _load(self, user_id):
+        self.loads.append(user_id)
+        return self.rows.get(user_id)
+
+    def test_role_is_read_once_then_cached(self):
+        self.assertEqual(self.roles.role(1), 'guest')
+        self.assertEqual(self.roles.role(1), 'guest')
+        self.assertEqual(self.loads, [1])
+
+    def test_unknown_user_has_no_role(self):
+        self.assertIsNone(self.roles.role(99))
+        self.assertIsNone(self.roles.role(99))
+        self.assertEqual(self.loads, [99, 99])
+
+    def test_invalidate_drops_the_cached_role(self):
+        self.roles.role(1)
+        self.rows[1] = 'ADMIN'
+        self.assertEqual(self.roles.role(1), 'guest')
+        self.roles.invalidate(1)
+        self.assertEqual(self.roles.role(1), 'ADMIN')
+        self.assertEqual(self.loads, [1, 1])
+
+    def test_token_role_is_trusted_only_if_issued_after_the_last_change(self):
+        self.roles.role(1)
+        version = caches['default'].get('role-version:1')
+        self.assertEqual(self.roles.role(1, {'role': 'ADMIN', 'iat': version + 1}), 'ADMIN')
+        self.assertEqual(self.roles.role(1, {'role': 'ADMIN', 'iat': version - 1}), 'guest')
+        with mock.patch('chats.roles.time.time', return_value=version + 2):
+            self.roles.invalidate(1)
+        self.assertEqual(self.roles.role(1, {'role': 'ADMIN', 'iat': version + 1}), 'guest')
+        self.assertEqual(self.loads, [1, 1])
+
+    def test_async_lookup_of_a_local_cache_needs_no_thread(self):
+        self.roles.role(2)
+        with mock.patch.object(SyncToAsync, '__call__', side_effect=AssertionError):
+            self.assertEqual(async_to_sync(self.roles.arole)(2), 'ADMIN')
+
+    def test_async_lookup_loads_a_missing_role(self):
+        with mock.patch.object(RoleCache, '_aload', side_effect=self.rows.get) as aload:
+            self.assertEqual(async_to_sync(self.roles.arole)(1), 'guest')
+        aload.assert_awaited_once_with(1)
+        self.assertEqual(self.roles.role(1), 'guest')
+        self.assertEqual(self.loads, [])
+
+
+class RoleCacheSettingsTest(SimpleTestCase):
+    @override_settings(ROLE_CACHE={})
+    def test_a_local_memory_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RoleCache.from_settings()
+
+    @override_settings(ROLE_CACHE={'ALLOW_LOCAL': True, 'TIMEOUT': 60})
+    def test_a_single_process_may_use_one(self):
+        self.assertEqual(RoleCache.from_settings().timeout, 60)
+
+
+class RoleChangeSignalTest(SimpleTestCase):
+    def setUp(self):
+        self.user = User(pk=5, username='alice')
+        self.user.role = 'guest'
+
+    def save(self, stored_role, **kwargs):
+        sender = mock.Mock()
+        manager = sender._default_manager
+        manager.filter.return_value.values_list.return_value.first.return_value = stored_role
+        with mock.patch.object(roles, 'get_role_cache') as get_role_cache, \
+                mock.patch.object(roles.transaction, 'on_commit', side_effect=lambda hook: hook()):
+            roles._invalidate_changed_role(sender, self.user, **kwargs)
+        return manager, get_role_cache.return_value.invalidate
+
+    def test_a_role_change_invalidates(self):
+        manager, invalidate = self.save('ADMIN')
+        manager.filter.assert_called_once_with(pk=5)
+        invalidate.assert_called_once_with(5)
+
+    def test_an_unchanged_role_does_not(self):
+        _, invalidate = self.save('guest')
+        invalidate.assert_not_called()
+
+    def test_saving_other_fields_reads_nothing(self):
+        manager, invalidate = self.save('ADMIN', update_fields=frozenset({'last_login'}))
+        manager.filter.assert_not_called()
+        invalidate.assert_not_called()
+        _, invalidate = self.save('ADMIN', update_fields=frozenset({'role'}))
+        invalidate.assert_called_once_with(5)
@@ -0,0 +1,116 @@
+# Django-Middleware-0x03/tests/test_rules.py
+from unittest import mock
+
+from django.contrib.auth import SESSION_KEY
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from chats import rules
+from chats.middleware import RolePermissionMiddleware, RolepermissionMiddleware
+from chats.roles import RoleCache
+from chats.rules import DEFAULT_ACCESS_RULES, Rule, RuleEngine
+
+
+def _names(matched):
+    return [rule.name for rule in matched]
+
+
+class RuleEngineTest(SimpleTestCase):
+    def setUp(self):
+        self.engine = RuleEngine.from_config([
+            {'name': 'api', 'prefix': '/api/'},
+            {'name': 'root', 'prefix': '/'},
+            {'name': 'api-messages', 'prefix': '/api/messages/', 'methods': ['post']},
+            {'name': 'numbered', 'regex': r'/\d+/$'},
+            {'name': 'messages', 'regex': r'messages'},
+        ])
+
+    def test_prefixes_shortest_first_then_regexes_in_order(self):
+        self.assertEqual(_names(self.engine.match('POST', '/api/messages/12/')),
+                         ['root', 'api', 'api-messages', 'numbered', 'messages'])
+
+    def test_methods_narrow_a_rule(self):
+        self.assertEqual(_names(self.engine.match('GET', '/api/messages/')),
+                         ['root', 'api', 'messages'])
+
+    def test_a_prefix_matches_only_at_the_start(self):
+        self.assertEqual(_names(self.engine.match('GET', '/v2/api/')), ['root'])
+
+    def test_regex_is_searched_anywhere(self):
+        self.assertEqual(_names(self.engine.match('GET', '/inbox/7/')), ['root', 'numbered'])
+
+    def test_policy_gathers_what_the_rules_ask_for(self):
+        engine = RuleEngine.from_config([
+            {'name': 'staff', 'prefix': '/api/', 'roles': ['admin']},
+            {'name': 'hours', 'prefix': '/api/', 'hours': (9, 18)},
+            {'name': 'rate', 'regex': 'messages', 'methods': ['POST'],
+             'rate': {'limit': 5, 'period': 60}, 'filter': True},
+        ])
+        policy = engine.policy('POST', '/api/messages/')
+        self.assertEqual(_names(policy.roles), ['staff'])
+        self.assertEqual(policy.roles[0].roles, {'ADMIN'})
+        self.assertEqual(policy.hours, [(9, 18)])
+        self.assertEqual(_names(policy.rate_rules), ['rate'])
+        self.assertTrue(policy.filter)
+        self.assertIs(engine.policy('POST', '/api/messages/'), policy)
+        self.assertFalse(engine.policy('GET', '/api/messages/').filter)
+
+    def test_policy_cache_is_bounded(self):
+        engine = RuleEngine([Rule('root', prefix='/')], cache_size=2)
+        for path in ('/a', '/b', '/c'):
+            engine.policy('GET', path)
+        self.assertEqual(list(engine._cache), [('GET', '/b'), ('GET', '/c')])
+
+    def test_a_rule_needs_a_prefix_or_a_regex(self):
+        with self.assertRaises(ValueError):
+            RuleEngine.from_config([{'name': 'nothing'}])
+        with self.assertRaises(ValueError):
+            RuleEngine.from_config([{'name': 'both', 'prefix': '/', 'regex': '.'}])
+
+    def test_role_sets(self):
+        engine = RuleEngine.from_config([
+            {'name': 'everyone', 'prefix': '/', 'roles': ['ADMIN']},
+            {'name': 'mine', 'prefix': '/', 'roles': ['ADMIN'], 'role_set': 'mine'},
+            {'name': 'theirs', 'prefix': '/', 'roles': ['ADMIN'], 'role_set': 'theirs'},
+        ])
+        self.assertEqual(_names(engine.policy('GET', '/').roles_for('mine')), ['everyone', 'mine'])
+        self.assertEqual(_names(engine.policy('GET', '/').roles_for(None)), ['everyone'])
+
+
+class RoleMiddlewareTest(SimpleTestCase):
+    """
+    The default rule table keeps each role middleware's checks as they
+    were before it.
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self._engine, rules._engine = rules._engine, RuleEngine.from_config(DEFAULT_ACCESS_RULES)
+
+    def tearDown(self):
+        rules._engine = self._engine
+
+    def status(self, middleware_class, method, path, role):
+        request = self.factory.generic(method, path)
+        request.session = {SESSION_KEY: '1'} if role is not None else {}
+        with mock.patch.object(RoleCache, 'role', return_value=role):
+            return middleware_class(lambda request: HttpResponse()).__call__(request).status_code
+
+    def test_role_permission_middleware(self):
+        middleware = RolePermissionMiddleware
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', 'ADMIN'), 200)
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', 'MODERATOR'), 403)
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', None), 403)
+        self.assertEqual(self.status(middleware, 'DELETE', '/api/messages/1/', 'guest'), 403)
+        self.assertEqual(self.status(middleware, 'PATCH', '/api/messages/1/', 'admin'), 200)
+        self.assertEqual(self.status(middleware, 'GET', '/api/messages/', 'guest'), 200)
+        self.assertEqual(self.status(middleware, 'POST', '/api/messages/', None), 200)
+
+    def test_rolepermission_middleware_restricts_only_admin(self):
+        middleware = RolepermissionMiddleware
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', 'ADMIN'), 200)
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', 'moderator'), 200)
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', 'guest'), 403)
+        self.assertEqual(self.status(middleware, 'GET', '/admin/', None), 403)
+        for method in ('DELETE', 'PUT', 'PATCH'):
+            self.assertEqual(self.status(middleware, method, '/api/messages/1/', 'guest'), 200)
+            self.assertEqual(self.status(middleware, method, '/api/messages/1/', None), 200)
@@ -0,0 +1,74 @@
+# Django-Middleware-0x03/tests/test_shared_store.py
+import os
+import sqlite3
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from chats.shared_store import SQLiteCounterStore, build_store
+
+
+class SQLiteCounterStoreTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'counters.sqlite3')
+
+    def test_setup_waits_for_a_locked_file(self):
+        # Another worker holds the write lock for longer than the 5 ms
+        # per-call budget, as when several start at once.
+        other = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(0.1, other.execute, ("COMMIT",))
+        release.start()
+        try:
+            store = SQLiteCounterStore(self.path, timeout=0.005)
+        finally:
+            release.join()
+            other.close()
+        self.addCleanup(store.close)
+        self.assertTrue(store.add('key', 1, 60))
+        self.assertEqual(store.incr('key'), 2)
+
+    def test_counters(self):
+        store = SQLiteCounterStore(self.path)
+        self.addCleanup(store.close)
+        self.assertTrue(store.add('key', 1, 60))
+        self.assertFalse(store.add('key', 1, 60))
+        self.assertEqual(store.incr('key', 2), 3)
+        self.assertEqual(store.decr('key'), 2)
+        self.assertTrue(store.add('expired', 5, -1))
+        self.assertEqual(store.get_many(['key', 'expired', 'missing']), {'key': 2})
+        with self.assertRaises(ValueError):
+            store.incr('expired')
+        self.assertTrue(store.add('expired', 1, 60))
+
+    def test_a_brief_write_by_another_worker_is_waited_out(self):
+        store = build_store({'BACKEND': 'sqlite', 'PATH': self.path})
+        self.addCleanup(store.primary.close)
+        other = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(0.05, other.execute, ("COMMIT",))
+        release.start()
+        try:
+            self.assertTrue(store.add('key', 1, 60))
+        finally:
+            release.join()
+            other.close()
+        self.assertEqual(store.stats()['errors'], 0)
+        self.assertEqual(store.stats()['fallback_calls'], 0)
+
+    def test_writes_are_counted_across_threads(self):
+        store = SQLiteCounterStore(self.path, purge_every=10 ** 9)
+
+        def add_many(thread):
+            for index in range(200):
+                store.add(f"{thread}:{index}", 1, 60)
+            store.close()
+        threads = [threading.Thread(target=add_many, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(store._writes, 800)
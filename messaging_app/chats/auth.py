@@ -1,4 +1,6 @@
 from rest_framework import generics, permissions
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from .serializers import UserSerializer
 
@@ -11,4 +13,26 @@ class RegisterView(generics.CreateAPIView):
     """
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
-    serializer_class = UserSerializer
\ No newline at end of file
+    serializer_class = UserSerializer
+
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the user's role to the token, so the role middleware can
+    authorize requests without loading the user. The middleware only
+    trusts the claim while the token is newer than the user's last role
+    change (see RoleCache in the middleware's chats/roles.py).
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['role'] = user.role
+        return token
+
+
+class CustomTokenObtainPairView(TokenObtainPairView):
+    """
+    API view for logging in: returns an access/refresh token pair whose
+    access token carries the user's role.
+    """
+    serializer_class = CustomTokenObtainPairSerializer
@@ -4,23 +4,49 @@ This module demonstrates a custom class-based context manager for
 handling database connections automatically.
 """
 import sqlite3
+import aiosqlite
+from instrumentation import QueryTimer
 
 class DatabaseConnection:
     """
     A class-based context manager for SQLite database connections.
     """
-    def __init__(self, db_name):
+    def __init__(self, db_name, router=None, readonly=False, hook=None):
         """
         Initializes the context manager with the database file name.
+
+        Args:
+            db_name (str): The name of the database file.
+            router (WALRouter, optional): When given, the connection is
+                borrowed from the router instead of being opened here.
+            readonly (bool, optional): With a router, borrow one of its
+                read-only connections rather than the serialized writer.
+                Statements should then go through `router.execute` so
+                busy waits are retried and counted.
+            hook (callable, optional): Receives (None, (), elapsed) on
+                exit, elapsed being how long the connection was held.
+                Defaults to the hook set in `instrumentation`.
         """
         self.db_name = db_name
+        self.router = router
+        self.readonly = readonly
+        self.hook = hook
         self.conn = None
+        self._borrowed = None
+        self._timer = None
 
     def __enter__(self):
         """
         Called when entering the 'with' block.
         Establishes the database connection and returns it.
         """
+        self._timer = QueryTimer(None, (), self.hook)
+        if self.router is not None:
+            role = "reader" if self.readonly else "writer"
+            print(f"LOG: Borrowing {role} connection to '{self.db_name}'...")
+            self._borrowed = self.router.connection(self.readonly)
+            self.conn = self._borrowed.__enter__()
+            return self.conn
         print(f"LOG: Opening connection to '{self.db_name}'...")
         self.conn = sqlite3.connect(self.db_name)
         return self.conn
@@ -33,14 +59,74 @@ class DatabaseConnection:
         The arguments exc_type, exc_val, exc_tb contain exception
         information if an error occurred inside the 'with' block.
         """
-        if self.conn:
+        if self._borrowed is not None:
+            # The router commits or rolls back and takes the connection back.
+            print(f"LOG: Returning connection to '{self.db_name}'...")
+            borrowed, self._borrowed = self._borrowed, None
+            borrowed.__exit__(exc_type, exc_val, exc_tb)
+        elif self.conn:
             print(f"LOG: Closing connection to '{self.db_name}'...")
             self.conn.close()
+        self._timer.stop()
         
         # If an exception occurred, returning False will re-raise it.
         # Returning True would suppress it. We want it to be re-raised.
         return False
 
+
+class AsyncDatabaseConnection:
+    """
+    The 'async with' counterpart of DatabaseConnection, yielding an
+    aiosqlite connection.
+    """
+    def __init__(self, db_name, pool=None, hook=None):
+        """
+        Initializes the context manager with the database file name.
+
+        Args:
+            db_name (str): The name of the database file.
+            pool (AsyncConnectionPool, optional): When given, the connection
+                is borrowed from the pool instead of being opened here.
+            hook (callable, optional): Receives (None, (), elapsed) on
+                exit, as for DatabaseConnection.
+        """
+        self.db_name = db_name
+        self.pool = pool
+        self.hook = hook
+        self.conn = None
+        self._borrowed = None
+        self._timer = None
+
+    async def __aenter__(self):
+        """
+        Called when entering the 'async with' block.
+        Establishes (or borrows) the database connection and returns it.
+        """
+        self._timer = QueryTimer(None, (), self.hook)
+        if self.pool is not None:
+            print(f"LOG: Borrowing pooled connection to '{self.db_name}'...")
+            self._borrowed = self.pool.acquire()
+            self.conn = await self._borrowed.__aenter__()
+            return self.conn
+        print(f"LOG: Opening connection to '{self.db_name}'...")
+        self.conn = await aiosqlite.connect(self.db_name)
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Called when exiting the 'async with' block.
+        Closes the connection, or hands it back to the pool.
+        """
+        if self._borrowed is not None:
+            print(f"LOG: Returning connection to '{self.db_name}'...")
+            borrowed, self._borrowed = self._borrowed, None
+            await borrowed.__aexit__(exc_type, exc_val, exc_tb)
+        elif self.conn:
+            print(f"LOG: Closing connection to '{self.db_name}'...")
+            await self.conn.close()
+        self._timer.stop()
+        return False
+
 # --- Main execution block ---
 if __name__ == '__main__':
     # Ensure you have run setup_db.py first to create 'task_database.db'
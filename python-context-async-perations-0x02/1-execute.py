@@ -4,13 +4,17 @@ This module demonstrates a more advanced context manager that not only
 handles the database connection but also executes a query.
 """
 import sqlite3
+import sys
+import aiosqlite
+from instrumentation import QueryTimer
+from wal_router import is_read_only
 
 class ExecuteQuery:
     """
     A reusable context manager that connects to a database, executes
     a given query with parameters, and provides the cursor to fetch results.
     """
-    def __init__(self, db_name, query, params=()):
+    def __init__(self, db_name, query, params=(), router=None, hook=None):
         """
         Initializes the context manager.
 
@@ -19,11 +23,20 @@ class ExecuteQuery:
             query (str): The SQL query string to be executed.
             params (tuple, optional): A tuple of parameters for the query.
                                       Defaults to an empty tuple.
+            router (WALRouter, optional): When given, read-only queries run
+                on one of the router's reader connections and everything
+                else on its serialized writer, which commits on exit.
+            hook (callable, optional): Receives (query, params, elapsed)
+                on exit. Defaults to the hook set in `instrumentation`.
         """
         self.db_name = db_name
         self.query = query
         self.params = params
+        self.router = router
+        self.hook = hook
         self.conn = None
+        self._borrowed = None
+        self._timer = None
 
     def __enter__(self):
         """
@@ -31,6 +44,17 @@ class ExecuteQuery:
         Connects to the DB, creates a cursor, executes the query,
         and returns the cursor.
         """
+        self._timer = QueryTimer(self.query, self.params, self.hook)
+        if self.router is not None:
+            self._borrowed = self.router.connection(is_read_only(self.query))
+            self.conn = self._borrowed.__enter__()
+            try:
+                print(f"LOG: Executing query: '{self.query}' with params {self.params}")
+                return self.router.execute(self.conn, self.query, self.params)
+            except BaseException:
+                self._borrowed.__exit__(*sys.exc_info())
+                self._borrowed = None
+                raise
         try:
             self.conn = sqlite3.connect(self.db_name)
             cursor = self.conn.cursor()
@@ -48,12 +72,87 @@ class ExecuteQuery:
         Called when exiting the 'with' block.
         Ensures the database connection is closed.
         """
-        if self.conn:
+        if self._borrowed is not None:
+            borrowed, self._borrowed = self._borrowed, None
+            borrowed.__exit__(exc_type, exc_val, exc_tb)
+        elif self.conn:
             self.conn.close()
+        self._timer.stop()
         
         # We don't suppress exceptions
         return False
 
+
+class AsyncExecuteQuery:
+    """
+    The 'async with' counterpart of ExecuteQuery.
+
+    It returns an aiosqlite cursor, so rows can be streamed with
+    'async for' instead of being fetched all at once.
+    """
+    def __init__(self, db_name, query, params=(), pool=None, hook=None):
+        """
+        Initializes the context manager.
+
+        Args:
+            db_name (str): The name of the database file.
+            query (str): The SQL query string to be executed.
+            params (tuple, optional): A tuple of parameters for the query.
+                                      Defaults to an empty tuple.
+            pool (AsyncConnectionPool, optional): When given, the query runs
+                on a connection borrowed from the pool instead of a new one.
+            hook (callable, optional): Receives (query, params, elapsed)
+                on exit. Defaults to the hook set in `instrumentation`.
+        """
+        self.db_name = db_name
+        self.query = query
+        self.params = params
+        self.pool = pool
+        self.hook = hook
+        self.conn = None
+        self.cursor = None
+        self._borrowed = None
+        self._timer = None
+
+    async def __aenter__(self):
+        """
+        Called when entering the 'async with' block.
+        Connects to (or borrows from) the DB, executes the query,
+        and returns the cursor.
+        """
+        self._timer = QueryTimer(self.query, self.params, self.hook)
+        if self.pool is not None:
+            self._borrowed = self.pool.acquire()
+            self.conn = await self._borrowed.__aenter__()
+        else:
+            self.conn = await aiosqlite.connect(self.db_name)
+        try:
+            print(f"LOG: Executing query: '{self.query}' with params {self.params}")
+            self.cursor = await self.conn.execute(self.query, self.params)
+            return self.cursor
+        except BaseException:
+            await self.__aexit__(*sys.exc_info())
+            raise
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Called when exiting the 'async with' block.
+        Closes the cursor, commits a successful write, and closes or
+        returns the connection.
+        """
+        if self.cursor is not None:
+            await self.cursor.close()
+            self.cursor = None
+        if exc_type is None and self.conn is not None and self.conn.in_transaction:
+            await self.conn.commit()
+        if self._borrowed is not None:
+            borrowed, self._borrowed = self._borrowed, None
+            await borrowed.__aexit__(exc_type, exc_val, exc_tb)
+        elif self.conn:
+            await self.conn.close()
+        self._timer.stop()
+        return False
+
 # --- Main execution block ---
 if __name__ == '__main__':
     # Ensure you have run setup_db.py first
@@ -2,19 +2,30 @@
 """
 This module demonstrates how to run multiple database queries
 concurrently using asyncio and the aiosqlite library.
+
+Queries borrow their connections from an AsyncConnectionPool, so a burst
+of coroutines shares a fixed number of connections instead of each one
+opening its own. The pool puts the database in WAL mode, so these readers
+are not blocked while another connection writes.
 """
 import asyncio
-import aiosqlite
+import os
+import sqlite3
+import sys
+import tempfile
 import time
+import aiosqlite
+from async_pool import AsyncConnectionPool, run_many
 
 DB_NAME = 'task_database.db'
+POOL_SIZE = 5
 
-async def async_fetch_users():
+async def async_fetch_users(pool):
     """
     Asynchronously fetches all users from the database.
     """
     print("Task 1: Starting to fetch all users...")
-    async with aiosqlite.connect(DB_NAME) as db:
+    async with pool.acquire() as db:
         async with db.execute("SELECT * FROM users") as cursor:
             result = await cursor.fetchall()
             # Simulate a slow network or I/O operation
@@ -22,12 +33,12 @@ async def async_fetch_users():
             print("Task 1: Finished fetching all users.")
             return result
 
-async def async_fetch_older_users():
+async def async_fetch_older_users(pool):
     """
     Asynchronously fetches users older than 40.
     """
     print("Task 2: Starting to fetch older users...")
-    async with aiosqlite.connect(DB_NAME) as db:
+    async with pool.acquire() as db:
         async with db.execute("SELECT * FROM users WHERE age > ?", (40,)) as cursor:
             result = await cursor.fetchall()
             # Simulate another slow network or I/O operation
@@ -42,14 +53,15 @@ async def fetch_concurrently():
     print("--- Starting concurrent execution ---")
     start_time = time.time()
     
-    # Create a list of the coroutine tasks to run
-    tasks = [
-        async_fetch_users(),
-        async_fetch_older_users()
-    ]
-    
-    # asyncio.gather runs all tasks concurrently and waits for them to complete
-    results = await asyncio.gather(*tasks)
+    async with AsyncConnectionPool(DB_NAME, size=POOL_SIZE, wal=True) as pool:
+        # Create a list of the coroutine tasks to run
+        tasks = [
+            async_fetch_users(pool),
+            async_fetch_older_users(pool)
+        ]
+
+        # asyncio.gather runs all tasks concurrently and waits for them to complete
+        results = await asyncio.gather(*tasks)
     
     end_time = time.time()
     print(f"\n--- Concurrent execution finished in {end_time - start_time:.2f} seconds ---")
@@ -62,9 +74,62 @@ async def fetch_concurrently():
     print(f"Found {len(older_users)} users older than 40.")
 
 
+def seed_benchmark_db(db_name, rows=10000):
+    """
+    Creates a users table with `rows` synthetic users for benchmarking.
+    """
+    conn = sqlite3.connect(db_name)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS users "
+        "(id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+        ((f"user{i}", f"user{i}@example.com", 18 + i % 60)
+         for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+
+async def benchmark_concurrent_reads(db_name, reads=500, concurrency=50):
+    """
+    Compares opening one connection per query against the pooled runner
+    for a burst of `reads` concurrent point lookups.
+    """
+    queries = [
+        ("SELECT * FROM users WHERE age = ?", (18 + i % 60,))
+        for i in range(reads)
+    ]
+
+    async def per_query_connect(sql, params):
+        async with aiosqlite.connect(db_name) as db:
+            return await db.execute_fetchall(sql, params)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(per_query_connect(*q) for q in queries))
+    unpooled = time.perf_counter() - start_time
+
+    async with AsyncConnectionPool(db_name, size=POOL_SIZE, wal=True) as pool:
+        start_time = time.perf_counter()
+        await run_many(queries, pool, concurrency=concurrency, timeout=5)
+        pooled = time.perf_counter() - start_time
+
+    print(f"{reads} reads, connection per query: {unpooled:.2f}s "
+          f"({reads / unpooled:.0f} queries/s)")
+    print(f"{reads} reads, pool of {POOL_SIZE}, concurrency {concurrency}: "
+          f"{pooled:.2f}s ({reads / pooled:.0f} queries/s)")
+
+
 # --- Main execution block ---
 if __name__ == '__main__':
     # Ensure you have run setup_db.py first
     
     # asyncio.run() starts the asyncio event loop and runs the main coroutine
-    asyncio.run(fetch_concurrently())
\ No newline at end of file
+    if '--benchmark' in sys.argv:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bench_db = os.path.join(tmp_dir, 'benchmark.db')
+            seed_benchmark_db(bench_db)
+            asyncio.run(benchmark_concurrent_reads(bench_db))
+    else:
+        asyncio.run(fetch_concurrently())
\ No newline at end of file
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+"""
+This module provides a fixed-size connection pool around aiosqlite and a
+bounded-concurrency runner for executing many queries at once.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+
+class AsyncConnectionPool:
+    """
+    A fixed-size pool of aiosqlite connections.
+
+    Connections are opened lazily, up to `size`, the first time they are
+    needed. A coroutine that finds every connection busy waits until one
+    is handed back instead of opening a new one.
+    """
+    def __init__(self, db_name, size=5, wal=False):
+        """
+        Initializes the pool.
+
+        Args:
+            db_name (str): The name of the database file.
+            size (int, optional): The maximum number of open connections.
+                                  Defaults to 5.
+            wal (bool, optional): Switch the database to WAL mode so readers
+                                  are not blocked by a writer. Defaults to
+                                  False.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self.db_name = db_name
+        self.size = size
+        self.wal = wal
+        self._idle = asyncio.LifoQueue()
+        self._connections = []
+        self._open_lock = asyncio.Lock()
+        self._closed = False
+
+    async def _connect(self):
+        """
+        Opens a single new connection to the database.
+        """
+        conn = await aiosqlite.connect(self.db_name)
+        if self.wal:
+            await conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    async def _get(self):
+        """
+        Returns an idle connection, opening a new one if the pool has not
+        reached its size yet, or waiting for one to be released otherwise.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed.")
+        try:
+            return self._checked(self._idle.get_nowait())
+        except asyncio.QueueEmpty:
+            pass
+
+        async with self._open_lock:
+            if len(self._connections) < self.size:
+                conn = await self._connect()
+                self._connections.append(conn)
+                return conn
+        return self._checked(await self._idle.get())
+
+    def _checked(self, conn):
+        """
+        Passes on a connection taken from the idle queue. The None that
+        close() queues stays there, so every waiter is woken by it.
+        """
+        if conn is None:
+            self._idle.put_nowait(None)
+            raise RuntimeError("Connection pool is closed.")
+        return conn
+
+    async def _release(self, conn):
+        """
+        Hands a connection back to the pool, rolling back anything the
+        borrower left uncommitted.
+        """
+        if conn.in_transaction:
+            await conn.rollback()
+        if self._closed:
+            self._connections.remove(conn)
+            await conn.close()
+        else:
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Borrows a connection for the duration of an 'async with' block.
+        """
+        conn = await self._get()
+        try:
+            yield conn
+        finally:
+            await self._release(conn)
+
+    async def close(self):
+        """
+        Closes the idle connections. Borrowed ones are closed when they
+        are released, so no borrower loses its connection mid-query.
+        """
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if conn is not None:
+                self._connections.remove(conn)
+                await conn.close()
+        self._idle.put_nowait(None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
+
+
+def _normalize_query(query):
+    """
+    Accepts either a bare SQL string or a (sql, params) pair and always
+    returns a (sql, params) pair.
+    """
+    if isinstance(query, str):
+        return query, ()
+    sql, params = query
+    return sql, tuple(params)
+
+
+async def _run_query(pool, semaphore, query, timeout):
+    """
+    Runs a single query on a pooled connection once a concurrency slot is
+    free. On timeout the running statement is interrupted so the
+    connection is not kept busy by a result nobody will read.
+    """
+    sql, params = _normalize_query(query)
+    async with semaphore:
+        async with pool.acquire() as conn:
+            try:
+                return await asyncio.wait_for(
+                    conn.execute_fetchall(sql, params), timeout
+                )
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                await conn.interrupt()
+                raise
+
+
+async def iter_many(queries, pool, concurrency=10, timeout=None,
+                    return_exceptions=False):
+    """
+    Runs many queries concurrently and yields results as they complete.
+
+    Args:
+        queries (iterable): SQL strings or (sql, params) pairs.
+        pool (AsyncConnectionPool): The pool to borrow connections from.
+        concurrency (int, optional): The maximum number of queries running
+                                     at the same time. Defaults to 10.
+        timeout (float, optional): Per-query timeout in seconds.
+        return_exceptions (bool, optional): Yield exceptions as results
+                                            instead of raising the first one.
+
+    Yields:
+        tuple: (index, rows) pairs, where index is the position of the
+               query in `queries`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def indexed(index, query):
+        try:
+            return index, await _run_query(pool, semaphore, query, timeout)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return index, e
+
+    tasks = [
+        asyncio.ensure_future(indexed(index, query))
+        for index, query in enumerate(queries)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Reached on error, on early exit by the consumer, or on
+        # cancellation: nothing still pending should outlive the caller.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_many(queries, pool, concurrency=10, timeout=None,
+                   ordered=True, return_exceptions=False):
+    """
+    Runs many queries concurrently and collects their results.
+
+    Args:
+        queries (iterable): SQL strings or (sql, params) pairs.
+        pool (AsyncConnectionPool): The pool to borrow connections from.
+        concurrency (int, optional): The maximum number of queries running
+                                     at the same time. Defaults to 10.
+        timeout (float, optional): Per-query timeout in seconds.
+        ordered (bool, optional): Return results in the order of `queries`
+                                  rather than in completion order.
+        return_exceptions (bool, optional): Return exceptions as results
+                                            instead of raising the first one.
+
+    Returns:
+        list: One result (a list of rows) per query.
+    """
+    queries = list(queries)
+    results = [None] * len(queries)
+    completed = []
+    async for index, rows in iter_many(queries, pool, concurrency, timeout,
+                                       return_exceptions):
+        results[index] = rows
+        completed.append(rows)
+    return results if ordered else completed
@@ -0,0 +1,338 @@
+#!/usr/bin/python3
+"""
+This module benchmarks the latency of the context manager and decorator
+toolkits against seeded SQLite datasets.
+
+Every access pattern runs the same mix of point lookups and small range
+queries. The report gives p50/p95/p99 latency and throughput for each
+pattern and dataset and is saved as JSON, so runs from different commits
+can be compared with --compare.
+
+Usage:
+    python3 benchmark_queries.py --sizes 10k,1m,10m --iterations 2000
+    python3 benchmark_queries.py --sizes 10k --compare benchmark_results/old.json
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from async_pool import AsyncConnectionPool
+from instrumentation import set_timing_hook
+from wal_router import WALRouter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DECORATORS_DIR = os.path.join(HERE, os.pardir, 'python-decorators-0x01')
+DATASET_SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+SEED = 1337
+HOT_KEYS = 100
+DatabaseConnection = importlib.import_module('0-databaseconnection').DatabaseConnection
+ExecuteQuery = importlib.import_module('1-execute').ExecuteQuery
+
+
+def _load_decorators(filename):
+    """
+    Imports one of the numbered decorator scripts by file path.
+    """
+    path = os.path.join(DECORATORS_DIR, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace('-', '_'), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_dataset(data_dir, label, rows):
+    """
+    Creates (or reuses) `<data_dir>/<label>/users.db` with `rows` users.
+
+    The rows come from a fixed random seed, so every machine and every
+    run benchmarks exactly the same data. The file is named users.db
+    because that is the name `with_db_connection` opens.
+    """
+    dataset_dir = os.path.join(data_dir, label)
+    db_name = os.path.join(dataset_dir, 'users.db')
+    if os.path.exists(db_name):
+        conn = sqlite3.connect(db_name)
+        count = conn.execute("SELECT count(*) FROM users").fetchone()[0]
+        conn.close()
+        if count == rows:
+            return db_name
+        os.remove(db_name)
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    print(f"Seeding {label} dataset ({rows} rows)...", file=sys.stderr)
+    rng = random.Random(SEED)
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(
+        "CREATE TABLE users "
+        "(id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+    )
+    batch = 100_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO users (id, name, email, age) VALUES (?, ?, ?, ?)",
+            ((i, f"user{i}", f"user{i}@example.com", rng.randint(18, 90))
+             for i in range(start + 1, min(start + batch, rows) + 1))
+        )
+        conn.commit()
+    conn.execute("CREATE INDEX idx_users_age ON users (age)")
+    conn.commit()
+    conn.close()
+    return db_name
+
+
+def make_workload(rows, iterations):
+    """
+    Returns `iterations` (sql, params) pairs: mostly point lookups on a
+    small hot set of ids, with one in ten being an age range count.
+    """
+    rng = random.Random(SEED)
+    hot_ids = [rng.randint(1, rows) for _ in range(HOT_KEYS)]
+    workload = []
+    for i in range(iterations):
+        if i % 10 == 9:
+            age = rng.randint(18, 85)
+            workload.append(("SELECT count(*) FROM users WHERE age BETWEEN ? AND ?",
+                             (age, age + 5)))
+        else:
+            workload.append(("SELECT * FROM users WHERE id = ?", (rng.choice(hot_ids),)))
+    return workload
+
+
+def _inline(sql, params):
+    """
+    Inlines integer parameters into the SQL text, for the query-keyed
+    cache decorator which only looks at the query string.
+    """
+    for value in params:
+        sql = sql.replace('?', str(int(value)), 1)
+    return sql
+
+
+def _time_calls(call, workload):
+    """
+    Runs `call(sql, params)` for each item and returns per-call latencies
+    and the total wall time.
+    """
+    latencies = []
+    start_time = time.perf_counter()
+    for sql, params in workload:
+        begin = time.perf_counter()
+        call(sql, params)
+        latencies.append(time.perf_counter() - begin)
+    return latencies, time.perf_counter() - start_time
+
+
+def bench_per_call_connect(db_name, workload):
+    """DatabaseConnection: a new connection for every query."""
+    def call(sql, params):
+        with DatabaseConnection(db_name) as conn:
+            return conn.execute(sql, params).fetchall()
+    return _time_calls(call, workload)
+
+
+def bench_execute_query(db_name, workload):
+    """ExecuteQuery: connect, execute and close for every query."""
+    def call(sql, params):
+        with ExecuteQuery(db_name, sql, params) as cursor:
+            return cursor.fetchall()
+    return _time_calls(call, workload)
+
+
+def bench_with_db_connection(db_name, workload):
+    """The with_db_connection decorator: a new connection per call."""
+    decorators = _load_decorators('1-with_db_connection.py')
+
+    @decorators.with_db_connection
+    def call(conn, sql, params):
+        return conn.execute(sql, params).fetchall()
+    return _time_calls(call, workload)
+
+
+def bench_pooled(db_name, workload):
+    """WALRouter: queries run on pooled read-only connections."""
+    with WALRouter(db_name) as router:
+        def call(sql, params):
+            with router.reader() as conn:
+                return router.execute(conn, sql, params).fetchall()
+        return _time_calls(call, workload)
+
+
+def bench_cached(db_name, workload):
+    """cache_query over with_db_connection, keyed by the query text."""
+    decorators = _load_decorators('4-cache_query.py')
+    decorators.query_cache.clear()
+
+    @decorators.with_db_connection
+    @decorators.cache_query
+    def fetch(conn, query):
+        return conn.execute(query).fetchall()
+
+    def call(sql, params):
+        return fetch(query=_inline(sql, params))
+    return _time_calls(call, workload)
+
+
+def bench_async(db_name, workload, concurrency=20):
+    """An AsyncConnectionPool, `concurrency` queries in flight at a time."""
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        async with AsyncConnectionPool(db_name, size=5) as pool:
+            async def call(sql, params):
+                async with semaphore:
+                    async with pool.acquire() as conn:
+                        begin = time.perf_counter()
+                        await conn.execute_fetchall(sql, params)
+                        return time.perf_counter() - begin
+
+            start_time = time.perf_counter()
+            latencies = await asyncio.gather(*(call(*q) for q in workload))
+            return list(latencies), time.perf_counter() - start_time
+    return asyncio.run(main())
+
+
+PATTERNS = {
+    'per_call_connect': bench_per_call_connect,
+    'execute_query': bench_execute_query,
+    'with_db_connection': bench_with_db_connection,
+    'pooled': bench_pooled,
+    'cached': bench_cached,
+    'async': bench_async,
+}
+
+
+def percentile(sorted_values, pct):
+    """
+    Returns the nearest-rank percentile of an already sorted list.
+    """
+    rank = max(0, min(len(sorted_values) - 1,
+                      round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(dataset, pattern, latencies, wall):
+    """
+    Turns raw latencies into the result record stored in the report.
+    """
+    ordered = sorted(latencies)
+    return {
+        'dataset': dataset,
+        'pattern': pattern,
+        'queries': len(ordered),
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'throughput_qps': len(ordered) / wall if wall else 0.0,
+    }
+
+
+def _git_commit():
+    """
+    Returns the current commit hash, or 'unknown' outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(sizes, patterns, iterations, data_dir):
+    """
+    Runs every pattern against every dataset and returns the report.
+    """
+    results = []
+    previous_hook = set_timing_hook(None)
+    try:
+        for label in sizes:
+            db_name = seed_dataset(data_dir, label, DATASET_SIZES[label])
+            workload = make_workload(DATASET_SIZES[label], iterations)
+            cwd = os.getcwd()
+            # The decorators open 'users.db' relative to the working directory.
+            os.chdir(os.path.dirname(db_name))
+            try:
+                for pattern in patterns:
+                    with open(os.devnull, 'w') as devnull, \
+                            contextlib.redirect_stdout(devnull):
+                        PATTERNS[pattern]('users.db', workload[:50])
+                        latencies, wall = PATTERNS[pattern]('users.db', workload)
+                    results.append(summarize(label, pattern, latencies, wall))
+            finally:
+                os.chdir(cwd)
+    finally:
+        set_timing_hook(previous_hook)
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'iterations': iterations,
+        'results': results,
+    }
+
+
+def print_report(report, baseline=None):
+    """
+    Prints the results as a table, with the change in p50 and throughput
+    against `baseline` when one is given.
+    """
+    previous = {}
+    if baseline:
+        previous = {(r['dataset'], r['pattern']): r for r in baseline['results']}
+    header = f"{'dataset':<8}{'pattern':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'qps':>10}"
+    if baseline:
+        header += f"{'p50 Δ':>9}{'qps Δ':>9}"
+    print(f"commit {report['commit']}, {report['iterations']} queries per pattern")
+    print(header)
+    for r in report['results']:
+        line = (f"{r['dataset']:<8}{r['pattern']:<20}{r['p50_ms']:>9.3f}"
+                f"{r['p95_ms']:>9.3f}{r['p99_ms']:>9.3f}{r['throughput_qps']:>10.0f}")
+        old = previous.get((r['dataset'], r['pattern']))
+        if old:
+            line += (f"{(r['p50_ms'] / old['p50_ms'] - 1) * 100:>+8.1f}%"
+                     f"{(r['throughput_qps'] / old['throughput_qps'] - 1) * 100:>+8.1f}%")
+        print(line)
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='10k,1m,10m',
+                        help='comma-separated datasets out of 10k, 1m, 10m')
+    parser.add_argument('--patterns', default=','.join(PATTERNS),
+                        help='comma-separated access patterns to run')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'bench_data'))
+    parser.add_argument('--output-dir', default=os.path.join(HERE, 'benchmark_results'))
+    parser.add_argument('--compare', metavar='JSON',
+                        help='an earlier report to compare against')
+    args = parser.parse_args()
+
+    report = run(args.sizes.split(','), args.patterns.split(','),
+                 args.iterations, os.path.abspath(args.data_dir))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    output = os.path.join(args.output_dir, f"{stamp}-{report['commit']}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
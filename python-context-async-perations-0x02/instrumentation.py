@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+This module holds the timing hook shared by the synchronous and
+asynchronous database context managers.
+
+A hook is any callable taking (query, params, elapsed), where elapsed is
+the time in seconds from executing the query to leaving the 'with'
+block. The connection context managers, which run no query of their
+own, report a query of None and the time the connection was held.
+Install your own with `set_timing_hook`, or pass one directly to a
+context manager.
+"""
+import time
+
+
+def log_timing(query, params, elapsed):
+    """
+    The default hook: prints the query and how long it was held.
+    """
+    if query is None:
+        print(f"LOG: Connection held for {elapsed * 1000:.2f}ms")
+        return
+    print(f"LOG: Query '{query}' with params {params} took {elapsed * 1000:.2f}ms")
+
+
+_timing_hook = log_timing
+
+
+def set_timing_hook(hook):
+    """
+    Replaces the process-wide timing hook. Passing None disables timing.
+    Returns the previous hook so it can be restored.
+    """
+    global _timing_hook
+    previous, _timing_hook = _timing_hook, hook
+    return previous
+
+
+def get_timing_hook():
+    """
+    Returns the process-wide timing hook, or None if timing is disabled.
+    """
+    return _timing_hook
+
+
+class QueryTimer:
+    """
+    Measures one query and reports it to a hook when stopped.
+    """
+    def __init__(self, query, params, hook=None):
+        """
+        Starts the timer. When `hook` is None the process-wide hook,
+        looked up now, receives the measurement.
+        """
+        self.query = query
+        self.params = params
+        self.hook = hook if hook is not None else get_timing_hook()
+        self.start = time.perf_counter()
+
+    def stop(self):
+        """
+        Reports the elapsed time to the hook and returns it.
+        """
+        elapsed = time.perf_counter() - self.start
+        if self.hook is not None:
+            self.hook(self.query, self.params, elapsed)
+        return elapsed
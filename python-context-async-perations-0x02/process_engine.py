@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+"""
+This module offloads CPU-heavy post-processing of query results to a
+process pool, so the event loop keeps serving I/O while rows are being
+filtered, serialized or hashed on other cores.
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from async_pool import AsyncConnectionPool
+
+
+def _apply(func, rows):
+    """
+    Runs in a worker process: applies `func` to every row of a chunk.
+    """
+    return [func(row) for row in rows]
+
+
+class ProcessPoolEngine:
+    """
+    Streams rows from a pooled aiosqlite connection into a process pool.
+
+    Rows are fetched in chunks and each chunk is submitted to the pool as
+    soon as it arrives. At most `max_in_flight` chunks are queued or being
+    processed at any time, which bounds memory, and results come back in
+    the same order as the rows.
+    """
+    def __init__(self, pool, workers=None, chunk_size=1000, max_in_flight=None):
+        """
+        Initializes the engine.
+
+        Args:
+            pool (AsyncConnectionPool): The pool to borrow connections from.
+            workers (int, optional): The number of worker processes.
+                                     Defaults to the number of CPUs.
+            chunk_size (int, optional): Rows sent to a worker at a time.
+                                        Defaults to 1000.
+            max_in_flight (int, optional): Chunks allowed in the pool at
+                                           once. Defaults to twice the
+                                           number of workers.
+        """
+        self.pool = pool
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def stream(self, query, func, params=()):
+        """
+        Runs `query` and yields `func(row)` for every row, in row order.
+
+        `func` runs in another process, so it must be picklable: a
+        module-level function, not a lambda or a closure.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = deque()
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.execute(query, params) as cursor:
+                    while True:
+                        rows = await cursor.fetchmany(self.chunk_size)
+                        if not rows:
+                            break
+                        in_flight.append(loop.run_in_executor(
+                            self._executor, _apply, func, rows
+                        ))
+                        # Waiting on the oldest chunk both keeps results in
+                        # order and stops the reader from running ahead.
+                        if len(in_flight) >= self.max_in_flight:
+                            for result in await in_flight.popleft():
+                                yield result
+            while in_flight:
+                for result in await in_flight.popleft():
+                    yield result
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    async def run(self, query, func, params=()):
+        """
+        Runs `query` and returns the list of `func(row)` results.
+        """
+        return [result async for result in self.stream(query, func, params)]
+
+    def close(self):
+        """
+        Shuts the worker processes down.
+        """
+        self._executor.shutdown(cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+def hash_row(row, rounds=2000):
+    """
+    A deliberately CPU-heavy transformation: an iterated SHA-256 of a row.
+    """
+    digest = repr(row).encode()
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest).digest()
+    return row[0], digest.hex()
+
+
+async def _measure(work):
+    """
+    Runs `work` while a heartbeat coroutine records the worst delay the
+    event loop took to wake it up.
+    """
+    worst_lag = 0.0
+    done = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal worst_lag
+        while not done.is_set():
+            expected = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            worst_lag = max(worst_lag, time.perf_counter() - expected)
+
+    beat = asyncio.ensure_future(heartbeat())
+    start_time = time.perf_counter()
+    results = await work
+    elapsed = time.perf_counter() - start_time
+    done.set()
+    await beat
+    return results, elapsed, worst_lag
+
+
+async def compare(db_name, query="SELECT * FROM users"):
+    """
+    Hashes every row of `query` on the event loop, then through the
+    engine, and reports wall time and the worst event loop lag for each.
+    """
+    async with AsyncConnectionPool(db_name, size=2) as pool:
+        async def inline():
+            async with pool.acquire() as conn:
+                rows = await conn.execute_fetchall(query)
+            return [hash_row(row) for row in rows]
+
+        expected, elapsed, lag = await _measure(inline())
+        print(f"On the event loop: {elapsed:.2f}s, worst loop lag {lag * 1000:.0f}ms")
+
+        async with ProcessPoolEngine(pool, chunk_size=250) as engine:
+            results, elapsed, lag = await _measure(engine.run(query, hash_row))
+        print(f"Process pool ({engine.workers} workers): {elapsed:.2f}s, "
+              f"worst loop lag {lag * 1000:.0f}ms")
+        assert results == expected
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_db = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tmp_dir, 'bench.db')
+        if len(sys.argv) == 1:
+            conn = sqlite3.connect(bench_db)
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+            conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                             ((f"user{i}", i % 80) for i in range(2000)))
+            conn.commit()
+            conn.close()
+        asyncio.run(compare(bench_db))
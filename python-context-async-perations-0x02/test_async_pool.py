@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the `async_pool.py` module.
+"""
+import asyncio
+import contextlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+from async_pool import AsyncConnectionPool, iter_many, run_many
+
+
+class SleepingConnection:
+    """A stand-in connection whose query `SELECT ?` sleeps for ? seconds."""
+
+    def __init__(self) -> None:
+        self.interrupt = AsyncMock()
+        self.cancelled = 0
+
+    async def execute_fetchall(self, sql, params):
+        try:
+            await asyncio.sleep(params[0])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return [(params[0],)]
+
+
+class SleepingPool:
+    """A pool lending the same `SleepingConnection` to every borrower."""
+
+    def __init__(self) -> None:
+        self.conn = SleepingConnection()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+class TestAsyncConnectionPool(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for the `AsyncConnectionPool` class."""
+
+    async def asyncSetUp(self) -> None:
+        """Create a pool over a fresh database."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.pool = AsyncConnectionPool(
+            os.path.join(tmp_dir.name, "users.db"), size=2)
+        self.addAsyncCleanup(self.pool.close)
+
+    async def test_connections_are_opened_lazily(self) -> None:
+        """Tests that a connection is only opened when one is needed."""
+        self.assertEqual(self.pool._connections, [])
+        for _ in range(3):
+            async with self.pool.acquire() as conn:
+                await conn.execute("SELECT 1")
+        self.assertEqual(len(self.pool._connections), 1)
+
+    async def test_last_released_connection_is_reused_first(self) -> None:
+        """Tests that idle connections are handed out LIFO."""
+        async with self.pool.acquire() as first:
+            async with self.pool.acquire() as second:
+                pass
+        async with self.pool.acquire() as conn:
+            self.assertIs(conn, first)
+        self.assertIsNot(first, second)
+
+    async def test_close_waits_for_borrowed_connections(self) -> None:
+        """Tests that closing leaves a borrowed connection usable."""
+        async with self.pool.acquire() as conn:
+            await self.pool.close()
+            rows = await conn.execute_fetchall("SELECT 1")
+        self.assertEqual(list(rows), [(1,)])
+        self.assertEqual(self.pool._connections, [])
+        with self.assertRaises(RuntimeError):
+            async with self.pool.acquire():
+                pass
+
+
+class TestRunMany(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for `run_many` and `iter_many`."""
+
+    async def test_unordered_results_come_in_completion_order(self) -> None:
+        """Tests that ordered=False returns the fastest query first."""
+        queries = [("SELECT ?", (0.05,)), ("SELECT ?", (0,))]
+        pool = SleepingPool()
+        self.assertEqual(await run_many(queries, pool),
+                         [[(0.05,)], [(0,)]])
+        self.assertEqual(await run_many(queries, pool, ordered=False),
+                         [[(0,)], [(0.05,)]])
+
+    async def test_return_exceptions(self) -> None:
+        """Tests that a failing query is returned or raised as asked."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            async with AsyncConnectionPool(
+                    os.path.join(tmp_dir, "users.db")) as pool:
+                queries = ["SELECT 1", "SELECT * FROM missing"]
+                results = await run_many(queries, pool,
+                                         return_exceptions=True)
+                self.assertEqual(list(results[0]), [(1,)])
+                self.assertIsInstance(results[1], sqlite3.OperationalError)
+                with self.assertRaises(sqlite3.OperationalError):
+                    await run_many(queries, pool)
+
+    async def test_timeout_interrupts_the_query(self) -> None:
+        """Tests that a query past its timeout is interrupted."""
+        pool = SleepingPool()
+        results = await run_many([("SELECT ?", (10,))], pool, timeout=0.01,
+                                 return_exceptions=True)
+        self.assertIsInstance(results[0], asyncio.TimeoutError)
+        pool.conn.interrupt.assert_awaited_once()
+
+    async def test_stopping_early_cancels_outstanding_queries(self) -> None:
+        """Tests that a consumer leaving early cancels what still runs."""
+        pool = SleepingPool()
+        queries = [("SELECT ?", (0,)), ("SELECT ?", (10,)),
+                   ("SELECT ?", (10,))]
+        async with contextlib.aclosing(iter_many(queries, pool)) as results:
+            async for index, rows in results:
+                self.assertEqual((index, rows), (0, [(0,)]))
+                break
+        self.assertEqual(pool.conn.cancelled, 2)
+        self.assertEqual(pool.conn.interrupt.await_count, 2)
+        self.assertEqual(asyncio.all_tasks(), {asyncio.current_task()})
+
+    async def test_cancelling_the_caller_cancels_its_queries(self) -> None:
+        """Tests that run_many cancelled by its caller leaves nothing behind."""
+        pool = SleepingPool()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                run_many([("SELECT ?", (10,))] * 3, pool), 0.01)
+        self.assertEqual(pool.conn.cancelled, 3)
+        self.assertEqual(asyncio.all_tasks(), {asyncio.current_task()})
+
+
+if __name__ == "__main__":
+    unittest.main()
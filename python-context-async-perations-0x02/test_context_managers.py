@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the timing instrumentation shared by the synchronous and
+asynchronous context managers of `0-databaseconnection.py` and
+`1-execute.py`.
+"""
+import asyncio
+import contextlib
+import importlib
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+databaseconnection = importlib.import_module("0-databaseconnection")
+execute = importlib.import_module("1-execute")
+
+
+class TestTimingHooks(unittest.TestCase):
+    """Every context manager reports to the same kind of hook."""
+
+    def setUp(self) -> None:
+        """Create an empty database and silence the LOG lines."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.db_name = os.path.join(tmp_dir.name, "users.db")
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def test_database_connection_reports_the_time_held(self) -> None:
+        """Tests that DatabaseConnection reports (None, (), elapsed)."""
+        hook = Mock()
+        with databaseconnection.DatabaseConnection(self.db_name, hook=hook) as conn:
+            conn.execute("SELECT 1")
+        query, params, elapsed = hook.call_args.args
+        self.assertEqual((query, params), (None, ()))
+        self.assertGreaterEqual(elapsed, 0)
+
+    def test_async_database_connection_reports_the_time_held(self) -> None:
+        """Tests that AsyncDatabaseConnection reports like the sync one."""
+        hook = Mock()
+
+        async def run():
+            async with databaseconnection.AsyncDatabaseConnection(
+                    self.db_name, hook=hook) as conn:
+                await conn.execute("SELECT 1")
+        asyncio.run(run())
+        self.assertEqual(hook.call_args.args[:2], (None, ()))
+
+    def test_execute_query_reports_the_query(self) -> None:
+        """Tests that ExecuteQuery reports its query and parameters."""
+        hook = Mock()
+        with execute.ExecuteQuery(self.db_name, "SELECT ?", (1,), hook=hook) as cursor:
+            self.assertEqual(cursor.fetchall(), [(1,)])
+        self.assertEqual(hook.call_args.args[:2], ("SELECT ?", (1,)))
+
+
+if __name__ == "__main__":
+    unittest.main()
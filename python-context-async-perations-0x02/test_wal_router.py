@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the `wal_router.py` module.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from wal_router import WALRouter, is_read_only
+
+
+class TestIsReadOnly(unittest.TestCase):
+    """Unit tests for `is_read_only`."""
+
+    def test_classifies_statements(self) -> None:
+        """Tests that reads go to readers and anything writing does not."""
+        self.assertTrue(is_read_only("SELECT * FROM users"))
+        self.assertTrue(is_read_only("WITH old AS (SELECT 1) SELECT * FROM old"))
+        self.assertFalse(is_read_only("WITH old AS (SELECT 1) DELETE FROM users"))
+        self.assertFalse(is_read_only("UPDATE users SET age = 1"))
+
+
+class TestWALRouter(unittest.TestCase):
+    """Unit tests for the `WALRouter` class."""
+
+    def setUp(self) -> None:
+        """Create a router over a database with a few users."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.router = WALRouter(os.path.join(tmp_dir.name, "users.db"),
+                                readers=2, busy_retry=0)
+        self.addCleanup(self.router.close)
+        with self.router.writer() as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, age INTEGER)")
+            conn.executemany("INSERT INTO users (age) VALUES (?)",
+                             [(20,), (30,), (40,)])
+
+    def test_reads_are_fetched_inside_the_retry_loop(self) -> None:
+        """Tests that a reader's rows come back through the router."""
+        with self.router.reader() as conn:
+            cursor = self.router.execute(
+                conn, "SELECT age FROM users WHERE age > ?", (25,))
+            self.assertEqual(cursor.fetchone(), (30,))
+            self.assertEqual(cursor.fetchall(), [(40,)])
+            self.assertIsNone(cursor.fetchone())
+
+    def test_locked_read_is_retried(self) -> None:
+        """Tests that a read stepping into a locked database is retried."""
+        locked = sqlite3.OperationalError("database is locked")
+        cursor = Mock(description=(), **{"fetchall.side_effect": [locked, [(1,)]]})
+        conn = Mock(**{"execute.return_value": cursor})
+        self.assertEqual(self.router.execute(conn, "SELECT 1").fetchall(), [(1,)])
+        self.assertEqual(self.router.stats()["busy_retries"], 1)
+
+    def test_locked_commit_is_retried(self) -> None:
+        """Tests that a commit refused with SQLITE_BUSY is retried."""
+        writer = self.router._writer
+        attempts = []
+
+        def commit():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            writer.commit()
+        self.router._writer = Mock(wraps=writer, **{"commit.side_effect": commit})
+        with self.router.writer() as conn:
+            self.router.execute(conn, "UPDATE users SET age = age + 1")
+        self.router._writer = writer
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(self.router.stats()["busy_retries"], 1)
+        self.assertFalse(writer.in_transaction)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,333 @@
+#!/usr/bin/python3
+"""
+This module splits SQLite access into a pool of read-only connections and
+a single serialized writer, with the database switched to WAL mode so
+readers keep going while a write is in progress.
+"""
+import itertools
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_READ_ONLY_STATEMENT = re.compile(r"^\s*(SELECT|VALUES|EXPLAIN|WITH)\b", re.I)
+_WRITE_KEYWORD = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+
+
+def is_read_only(query):
+    """
+    Returns True if `query` only reads data and can run on a reader.
+
+    A CTE counts as a read unless it feeds an INSERT, UPDATE, DELETE or
+    REPLACE. Anything misclassified as a read fails loudly, because the
+    reader connections are opened in read-only mode.
+    """
+    match = _READ_ONLY_STATEMENT.match(query)
+    if not match:
+        return False
+    if match.group(1).upper() == "WITH":
+        return not _WRITE_KEYWORD.search(query)
+    return True
+
+
+class _FetchedCursor:
+    """
+    The result of a read, fetched in full, behind the cursor methods
+    callers use to read it.
+    """
+    def __init__(self, conn, query, params):
+        cursor = conn.execute(query, params)
+        try:
+            self.description = cursor.description
+            self._rows = iter(cursor.fetchall())
+        finally:
+            cursor.close()
+        self.rowcount = -1
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        return list(itertools.islice(self._rows, size))
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def __iter__(self):
+        return self._rows
+
+    def close(self):
+        self._rows = iter(())
+
+
+class WALRouter:
+    """
+    Routes reads to a pool of read-only connections and writes to one
+    writer connection guarded by a lock.
+
+    The router also counts how often callers had to wait: for a free
+    reader, for the writer lock, or for SQLite itself to release a lock
+    ("database is locked" busy waits).
+    """
+    def __init__(self, db_name, readers=4, busy_timeout=5.0, busy_retry=0.01):
+        """
+        Initializes the router and switches the database to WAL mode.
+
+        Args:
+            db_name (str): The name of the database file.
+            readers (int, optional): The maximum number of read connections.
+                                     Defaults to 4.
+            busy_timeout (float, optional): How long, in seconds, a statement
+                                            keeps retrying on a locked
+                                            database. Defaults to 5.0.
+            busy_retry (float, optional): The pause between retries in
+                                          seconds. Defaults to 0.01.
+        """
+        if readers < 1:
+            raise ValueError("A router needs at least one reader.")
+        self.db_name = db_name
+        self.readers = readers
+        self.busy_timeout = busy_timeout
+        self.busy_retry = busy_retry
+
+        self._writer = sqlite3.connect(
+            db_name, timeout=0, check_same_thread=False
+        )
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer_lock = threading.Lock()
+        self._idle_readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "reads": 0,
+            "writes": 0,
+            "reader_waits": 0,
+            "reader_wait_seconds": 0.0,
+            "writer_lock_contentions": 0,
+            "writer_lock_wait_seconds": 0.0,
+            "busy_retries": 0,
+            "busy_wait_seconds": 0.0,
+        }
+
+    def _count(self, **increments):
+        """
+        Adds each keyword argument to the matching counter.
+        """
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def stats(self):
+        """
+        Returns a snapshot of the read/write and contention counters.
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _open_reader(self):
+        """
+        Opens a connection that SQLite itself refuses to write through.
+        """
+        return sqlite3.connect(
+            f"file:{self.db_name}?mode=ro", uri=True,
+            timeout=0, check_same_thread=False
+        )
+
+    @contextmanager
+    def reader(self):
+        """
+        Borrows a read-only connection for the duration of a 'with' block.
+        """
+        try:
+            conn = self._idle_readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._reader_lock:
+                if self._reader_count < self.readers:
+                    self._reader_count += 1
+                    conn = self._open_reader()
+            if conn is None:
+                start_time = time.perf_counter()
+                conn = self._idle_readers.get()
+                self._count(reader_waits=1,
+                            reader_wait_seconds=time.perf_counter() - start_time)
+        self._count(reads=1)
+        try:
+            yield conn
+        finally:
+            # Ending the read transaction lets WAL checkpoints make progress.
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """
+        Holds the single writer connection for the duration of a 'with'
+        block, committing on success and rolling back on error.
+        """
+        if not self._writer_lock.acquire(blocking=False):
+            start_time = time.perf_counter()
+            self._writer_lock.acquire()
+            self._count(writer_lock_contentions=1,
+                        writer_lock_wait_seconds=time.perf_counter() - start_time)
+        self._count(writes=1)
+        try:
+            yield self._writer
+            self._retry_busy(self._writer.commit)
+        except BaseException:
+            self._writer.rollback()
+            raise
+        finally:
+            self._writer_lock.release()
+
+    def connection(self, readonly):
+        """
+        Returns the reader or writer context manager.
+        """
+        return self.reader() if readonly else self.writer()
+
+    def execute(self, conn, query, params=()):
+        """
+        Executes `query` on `conn`, retrying while SQLite reports the
+        database as locked, and returns the cursor.
+
+        On a reader the rows are fetched inside the same retry loop,
+        since stepping a cursor can hit a locked database too, and the
+        returned cursor serves them from memory.
+        """
+        if conn is self._writer:
+            return self._retry_busy(conn.execute, query, params)
+        return self._retry_busy(_FetchedCursor, conn, query, params)
+
+    def _retry_busy(self, operation, *args):
+        """
+        Calls `operation(*args)`, retrying while SQLite reports the
+        database as locked, for at most `busy_timeout` seconds.
+        """
+        deadline = time.monotonic() + self.busy_timeout
+        start_time = time.perf_counter()
+        retries = 0
+        try:
+            while True:
+                try:
+                    return operation(*args)
+                except sqlite3.OperationalError as e:
+                    locked = "locked" in str(e) or "busy" in str(e)
+                    if not locked or time.monotonic() >= deadline:
+                        raise
+                    retries += 1
+                    time.sleep(self.busy_retry)
+        finally:
+            if retries:
+                self._count(busy_retries=retries,
+                            busy_wait_seconds=time.perf_counter() - start_time)
+
+    def close(self):
+        """
+        Closes the writer and every idle reader.
+        """
+        with self._writer_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+def _read_throughput_during_writes(db_name, routed, seconds=1.0, threads=4):
+    """
+    Counts the reads completed by `threads` reader threads while another
+    thread keeps a write transaction busy: through a WALRouter, or on
+    bare connections in rollback-journal mode as the baseline.
+    """
+    setup = sqlite3.connect(db_name)
+    setup.execute("CREATE TABLE IF NOT EXISTS users "
+                  "(id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+    setup.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                      ((f"user{i}", i % 80) for i in range(5000)))
+    setup.commit()
+    setup.close()
+
+    stop = threading.Event()
+    reads = [0] * threads
+    update = "UPDATE users SET age = age + 1 WHERE id % 7 = 0"
+    select = "SELECT count(*) FROM users WHERE age > 40"
+    router = WALRouter(db_name, readers=threads) if routed else None
+
+    def write_loop():
+        if router is not None:
+            while not stop.is_set():
+                with router.writer() as conn:
+                    router.execute(conn, update)
+                    time.sleep(0.005)
+            return
+        conn = sqlite3.connect(db_name, timeout=5)
+        while not stop.is_set():
+            conn.execute(update)
+            time.sleep(0.005)
+            conn.commit()
+        conn.close()
+
+    def read_loop(slot):
+        if router is not None:
+            while not stop.is_set():
+                with router.reader() as conn:
+                    router.execute(conn, select).fetchone()
+                reads[slot] += 1
+            return
+        conn = sqlite3.connect(db_name, timeout=5)
+        while not stop.is_set():
+            try:
+                conn.execute(select).fetchone()
+                reads[slot] += 1
+            except sqlite3.OperationalError:
+                pass
+        conn.close()
+
+    workers = [threading.Thread(target=write_loop)]
+    workers += [threading.Thread(target=read_loop, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    if router is not None:
+        router.close()
+    return sum(reads) / seconds
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else 'task_database.db'
+
+    print("--- Read throughput while a writer is active ---")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for routed in (False, True):
+            bench_db = os.path.join(tmp_dir, f"bench_{int(routed)}.db")
+            rate = _read_throughput_during_writes(bench_db, routed)
+            mode = "WALRouter" if routed else "rollback journal"
+            print(f"{mode:>16}: {rate:.0f} reads/s")
+
+    print(f"\n--- Routing queries on '{db_file}' ---")
+    with WALRouter(db_file) as router:
+        query = "SELECT * FROM users"
+        with router.connection(readonly=is_read_only(query)) as conn:
+            print(router.execute(conn, query).fetchall())
+        print(router.stats())